@@ -0,0 +1,81 @@
+"""Reads and saves what was read from each aseprite file on previous runs."""
+
+import json
+import os
+import typing
+from pathlib import Path
+
+from loguru import logger
+
+from rivals_workshop_assistant.file_handling import create_file
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+if typing.TYPE_CHECKING:
+    from rivals_workshop_assistant.run_context import RunContext
+
+FILENAME = ".aseprite_cache"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increase when the cached entries change shape, so old caches are dropped.
+VERSION = 2
+VERSION_FIELD = "version"
+FILES_FIELD = "files"
+
+
+def read(root_dir: Path) -> dict:
+    """Controller. Returns the cached entries by aseprite path."""
+    try:
+        cache = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("Aseprite cache is unreadable, and being treated as empty.")
+        return {}
+    if not isinstance(cache, dict) or cache.get(VERSION_FIELD) != VERSION:
+        return {}
+    return cache.get(FILES_FIELD, {})
+
+
+def save(run_context: "RunContext"):
+    """Controller"""
+    if run_context.aseprite_cache is None:
+        return
+    content = json.dumps(
+        {VERSION_FIELD: VERSION, FILES_FIELD: run_context.aseprite_cache},
+        separators=(",", ":"),
+    )
+    create_file(path=run_context.root_dir / PATH, content=content, overwrite=True)
+
+
+def get_key(root_dir: Path, path: Path) -> str:
+    try:
+        return path.relative_to(root_dir).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def get_entry(cache: dict, key: str, path: Path) -> typing.Optional[dict]:
+    """Return the cached entry for the file, if the file hasn't changed since."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    stat = path.stat()
+    if entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return entry
+
+
+def set_entry(
+    cache: dict, key: str, path: Path, entry: dict, stat: os.stat_result = None
+):
+    """stat should be taken before the file is read, if the file could change."""
+    if stat is None:
+        stat = path.stat()
+    cache[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, **entry}
+
+
+def remove_missing(cache: dict, keys: typing.Iterable[str]):
+    """Drop entries for files that no longer exist."""
+    keys = set(keys)
+    for key in [key for key in cache if key not in keys]:
+        del cache[key]
@@ -12,6 +12,7 @@ from .lua_scripts import (
     supply_lua_script,
     EXPORT_ASEPRITE_LUA_PATH,
     CREATE_HURTBOX_LUA_PATH,
+    BATCH_EXPORT_LUA_PATH,
 )
 from .params import AsepritePathParams, AsepriteConfigParams
 from .windows import Window
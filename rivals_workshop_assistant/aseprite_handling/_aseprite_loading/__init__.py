@@ -1,5 +1,11 @@
 """https://github.com/Eiyeron/py_aseprite"""
 
+import mmap
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
 from .headers import Header, Frame
 from .chunks import (
     Chunk,
@@ -8,20 +14,70 @@ from .chunks import (
     LayerChunk,
     LayerGroupChunk,
     CelChunk,
+    CelPixelSource,
+    load_cel_pixels_in_parallel,
     CelExtraChunk,
     MaskChunk,
+    FrameTag,
     FrameTagsChunk,
     PathChunk,
+    PaletteColor,
     PaletteChunk,
     UserDataChunk,
     SliceChunk,
 )
+from .digests import (
+    digest_file_settings,
+    digest_frame,
+    digest_frame_layers,
+    combine_layer_digests,
+    combine_digests,
+)
+from .pixels import (
+    INDEXED_COLOR_DEPTH,
+    make_palette_table,
+    decode_pixels,
+    composite,
+    is_background,
+)
 from ..tags import AsepriteTag
 
 
 class RawAsepriteFile:
-    def __init__(self, data):
-        self.header, self.frames = parse_data(data)
+    def __init__(
+        self,
+        data,
+        metadata_only: bool = False,
+        pixel_source: CelPixelSource = None,
+        frame_offsets: List[int] = None,
+        decompression_workers: int = 1,
+    ):
+        """If metadata_only, only the layer and tag chunks are read.
+        Cels aren't decompressed, and frames other than frame 0 have no chunks.
+        Use get_frames to read the chunks of only some frames.
+        If a pixel_source is given, cels read their pixels from it when accessed.
+        frame_offsets may be given from a previous read of the same file.
+        If decompression_workers is more than 1, the cels of parsed frames are
+        decompressed right away, on that many threads."""
+        self.metadata_only = metadata_only
+        self.decompression_workers = decompression_workers
+        if decompression_workers > 1 and pixel_source is None:
+            pixel_source = CelPixelSource(data)
+        self._data = data
+        self._pixel_source = pixel_source
+        self.header, self.frames = parse_data(
+            data, metadata_only=metadata_only, pixel_source=pixel_source
+        )
+        if not metadata_only:
+            self._load_pixels_in_parallel(self.frames)
+        if frame_offsets is None or len(frame_offsets) != len(self.frames):
+            frame_offsets = build_frame_offsets(data, num_frames=len(self.frames))
+        self.frame_offsets = frame_offsets
+        self._full_frames = {}
+        self._frame_digests = {}
+        self._frame_layer_digests = {}
+        self._settings_digest = None
+        self._palette = None
         self.build_layer_tree()
 
     def build_layer_tree(self):
@@ -55,25 +111,326 @@ class RawAsepriteFile:
             return []
         if len(tag_chunks) > 1:
             assert False
-        tag_dicts = tag_chunks[0].tags
         tags = [
             AsepriteTag(
-                name=tag_dict["name"],
-                start=tag_dict["from"],
-                end=tag_dict["to"],
+                name=frame_tag.name,
+                start=frame_tag.start,
+                end=frame_tag.end,
                 color=rgb_to_color_name(
-                    r=tag_dict["color"]["red"],
-                    g=tag_dict["color"]["green"],
-                    b=tag_dict["color"]["blue"],
+                    r=frame_tag.red, g=frame_tag.green, b=frame_tag.blue
                 ),
             )
-            for tag_dict in tag_dicts
+            for frame_tag in tag_chunks[0].tags
         ]
         return tags
 
     def get_num_frames(self):
         return len(self.frames)
 
+    def get_frames(self, start: int, end: int) -> List[Frame]:
+        """Return frames start through end, with all their chunks.
+        If only metadata was read, only these frames are read from the file."""
+        if not self.metadata_only:
+            return self.frames[start : end + 1]
+        end = min(end, self.get_num_frames() - 1)
+        return self.get_frames_at(range(start, end + 1))
+
+    def get_frames_at(self, indices: Iterable[int]) -> List[Frame]:
+        """Return the frames at the indices, with all their chunks.
+        The cels of the frames that weren't read yet are decompressed together,
+        so read all the frames that are needed at once."""
+        indices = list(indices)
+        if not self.metadata_only:
+            return [self.frames[index] for index in indices]
+        new_frames = [
+            self._get_full_frame(index)
+            for index in indices
+            if index not in self._full_frames
+        ]
+        self._load_pixels_in_parallel(new_frames)
+        return [self._get_full_frame(index) for index in indices]
+
+    def release_frames(self):
+        """Drop the frames read by get_frames, and their pixels.
+        Metadata and digests are kept, and frames are read again if needed."""
+        if not self.metadata_only:
+            return
+        self._full_frames = {}
+        self._palette = None
+
+    def _get_full_frame(self, index: int) -> Frame:
+        try:
+            return self._full_frames[index]
+        except KeyError:
+            pass
+        frame = self._read_frame(index, self._parse_full_frame)
+        self._full_frames[index] = frame
+        return frame
+
+    def get_anim_digest(self, start: int, end: int) -> str:
+        """Return a digest of frames start through end, read from their raw bytes.
+        Frame digests are kept, so overlapping anims only read each frame once."""
+        end = min(end, self.get_num_frames() - 1)
+        return combine_digests(
+            self.get_settings_digest(),
+            [self.get_frame_digest(index) for index in range(start, end + 1)],
+        )
+
+    def get_settings_digest(self) -> bytes:
+        """Return a digest of what every frame depends on, like layers and palette."""
+        if self._settings_digest is None:
+            self._settings_digest = self._read_frame(0, digest_file_settings)
+        return self._settings_digest
+
+    def get_frame_digest(self, index: int) -> bytes:
+        try:
+            return self._frame_digests[index]
+        except KeyError:
+            pass
+        frame_digest = self._read_frame(
+            index,
+            lambda data, frame_offset: digest_frame(
+                data, frame_offset, index, self.get_frame_digest
+            ),
+        )
+        self._frame_digests[index] = frame_digest
+        return frame_digest
+
+    def get_layers_digest(self, start: int, end: int, layer_indices: List[int]) -> str:
+        """Like get_anim_digest, but only for the cels of the given image layers."""
+        end = min(end, self.get_num_frames() - 1)
+        return combine_digests(
+            self.get_settings_digest(),
+            [
+                self.get_layers_frame_digest(index, layer_indices)
+                for index in range(start, end + 1)
+            ],
+        )
+
+    def get_layers_frame_digest(self, index: int, layer_indices: List[int]) -> bytes:
+        return combine_layer_digests(self.get_frame_layer_digests(index), layer_indices)
+
+    def get_frame_layer_digests(self, index: int) -> Dict[int, bytes]:
+        """Return the digest of each of the frame's cels, by image layer index."""
+        try:
+            return self._frame_layer_digests[index]
+        except KeyError:
+            pass
+        image_layer_indices = {
+            chunk_index: image_index
+            for image_index, chunk_index in enumerate(
+                chunk_index
+                for chunk_index, layer in enumerate(self.layers)
+                if layer.layer_type == 0
+            )
+        }
+        layer_digests = self._read_frame(
+            index,
+            lambda data, frame_offset: digest_frame_layers(
+                data,
+                frame_offset,
+                index,
+                image_layer_indices,
+                self.get_frame_layer_digests,
+            ),
+        )
+        self._frame_layer_digests[index] = layer_digests
+        return layer_digests
+
+    def get_palette(self) -> np.ndarray:
+        """Return the palette of frame 0, as a 256 x 4 RGBA lookup table."""
+        if self._palette is None:
+            self._palette = make_palette_table(self.get_frames(0, 0)[0].chunks)
+        return self._palette
+
+    def get_cel_image(self, cel: CelChunk, layer: LayerChunk = None) -> np.ndarray:
+        """Decode the cel's pixels into a height x width x 4 RGBA array.
+        Linked cels have no pixels of their own. See get_linked_cel."""
+        data = cel.data
+        palette = None
+        transparent_index = None
+        if self.header.color_depth == INDEXED_COLOR_DEPTH:
+            palette = self.get_palette()
+            if layer is None or not is_background(layer):
+                transparent_index = self.header.palette_mask
+        return decode_pixels(
+            data["data"],
+            width=data["width"],
+            height=data["height"],
+            color_depth=self.header.color_depth,
+            palette=palette,
+            transparent_index=transparent_index,
+        )
+
+    def get_linked_cel(self, cel: CelChunk) -> CelChunk:
+        """Return the cel that the linked cel shares pixels with."""
+        (frame_index,) = cel.data["link"]
+        frame = self.get_frames(frame_index, frame_index)[0]
+        return next(
+            chunk
+            for chunk in frame.chunks
+            if isinstance(chunk, CelChunk) and chunk.layer_index == cel.layer_index
+        )
+
+    def get_visible_layers(self) -> List[LayerChunk]:
+        """Return the image layers that are visible, along with their groups."""
+        visible_layers = []
+        group_visibility = []
+        for layer in self.layers:
+            del group_visibility[layer.layer_child_level :]
+            is_visible = layer.flags & 1 == 1 and all(group_visibility)
+            if isinstance(layer, LayerGroupChunk):
+                group_visibility.append(is_visible)
+            elif is_visible and layer.layer_type == 0:
+                visible_layers.append(layer)
+        return visible_layers
+
+    def get_layer_user_data(self) -> Dict[int, UserDataChunk]:
+        """Return the user data of the layers that have some, by layer index.
+        A layer's user data is the chunk right after it in frame 0."""
+        user_data = {}
+        layer_index = -1
+        previous_chunk = None
+        for chunk in self.get_frames(0, 0)[0].chunks:
+            if isinstance(chunk, LayerChunk):
+                layer_index += 1
+            elif isinstance(chunk, UserDataChunk) and isinstance(
+                previous_chunk, LayerChunk
+            ):
+                user_data[layer_index] = chunk
+            previous_chunk = chunk
+        return user_data
+
+    def get_layer_cel(self, index: int, layer: LayerChunk) -> Optional[CelChunk]:
+        """Return the layer's cel in the frame, or None if the layer is empty there."""
+        layer_index = self.layers.index(layer)
+        frame = self.get_frames(index, index)[0]
+        return next(
+            (
+                chunk
+                for chunk in frame.chunks
+                if isinstance(chunk, CelChunk) and chunk.layer_index == layer_index
+            ),
+            None,
+        )
+
+    def get_frame_image(self, index: int, layers: List[LayerChunk] = None):
+        """Composite the frame's cels into a canvas-sized RGBA array.
+        Only the given layers are drawn, or the visible layers if none are given."""
+        if layers is None:
+            layers = self.get_visible_layers()
+        layer_positions = {
+            id(layer): position for position, layer in enumerate(self.layers)
+        }
+        drawn_positions = {layer_positions[id(layer)] for layer in layers}
+        valid_layer_opacity = self.header.flags & 1 == 1
+
+        layer_images = []
+        frame = self.get_frames(index, index)[0]
+        cels = sorted(
+            (chunk for chunk in frame.chunks if isinstance(chunk, CelChunk)),
+            key=lambda cel: cel.layer_index,
+        )
+        for cel in cels:
+            if cel.layer_index not in drawn_positions:
+                continue
+            layer = self.layers[cel.layer_index]
+            pixel_cel = self.get_linked_cel(cel) if cel.cel_type == 1 else cel
+            if pixel_cel.cel_type not in (0, 2):
+                continue
+            layer_opacity = layer.opacity if valid_layer_opacity else 255
+            layer_images.append(
+                (
+                    self.get_cel_image(pixel_cel, layer),
+                    cel.x_pos,
+                    cel.y_pos,
+                    cel.opacity * layer_opacity // 255,
+                    layer.blend_mode,
+                )
+            )
+        return composite(self.header.width, self.header.height, layer_images)
+
+    def _read_frame(self, index: int, read):
+        """Call read with the data and the offset of the frame."""
+        try:
+            return read(self._data, self.frame_offsets[index])
+        except ValueError:
+            # The given frame offsets were out of date.
+            self.frame_offsets = build_frame_offsets(self._data, len(self.frames))
+            return read(self._data, self.frame_offsets[index])
+
+    def _load_pixels_in_parallel(self, frames: List[Frame]):
+        if self.decompression_workers <= 1:
+            return
+        cels = [
+            chunk
+            for frame in frames
+            for chunk in frame.chunks
+            if isinstance(chunk, CelChunk)
+        ]
+        load_cel_pixels_in_parallel(cels, max_workers=self.decompression_workers)
+
+    def _parse_full_frame(self, data, frame_offset: int) -> Frame:
+        state = _ParseState(pixel_source=self._pixel_source, layers=self.layers)
+        return parse_frame(data, frame_offset, CHUNK_PARSERS, state)
+
+
+class MappedAsepriteFile(RawAsepriteFile):
+    """An aseprite file read through a memory map, rather than loaded into memory.
+    Cels point into the map, and are only decompressed when their pixels are read.
+    If metadata_only, releasing the frames closes the map, and it's mapped again
+    when frames are read."""
+
+    def __init__(
+        self,
+        path: Path,
+        metadata_only: bool = False,
+        pixel_cache_size: int = 32,
+        decompression_workers: int = 1,
+    ):
+        self.path = path
+        self.pixel_cache_size = pixel_cache_size
+        self._map = None
+        self._open()
+        super().__init__(
+            self._map,
+            metadata_only=metadata_only,
+            pixel_source=self.pixel_source,
+            decompression_workers=decompression_workers,
+        )
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.pixel_source = CelPixelSource(self._map, cache_size=self.pixel_cache_size)
+        self._data = self._map
+        self._pixel_source = self.pixel_source
+
+    @property
+    def is_open(self) -> bool:
+        return self._map is not None
+
+    def release_frames(self):
+        super().release_frames()
+        if self.metadata_only:
+            self.close()
+
+    def _read_frame(self, index: int, read):
+        if not self.is_open:
+            self._open()
+        return super()._read_frame(index, read)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
 
 RGB_TO_COLOR_NAME = {
     (0, 0, 0): "black",
@@ -91,48 +448,109 @@ def rgb_to_color_name(r, g, b) -> str:
     return RGB_TO_COLOR_NAME.get((r, g, b), (r, g, b))
 
 
-def parse_data(data):
+class _ParseState:
+    """What chunk parsers need to know about the chunks parsed before them."""
+
+    __slots__ = ("layer_index", "pixel_source", "layers")
+
+    def __init__(self, pixel_source: CelPixelSource = None, layers=None):
+        """If layers are given, they're used instead of parsing the layer chunks
+        again, so there's a single set of layer objects per file."""
+        self.layer_index = 0
+        self.pixel_source = pixel_source
+        self.layers = layers
+
+
+def _parse_layer(data, data_offset, state: _ParseState):
+    if state.layers is not None:
+        layer = state.layers[state.layer_index]
+        state.layer_index += 1
+        return layer
+    layer = LayerChunk(data, state.layer_index, data_offset)
+    state.layer_index += 1
+    if layer.layer_type & 1 == 1:
+        return LayerGroupChunk(layer)
+    return layer
+
+
+def _parse_cel(data, data_offset, state: _ParseState):
+    return CelChunk(data, data_offset, pixel_source=state.pixel_source)
+
+
+def _make_simple_parser(chunk_class):
+    def parse(data, data_offset, state: _ParseState):
+        return chunk_class(data, data_offset)
+
+    return parse
+
+
+LAYER_CHUNK_TYPE = 0x2004
+FRAME_TAGS_CHUNK_TYPE = 0x2018
+
+CHUNK_PARSERS = {
+    0x0004: _make_simple_parser(OldPaleteChunk_0x0004),
+    0x0011: _make_simple_parser(OldPaleteChunk_0x0011),
+    LAYER_CHUNK_TYPE: _parse_layer,
+    0x2005: _parse_cel,
+    0x2006: _make_simple_parser(CelExtraChunk),
+    0x2016: _make_simple_parser(MaskChunk),
+    0x2017: _make_simple_parser(PathChunk),
+    FRAME_TAGS_CHUNK_TYPE: _make_simple_parser(FrameTagsChunk),
+    0x2019: _make_simple_parser(PaletteChunk),
+    0x2020: _make_simple_parser(UserDataChunk),
+    0x2022: _make_simple_parser(SliceChunk),
+}
+METADATA_CHUNK_TYPES = {LAYER_CHUNK_TYPE, FRAME_TAGS_CHUNK_TYPE}
+METADATA_CHUNK_PARSERS = {
+    chunk_type: parser
+    for chunk_type, parser in CHUNK_PARSERS.items()
+    if chunk_type in METADATA_CHUNK_TYPES
+}
+
+
+def parse_data(data, metadata_only: bool = False, pixel_source: CelPixelSource = None):
     head = Header(data)
     data_offset = Header.header_size
     frames = []
-    layer_index = 0
+    state = _ParseState(pixel_source=pixel_source)
+    chunk_parsers = METADATA_CHUNK_PARSERS if metadata_only else CHUNK_PARSERS
     for i in range(head.num_frames):
-        frame = Frame(data, data_offset)
+        if metadata_only and i > 0:
+            # Layers and tags are only stored in frame 0.
+            frame = Frame(data, data_offset)
+            frame.chunks = []
+        else:
+            frame = parse_frame(data, data_offset, chunk_parsers, state)
         frames.append(frame)
-        frame.chunks = []
-        data_offset += frame.frame_size
-        for c in range(frame.num_chunks):
-            chunk = Chunk(data, data_offset)
-            if chunk.chunk_type == 0x2004:
-                layer = LayerChunk(data, layer_index, data_offset)
-                if layer.layer_type & 1 == 1:
-                    frame.chunks.append(LayerGroupChunk(layer))
-                else:
-                    frame.chunks.append(layer)
-                layer_index += 1
-            elif chunk.chunk_type == 0x2005:
-                frame.chunks.append(CelChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2006:
-                frame.chunks.append(CelExtraChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2016:
-                frame.chunks.append(MaskChunk(data, data_offset))
-            elif chunk.chunk_type == 0x0004:
-                frame.chunks.append(OldPaleteChunk_0x0004(data, data_offset))
-            elif chunk.chunk_type == 0x0011:
-                frame.chunks.append(OldPaleteChunk_0x0011(data, data_offset))
-            elif chunk.chunk_type == 0x2017:
-                frame.chunks.append(PathChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2018:
-                frame.chunks.append(FrameTagsChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2019:
-                frame.chunks.append(PaletteChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2020:
-                frame.chunks.append(UserDataChunk(data, data_offset))
-            elif chunk.chunk_type == 0x2022:
-                frame.chunks.append(SliceChunk(data, data_offset))
-            # else:
-            #     print("Skipped 0x{:04x}".format(chunk.chunk_type))
-
-            data_offset += chunk.chunk_size
+        data_offset += frame.size
 
     return head, frames
+
+
+def parse_frame(data, data_offset: int, chunk_parsers: dict, state: _ParseState):
+    """Parse the frame starting at data_offset, with the chunks it has parsers for."""
+    frame = Frame(data, data_offset)
+    frame.chunks = []
+    data_offset += frame.frame_size
+    chunk_header_struct = Chunk.chunk_struct
+    for c in range(frame.num_chunks):
+        chunk_size, chunk_type = chunk_header_struct.unpack_from(data, data_offset)
+        parser = chunk_parsers.get(chunk_type)
+        if parser is not None:
+            frame.chunks.append(parser(data, data_offset, state))
+        data_offset += chunk_size
+    return frame
+
+
+def build_frame_offsets(data, num_frames: int = None) -> List[int]:
+    """Return where each frame starts, reading only the frame headers."""
+    if num_frames is None:
+        num_frames = Header(data).num_frames
+    frame_size_struct = Frame.frame_struct
+    offsets = []
+    data_offset = Header.header_size
+    for i in range(num_frames):
+        offsets.append(data_offset)
+        frame_size, *_ = frame_size_struct.unpack_from(data, data_offset)
+        data_offset += frame_size
+    return offsets
@@ -1,85 +1,112 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from struct import Struct
+from typing import List
 import zlib
 import math
 
+UINT16 = Struct("<H")
+UINT32 = Struct("<I")
+RGBA = Struct("<BBBB")
+
 
 # They're not 0-terminated strings, but they're prefixed with their size
 def parse_string(data, string_offset):
-    (string_length,) = Struct("<H").unpack_from(data, string_offset)
+    (string_length,) = UINT16.unpack_from(data, string_offset)
+    string_start = string_offset + 2
+    string_name = str(data[string_start : string_start + string_length], "utf-8")
+    return string_length + 2, string_name
 
-    (string_name,) = Struct("<{}s".format(string_length)).unpack_from(
-        data, string_offset + 2
-    )
-    return string_length + 2, string_name.decode("utf-8")
 
+class Chunk:
+    """Base for all chunks.
+
+    Chunks use __slots__, since files hold many of them.
+    legacy_state lists the attributes older versions stored, in their order.
+    Pickling only writes those, because anim hashes were made from pickled frames,
+    and must stay the same for the anim hashes already in users' dotfiles."""
 
-class Chunk(object):
+    __slots__ = ("chunk_size", "chunk_type")
     chunk_format = "<IH"
+    chunk_struct = Struct(chunk_format)
+    legacy_state = ("chunk_size", "chunk_type")
 
     def __init__(self, data, data_offset=0):
-        chunk_struct = Struct(Chunk.chunk_format)
-        (self.chunk_size, self.chunk_type) = chunk_struct.unpack_from(data, data_offset)
+        self.chunk_size, self.chunk_type = Chunk.chunk_struct.unpack_from(
+            data, data_offset
+        )
+
+    def __getstate__(self):
+        state = {}
+        for name in self.legacy_state:
+            try:
+                state[name] = self._get_legacy_value(name)
+            except AttributeError:
+                pass  # Older versions only set some attributes conditionally.
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _get_legacy_value(self, name):
+        return getattr(self, name)
 
 
 class OldPaleteChunk_0x0004(Chunk):
+    __slots__ = ("num_packets", "packets")
+    legacy_state = Chunk.legacy_state + __slots__
+    packet_struct = Struct("<BB")
+    color_packet_struct = Struct("<BBB")
+
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
 
-        packet_struct = Struct("<BB")
-        color_packet_struct = Struct("<BBB")
-
-        (self.num_packets,) = Struct("<H").unpack_from(data, data_offset + 6)
+        (self.num_packets,) = UINT16.unpack_from(data, data_offset + 6)
         self.packets = []
 
         packet_offset = data_offset + 8
         for packet_index in range(self.num_packets):
             packet = {"colors": []}
-            (packet["previous_packet_skip"], num_colors) = packet_struct.unpack_from(
-                data, packet_offset
-            )
+            (
+                packet["previous_packet_skip"],
+                num_colors,
+            ) = self.packet_struct.unpack_from(data, packet_offset)
             packet_offset += 2
             for color in range(0, num_colors):
-                (red, blue, green) = color_packet_struct.unpack_from(
+                red, green, blue = self.color_packet_struct.unpack_from(
                     data, packet_offset
                 )
-                packet["colors"].append([red, blue, green])
+                packet["colors"].append([red, green, blue])
                 packet_offset += 3
 
             self.packets.append(packet)
 
 
-class OldPaleteChunk_0x0011(Chunk):
-    def __init__(self, data, data_offset=0):
-        Chunk.__init__(self, data, data_offset)
-
-        packet_struct = Struct("<BB")
-        color_packet_struct = Struct("<BBB")
-        self.num_packets = Struct("<H").unpack_from(data, data_offset)
-        self.packets = []
-
-        packet_offset = data_offset + 6
-        for packet_index in range(self.num_packets):
-            packet = {"colors": []}
-            (packet.previous_packet_skip, num_colors) = packet_struct.unpack_from(
-                data, packet_offset
-            )
-            packet_offset += 2
-            for color in range(0, num_colors):
-                (red, blue, green) = color_packet_struct.unpack_from(
-                    data, packet_offset
-                )
-                packet["colors"].append([red, blue, green])
-                packet_offset += 3
+class OldPaleteChunk_0x0011(OldPaleteChunk_0x0004):
+    """Same as 0x0004, but color values range from 0 to 63."""
 
-            self.packets.append(packet)
+    __slots__ = ()
 
 
 class LayerChunk(Chunk):
+    __slots__ = (
+        "flags",
+        "layer_type",
+        "layer_child_level",
+        "default_width",
+        "default_height",
+        "blend_mode",
+        "opacity",
+        "name",
+        "layer_index",
+    )
+    legacy_state = Chunk.legacy_state + __slots__
     layer_format = "<HHHHHHB3x"
+    layer_struct = Struct(layer_format)
 
     def __init__(self, data, layer_index, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        layer_struct = Struct(LayerChunk.layer_format)
         (
             self.flags,
             self.layer_type,
@@ -88,8 +115,10 @@ class LayerChunk(Chunk):
             self.default_height,
             self.blend_mode,
             self.opacity,
-        ) = layer_struct.unpack_from(data, data_offset + 6)
-        _, self.name = parse_string(data, data_offset + 6 + layer_struct.size)
+        ) = LayerChunk.layer_struct.unpack_from(data, data_offset + 6)
+        _, self.name = parse_string(
+            data, data_offset + 6 + LayerChunk.layer_struct.size
+        )
         self.layer_index = layer_index
 
     def __str__(self):
@@ -97,6 +126,9 @@ class LayerChunk(Chunk):
 
 
 class LayerGroupChunk(LayerChunk):
+    __slots__ = ("children",)
+    legacy_state = LayerChunk.legacy_state[2:] + __slots__
+
     def __init__(self, base_layer: LayerChunk):
         """Constructed from its base version"""
         self.flags = base_layer.flags
@@ -111,68 +143,186 @@ class LayerGroupChunk(LayerChunk):
         self.children = []
 
 
+class CelPixelSource:
+    """Reads cel pixels out of a shared buffer when they're first needed.
+    The most recently used decompressed cels are kept, up to cache_size."""
+
+    def __init__(self, buffer, cache_size=32):
+        self.buffer = buffer
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def get(self, start_range, end_range, compressed):
+        key = (start_range, end_range)
+        try:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        pixels = self.read(start_range, end_range, compressed)
+        self._cache[key] = pixels
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return pixels
+
+    def read(self, start_range, end_range, compressed):
+        """Read the pixels without caching them. Safe to call from several threads."""
+        with memoryview(self.buffer) as view, view[start_range:end_range] as payload:
+            if compressed:
+                return zlib.decompress(payload)
+            else:
+                return payload.tobytes()
+
+
 class CelChunk(Chunk):
+    __slots__ = (
+        "layer_index",
+        "x_pos",
+        "y_pos",
+        "opacity",
+        "cel_type",
+        "_data",
+        "_pixel_source",
+        "_pixel_range",
+    )
+    legacy_state = Chunk.legacy_state + (
+        "layer_index",
+        "x_pos",
+        "y_pos",
+        "opacity",
+        "cel_type",
+        "data",
+    )
     cel_format = "<HhhBH7x"
+    cel_struct = Struct(cel_format)
     cel_type_format = "<HH"
+    cel_type_struct = Struct(cel_type_format)
 
-    def __init__(self, data, data_offset=0):
+    def __init__(self, data, data_offset=0, pixel_source: CelPixelSource = None):
+        """If a pixel_source is given, the cel's pixels are read from it
+        on access, instead of being copied out of data now."""
         Chunk.__init__(self, data, data_offset)
-        cel_struct = Struct(CelChunk.cel_format)
         (
             self.layer_index,
             self.x_pos,
             self.y_pos,
             self.opacity,
             self.cel_type,
-        ) = cel_struct.unpack_from(data, data_offset + 6)
-        cel_offset = data_offset + cel_struct.size + 6
-        cel_struct = Struct(CelChunk.cel_type_format)
-        if self.cel_type == 0:
-            self.data = {}
-            (self.data["width"], self.data["height"]) = cel_struct.unpack_from(
-                data, cel_offset
-            )
-            start_range = cel_offset + cel_struct.size
+        ) = CelChunk.cel_struct.unpack_from(data, data_offset + 6)
+        cel_offset = data_offset + CelChunk.cel_struct.size + 6
+        self._data = None
+        self._pixel_source = None
+        self._pixel_range = None
+        if self.cel_type in (0, 2):
+            self._data = {}
+            (
+                self._data["width"],
+                self._data["height"],
+            ) = CelChunk.cel_type_struct.unpack_from(data, cel_offset)
+            start_range = cel_offset + CelChunk.cel_type_struct.size
             end_range = data_offset + self.chunk_size
-            self.data["data"] = data[start_range:end_range]
+            if pixel_source is not None:
+                self._pixel_source = pixel_source
+                self._pixel_range = (start_range, end_range)
+            elif self.cel_type == 0:
+                self._data["data"] = data[start_range:end_range]
+            else:
+                self._data["data"] = zlib.decompress(data[start_range:end_range])
         elif self.cel_type == 1:
-            self.data = {"link": Struct("<H").unpack_from(data, cel_offset)}
-        elif self.cel_type == 2:
-            self.data = {}
-            (self.data["width"], self.data["height"]) = cel_struct.unpack_from(
-                data, cel_offset
-            )
-            start_range = cel_offset + cel_struct.size
-            end_range = data_offset + self.chunk_size
-            self.data["data"] = zlib.decompress(data[start_range:end_range])
+            self._data = {"link": UINT16.unpack_from(data, cel_offset)}
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            raise AttributeError(f"Cel type {self.cel_type} has no data")
+        if self._pixel_source is None:
+            return self._data
+        start_range, end_range = self._pixel_range
+        pixels = self._pixel_source.get(
+            start_range, end_range, compressed=self.cel_type == 2
+        )
+        return {**self._data, "data": pixels}
+
+    @property
+    def has_pending_pixels(self) -> bool:
+        return self._pixel_source is not None
+
+    def read_pending_pixels(self) -> bytes:
+        start_range, end_range = self._pixel_range
+        return self._pixel_source.read(
+            start_range, end_range, compressed=self.cel_type == 2
+        )
+
+    def attach_pixels(self, pixels: bytes):
+        """Keep the pixels on the cel, instead of reading them from its source."""
+        self._data["data"] = pixels
+        self._pixel_source = None
+        self._pixel_range = None
+
+    def __setstate__(self, state):
+        self._data = None
+        self._pixel_source = None
+        self._pixel_range = None
+        for name, value in state.items():
+            if name == "data":
+                self._data = value
+            else:
+                setattr(self, name, value)
+
+
+def load_cel_pixels_in_parallel(cels: List[CelChunk], max_workers: int):
+    """Read the pixels of the cels that haven't been read yet, on a thread pool,
+    and attach them to their cels.
+    zlib releases the GIL while decompressing, so the threads run in parallel."""
+    pending_cels = [cel for cel in cels if cel.has_pending_pixels]
+    if not pending_cels:
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        all_pixels = list(executor.map(CelChunk.read_pending_pixels, pending_cels))
+    for cel, pixels in zip(pending_cels, all_pixels):
+        cel.attach_pixels(pixels)
 
 
 class CelExtraChunk(Chunk):
+    __slots__ = (
+        "flags",
+        "precise_x_pos",
+        "precise_y_pos",
+        "cel_width",
+        "cel_height",
+    )
+    legacy_state = Chunk.legacy_state + __slots__
     celextra_format = "<HLLLL16x"
+    celextra_struct = Struct(celextra_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        cel_struct = Struct(CelExtraChunk.celextra_format)
         (
             self.flags,
             self.precise_x_pos,
             self.precise_y_pos,
             self.cel_width,
             self.cel_height,
-        ) = cel_struct.unpack_from(data, data_offset + 6)
+        ) = CelExtraChunk.celextra_struct.unpack_from(data, data_offset + 6)
 
 
 class MaskChunk(Chunk):
+    __slots__ = ("x_pos", "y_pos", "width", "height", "name", "bitmap")
+    legacy_state = Chunk.legacy_state + __slots__
     mask_format = "<hhHH8x"
+    mask_struct = Struct(mask_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        mask_struct = Struct(MaskChunk.mask_format)
-        (self.x_pos, self.y_pos, self.width, self.height) = mask_struct.unpack_from(
-            data, data_offset + 6
-        )
+        (
+            self.x_pos,
+            self.y_pos,
+            self.width,
+            self.height,
+        ) = MaskChunk.mask_struct.unpack_from(data, data_offset + 6)
 
-        name_offset = data_offset + 6 + mask_struct.size
+        name_offset = data_offset + 6 + MaskChunk.mask_struct.size
         string_size, self.name = parse_string(data, name_offset)
 
         start_range = name_offset + string_size
@@ -181,101 +331,156 @@ class MaskChunk(Chunk):
 
 
 class PathChunk(Chunk):
-    pass
+    __slots__ = ()
+
+
+class FrameTag:
+    __slots__ = ("start", "end", "loop", "red", "green", "blue", "name")
+
+    def __init__(self, start, end, loop, red, green, blue, name):
+        self.start = start
+        self.end = end
+        self.loop = loop
+        self.red = red
+        self.green = green
+        self.blue = blue
+        self.name = name
+
+    def get_legacy_dict(self) -> dict:
+        return {
+            "color": {"red": self.red, "green": self.green, "blue": self.blue},
+            "from": self.start,
+            "to": self.end,
+            "loop": self.loop,
+            "name": self.name,
+        }
 
 
 class FrameTagsChunk(Chunk):
+    __slots__ = ("tags",)
+    legacy_state = Chunk.legacy_state + __slots__
     frametag_head_format = "<H8x"
+    frametag_head_struct = Struct(frametag_head_format)
     frametag_format = "<HHB8x3Bx"
+    frametag_struct = Struct(frametag_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        palette_struct = Struct(FrameTagsChunk.frametag_head_format)
-        (num_tags,) = palette_struct.unpack_from(data, data_offset + 6)
+        (num_tags,) = FrameTagsChunk.frametag_head_struct.unpack_from(
+            data, data_offset + 6
+        )
 
         self.tags = []
-        tag_offset = data_offset + palette_struct.size + 6
+        tag_offset = data_offset + FrameTagsChunk.frametag_head_struct.size + 6
 
-        palette_tag_struct = Struct(FrameTagsChunk.frametag_format)
         for index in range(num_tags):
-            tag = {"color": {}}
-            (
-                tag["from"],
-                tag["to"],
-                tag["loop"],
-                tag["color"]["red"],
-                tag["color"]["green"],
-                tag["color"]["blue"],
-            ) = palette_tag_struct.unpack_from(data, tag_offset)
-            self.tags.append(tag)
-            tag_offset += palette_tag_struct.size
-            string_size, tag["name"] = parse_string(data, tag_offset)
+            tag_fields = FrameTagsChunk.frametag_struct.unpack_from(data, tag_offset)
+            tag_offset += FrameTagsChunk.frametag_struct.size
+            string_size, name = parse_string(data, tag_offset)
             tag_offset += string_size
+            self.tags.append(FrameTag(*tag_fields, name))
+
+    def _get_legacy_value(self, name):
+        if name == "tags":
+            return [tag.get_legacy_dict() for tag in self.tags]
+        return super()._get_legacy_value(name)
+
+
+class PaletteColor:
+    __slots__ = ("flags", "red", "green", "blue", "alpha", "name")
+
+    def __init__(self, flags, red, green, blue, alpha, name=None):
+        self.flags = flags
+        self.red = red
+        self.green = green
+        self.blue = blue
+        self.alpha = alpha
+        self.name = name
+
+    def get_legacy_dict(self) -> dict:
+        # Older versions stored the green value as blue, and the blue value as green.
+        return {
+            "name": self.name,
+            "flags": self.flags,
+            "red": self.red,
+            "blue": self.green,
+            "green": self.blue,
+            "alpha": self.alpha,
+        }
 
 
 class PaletteChunk(Chunk):
+    __slots__ = ("palette_size", "first_color_index", "last_color_index", "colors")
+    legacy_state = Chunk.legacy_state + __slots__
     palette_format = "<III8x"
+    palette_struct = Struct(palette_format)
+    color_struct = Struct("<HBBBB")
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
-        palette_struct = Struct(PaletteChunk.palette_format)
         (
             self.palette_size,
             self.first_color_index,
             self.last_color_index,
-        ) = palette_struct.unpack_from(data, data_offset + 6)
-        color_struct = Struct("<HBBBB")
+        ) = PaletteChunk.palette_struct.unpack_from(data, data_offset + 6)
         self.colors = []
 
-        color_offset = data_offset + 6 + palette_struct.size
+        color_struct = PaletteChunk.color_struct
+        color_offset = data_offset + 6 + PaletteChunk.palette_struct.size
         for index in range(self.first_color_index, self.last_color_index + 1):
-            color = {"name": None}
-            (
-                color["flags"],
-                color["red"],
-                color["blue"],
-                color["green"],
-                color["alpha"],
-            ) = color_struct.unpack_from(data, color_offset)
+            color = PaletteColor(*color_struct.unpack_from(data, color_offset))
             color_offset += color_struct.size
-            if color["flags"] & 1 != 0:
-                string_size, color["name"] = parse_string(data, color_offset)
+            if color.flags & 1 != 0:
+                string_size, color.name = parse_string(data, color_offset)
                 color_offset += string_size
 
             self.colors.append(color)
 
+    def _get_legacy_value(self, name):
+        if name == "colors":
+            return [color.get_legacy_dict() for color in self.colors]
+        return super()._get_legacy_value(name)
+
 
 class UserDataChunk(Chunk):
+    __slots__ = ("flags", "string", "red", "green", "blue", "alpha")
+    legacy_state = Chunk.legacy_state + __slots__
+
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
         userdata_offset = data_offset + 6
-        (self.flags,) = Struct("<I").unpack_from(data, userdata_offset)
+        (self.flags,) = UINT32.unpack_from(data, userdata_offset)
         userdata_offset += 4
         if self.flags & 1 != 0:
             string_size, self.string = parse_string(data, userdata_offset)
             userdata_offset += string_size
         if self.flags & 2 != 0:
-            (self.red, self.green, self.blue, self.alpha) = Struct("<BBBB").unpack_from(
+            self.red, self.green, self.blue, self.alpha = RGBA.unpack_from(
                 data, userdata_offset
             )
 
 
 class SliceChunk(Chunk):
+    __slots__ = ("flags", "reserved", "name", "slices")
+    legacy_state = Chunk.legacy_state + __slots__
     slice_chunk_format = "<III"
+    slice_chunk_struct = Struct(slice_chunk_format)
     slice_format = "<IiiII"
+    slice_struct = Struct(slice_format)
     slice_key_format = "<IiiII"
     slice_bit_1_format = "<iiII"
+    slice_bit_1_struct = Struct(slice_bit_1_format)
     slice_bit_2_format = "<ii"
+    slice_bit_2_struct = Struct(slice_bit_2_format)
 
     def __init__(self, data, data_offset=0):
         Chunk.__init__(self, data, data_offset)
         slice_offset = data_offset + 6
 
-        slice_chunk_struct = Struct(SliceChunk.slice_chunk_format)
-        num_slices, self.flags, self.reserved = slice_chunk_struct.unpack_from(
+        num_slices, self.flags, self.reserved = self.slice_chunk_struct.unpack_from(
             data, slice_offset
         )
-        slice_offset += slice_chunk_struct.size
+        slice_offset += self.slice_chunk_struct.size
 
         string_size, self.name = parse_string(data, slice_offset)
         slice_offset += string_size
@@ -283,7 +488,6 @@ class SliceChunk(Chunk):
         self.slices = []
 
         for i in range(num_slices):
-            slice_struct = Struct(SliceChunk.slice_format)
             slice = {}
             (
                 slice["start_frame"],
@@ -291,24 +495,22 @@ class SliceChunk(Chunk):
                 slice["y"],
                 slice["width"],
                 slice["height"],
-            ) = slice_struct.unpack_from(data, slice_offset)
-            slice_offset += slice_struct.size
+            ) = self.slice_struct.unpack_from(data, slice_offset)
+            slice_offset += self.slice_struct.size
             if self.flags & 1 != 0:
-                slice_bit_1_struct = Struct(SliceChunk.slice_bit_1_format)
                 slice["center"] = {}
                 (
                     slice["center"]["x"],
                     slice["center"]["y"],
                     slice["center"]["width"],
                     slice["center"]["height"],
-                ) = slice_bit_1_struct.unpack_from(data, slice_offset)
-                slice_offset += slice_bit_1_struct.size
+                ) = self.slice_bit_1_struct.unpack_from(data, slice_offset)
+                slice_offset += self.slice_bit_1_struct.size
             if self.flags & 2 != 0:
-                slice_bit_2_struct = Struct(SliceChunk.slice_bit_2_format)
                 slice["pivot"] = {}
                 (
                     slice["pivot"]["x"],
                     slice["pivot"]["y"],
-                ) = slice_bit_2_struct.unpack_from(data, slice_offset)
-                slice_offset += slice_bit_2_struct.size
+                ) = self.slice_bit_2_struct.unpack_from(data, slice_offset)
+                slice_offset += self.slice_bit_2_struct.size
             self.slices.append(slice)
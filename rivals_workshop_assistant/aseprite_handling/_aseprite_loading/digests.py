@@ -0,0 +1,148 @@
+"""Digests of the raw bytes of aseprite frames, used to tell when an anim changed.
+They're read straight from the file, without parsing or decompressing chunks."""
+
+from hashlib import blake2b
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from .chunks import Chunk, UINT16
+from .headers import Header, Frame
+
+DIGEST_SIZE = 16
+DIGEST_PREFIX = "b2:"
+
+CEL_CHUNK_TYPE = 0x2005
+CEL_EXTRA_CHUNK_TYPE = 0x2006
+FRAME_TAGS_CHUNK_TYPE = 0x2018
+USER_DATA_CHUNK_TYPE = 0x2020
+FRAME_CHUNK_TYPES = {CEL_CHUNK_TYPE, CEL_EXTRA_CHUNK_TYPE}
+
+LINKED_CEL_TYPE = 1
+CEL_LAYER_OFFSET = Chunk.chunk_struct.size
+CEL_TYPE_OFFSET = Chunk.chunk_struct.size + 7
+LINKED_FRAME_OFFSET = Chunk.chunk_struct.size + 16
+
+# The file size and frame count change whenever any frame is added or edited.
+HEADER_DIGEST_START = 8
+
+
+def iter_chunk_spans(data, frame_offset: int) -> Iterator[Tuple[int, int, int]]:
+    """Yield the type, start, and end of each chunk in the frame at frame_offset."""
+    frame = Frame(data, frame_offset)
+    data_offset = frame_offset + Frame.frame_size
+    chunk_header_struct = Chunk.chunk_struct
+    for c in range(frame.num_chunks):
+        chunk_size, chunk_type = chunk_header_struct.unpack_from(data, data_offset)
+        yield chunk_type, data_offset, data_offset + chunk_size
+        data_offset += chunk_size
+
+
+def digest_file_settings(data, first_frame_offset: int) -> bytes:
+    """Digest what the pixels of every frame depend on.
+    That's the header, and the layer and palette chunks stored in frame 0.
+    Tags are left out, since they don't change any pixels."""
+    digest = blake2b(digest_size=DIGEST_SIZE)
+    with memoryview(data) as view:
+        digest.update(view[HEADER_DIGEST_START : Header.header_size])
+        in_tag_user_data = False
+        for chunk_type, start, end in iter_chunk_spans(data, first_frame_offset):
+            if chunk_type == USER_DATA_CHUNK_TYPE and in_tag_user_data:
+                continue
+            in_tag_user_data = chunk_type == FRAME_TAGS_CHUNK_TYPE
+            if chunk_type in FRAME_CHUNK_TYPES or in_tag_user_data:
+                continue
+            digest.update(view[start:end])
+    return digest.digest()
+
+
+def digest_frame(
+    data,
+    frame_offset: int,
+    frame_index: int,
+    get_frame_digest: Callable[[int], bytes],
+) -> bytes:
+    """Digest the cels of a frame.
+    Linked cels add the digest of the frame they link to."""
+    digest = blake2b(digest_size=DIGEST_SIZE)
+    with memoryview(data) as view:
+        for chunk_type, start, end in iter_chunk_spans(data, frame_offset):
+            if chunk_type not in FRAME_CHUNK_TYPES:
+                continue
+            digest.update(view[start:end])
+            if chunk_type != CEL_CHUNK_TYPE:
+                continue
+            (cel_type,) = UINT16.unpack_from(data, start + CEL_TYPE_OFFSET)
+            if cel_type == LINKED_CEL_TYPE:
+                (linked_frame,) = UINT16.unpack_from(data, start + LINKED_FRAME_OFFSET)
+                # Cels can only link to earlier frames.
+                if linked_frame < frame_index:
+                    digest.update(get_frame_digest(linked_frame))
+    return digest.digest()
+
+
+def digest_frame_layers(
+    data,
+    frame_offset: int,
+    frame_index: int,
+    image_layer_indices: Dict[int, int],
+    get_layer_digests: Callable[[int], Dict[int, bytes]],
+) -> Dict[int, bytes]:
+    """Digest the cels of a frame separately for each layer.
+    Cels are keyed by image layer index, which leaves out groups. image_layer_indices
+    maps the layer indices in cel chunks to those. Cels of other layers are skipped.
+    Linked cels add the digest of the cel they link to."""
+    digests = {}
+    with memoryview(data) as view:
+        digest = None
+        for chunk_type, start, end in iter_chunk_spans(data, frame_offset):
+            if chunk_type == CEL_EXTRA_CHUNK_TYPE and digest is not None:
+                # Extra cel data belongs to the cel before it.
+                digest.update(view[start:end])
+                continue
+            digest = None
+            if chunk_type != CEL_CHUNK_TYPE:
+                continue
+            (layer_index,) = UINT16.unpack_from(data, start + CEL_LAYER_OFFSET)
+            if layer_index not in image_layer_indices:
+                continue
+            image_layer_index = image_layer_indices[layer_index]
+            digest = blake2b(view[start:end], digest_size=DIGEST_SIZE)
+            digests[image_layer_index] = digest
+            (cel_type,) = UINT16.unpack_from(data, start + CEL_TYPE_OFFSET)
+            if cel_type != LINKED_CEL_TYPE:
+                continue
+            (linked_frame,) = UINT16.unpack_from(data, start + LINKED_FRAME_OFFSET)
+            # Cels can only link to earlier frames.
+            if linked_frame < frame_index:
+                linked_digest = get_layer_digests(linked_frame).get(image_layer_index)
+                if linked_digest is not None:
+                    digest.update(linked_digest)
+    return {
+        image_layer_index: digest.digest()
+        for image_layer_index, digest in digests.items()
+    }
+
+
+def combine_layer_digests(
+    layer_digests: Dict[int, bytes], image_layer_indices: Iterable[int]
+) -> bytes:
+    """Combine the digests of a frame's cels in only the given layers."""
+    digest = blake2b(digest_size=DIGEST_SIZE)
+    for image_layer_index in sorted(set(image_layer_indices)):
+        layer_digest = layer_digests.get(image_layer_index)
+        if layer_digest is not None:
+            digest.update(UINT16.pack(image_layer_index))
+            digest.update(layer_digest)
+    return digest.digest()
+
+
+def combine_digests(settings_digest: bytes, frame_digests: List[bytes]) -> str:
+    """Combine the digests of an anim's frames into the hash saved for it."""
+    digest = blake2b(settings_digest, digest_size=DIGEST_SIZE)
+    for frame_digest in frame_digests:
+        digest.update(frame_digest)
+    return DIGEST_PREFIX + digest.hexdigest()
+
+
+def is_digest(anim_hash) -> bool:
+    """If the anim hash was made from frame digests, rather than by older versions."""
+    return isinstance(anim_hash, str) and anim_hash.startswith(DIGEST_PREFIX)
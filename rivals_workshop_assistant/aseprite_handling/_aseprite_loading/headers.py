@@ -2,12 +2,24 @@ from struct import Struct
 
 
 class Header(object):
+    __slots__ = (
+        "filesize",
+        "magic_number",
+        "num_frames",
+        "width",
+        "height",
+        "color_depth",
+        "flags",
+        "palette_mask",
+        "num_colors",
+        "pixel_width",
+        "pixel_height",
+    )
     header_format = '<IHHHHHI2x8xB3xHBB92x'
+    header_struct = Struct(header_format)
     header_size = 128
 
     def __init__(self, data, data_offset = 0):
-        header_struct = Struct(Header.header_format)
-
         (
             self.filesize,
             self.magic_number,
@@ -20,23 +32,32 @@ class Header(object):
             self.num_colors,
             self.pixel_width,
             self.pixel_height
-        ) = header_struct.unpack_from(data, data_offset)
+        ) = Header.header_struct.unpack_from(data, data_offset)
 
         if self.magic_number != 0xA5E0:
             raise ValueError('Incorrect magic number, expected {:x}, got {:x}'.format(0xA5E0, self.magic_number))
 
 class Frame(object):
+    __slots__ = ("size", "magic_number", "num_chunks", "frame_duration", "chunks")
     frame_format = '<IHHH6x'
+    frame_struct = Struct(frame_format)
     frame_size = 16
 
     def __init__(self, data, data_offset = 0):
-        frame_struct = Struct(Frame.frame_format)
         (
             self.size,
             self.magic_number,
             self.num_chunks,
             self.frame_duration
-        ) = frame_struct.unpack_from(data, data_offset)
+        ) = Frame.frame_struct.unpack_from(data, data_offset)
 
         if self.magic_number != 0xF1FA:
             raise ValueError('Incorrect magic number, expected {:x}, got {:x}'.format(0xF1FA, self.magic_number))
+
+    def __getstate__(self):
+        # Pickles like older versions' Frames did, since anim hashes were made from them.
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
@@ -0,0 +1,192 @@
+"""Decodes cel pixels into numpy arrays, and composites layers into frame images.
+Images are height x width x 4 arrays of uint8 RGBA, with straight alpha."""
+
+from typing import List
+
+import numpy as np
+
+from .chunks import (
+    LayerChunk,
+    OldPaleteChunk_0x0004,
+    OldPaleteChunk_0x0011,
+    PaletteChunk,
+)
+
+RGBA_COLOR_DEPTH = 32
+GRAYSCALE_COLOR_DEPTH = 16
+INDEXED_COLOR_DEPTH = 8
+
+BACKGROUND_LAYER_FLAG = 8
+
+
+def make_palette_table(chunks) -> np.ndarray:
+    """Return a 256 x 4 RGBA lookup table from the palette chunks of frame 0.
+    New palette chunks take priority over old ones, like in Aseprite."""
+    table = np.zeros((256, 4), dtype=np.uint8)
+    new_palettes = [chunk for chunk in chunks if isinstance(chunk, PaletteChunk)]
+    if new_palettes:
+        for palette in new_palettes:
+            for index, color in enumerate(palette.colors, palette.first_color_index):
+                table[index] = (color.red, color.green, color.blue, color.alpha)
+        return table
+
+    for chunk in chunks:
+        if not isinstance(chunk, OldPaleteChunk_0x0004):
+            continue
+        index = 0
+        for packet in chunk.packets:
+            index += packet["previous_packet_skip"]
+            for red, green, blue in packet["colors"]:
+                if isinstance(chunk, OldPaleteChunk_0x0011):
+                    red, green, blue = (
+                        _scale_6_bit(value) for value in (red, green, blue)
+                    )
+                table[index % 256] = (red, green, blue, 255)
+                index += 1
+    return table
+
+
+def _scale_6_bit(value: int) -> int:
+    return value * 255 // 63
+
+
+def decode_pixels(
+    pixels: bytes,
+    width: int,
+    height: int,
+    color_depth: int,
+    palette: np.ndarray = None,
+    transparent_index: int = None,
+) -> np.ndarray:
+    """Decode the raw pixels of a cel into an RGBA image.
+    Indexed pixels need the palette. Pixels of the transparent index
+    are made fully transparent."""
+    if color_depth == RGBA_COLOR_DEPTH:
+        return np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+    if color_depth == GRAYSCALE_COLOR_DEPTH:
+        value_alpha = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 2)
+        image = np.empty((height, width, 4), dtype=np.uint8)
+        image[..., :3] = value_alpha[..., :1]
+        image[..., 3] = value_alpha[..., 1]
+        return image
+    if color_depth == INDEXED_COLOR_DEPTH:
+        if palette is None:
+            raise ValueError("Indexed pixels can't be decoded without a palette")
+        indices = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width)
+        image = palette[indices]
+        if transparent_index is not None:
+            image[indices == transparent_index, 3] = 0
+        return image
+    raise ValueError(f"Unknown color depth {color_depth}")
+
+
+def _multiply(backdrop, source):
+    return backdrop * source
+
+
+def _screen(backdrop, source):
+    return backdrop + source - backdrop * source
+
+
+def _hard_light(backdrop, source):
+    return np.where(
+        source <= 0.5,
+        _multiply(backdrop, 2 * source),
+        _screen(backdrop, 2 * source - 1),
+    )
+
+
+def _overlay(backdrop, source):
+    return _hard_light(source, backdrop)
+
+
+def _difference(backdrop, source):
+    return np.abs(backdrop - source)
+
+
+def _exclusion(backdrop, source):
+    return backdrop + source - 2 * backdrop * source
+
+
+def _addition(backdrop, source):
+    return np.minimum(backdrop + source, 1)
+
+
+def _subtract(backdrop, source):
+    return np.maximum(backdrop - source, 0)
+
+
+# Aseprite's blend mode ids, for the modes that blend each channel separately.
+BLEND_MODES = {
+    1: _multiply,
+    2: _screen,
+    3: _overlay,
+    4: np.minimum,
+    5: np.maximum,
+    8: _hard_light,
+    10: _difference,
+    11: _exclusion,
+    16: _addition,
+    17: _subtract,
+}
+NORMAL_BLEND_MODE = 0
+
+
+def blend(
+    backdrop: np.ndarray,
+    source: np.ndarray,
+    opacity: float = 1.0,
+    blend_mode: int = NORMAL_BLEND_MODE,
+):
+    """Blend the float RGBA source over the backdrop in place.
+    Both are height x width x 4, with values from 0 to 1.
+    Blend modes that aren't supported blend normally."""
+    source_alpha = source[..., 3:] * opacity
+    backdrop_alpha = backdrop[..., 3:]
+    source_color = source[..., :3]
+    backdrop_color = backdrop[..., :3]
+
+    blend_function = BLEND_MODES.get(blend_mode)
+    if blend_function is not None:
+        # Where there's no backdrop, the source is drawn as-is.
+        source_color = (1 - backdrop_alpha) * source_color + backdrop_alpha * (
+            blend_function(backdrop_color, source_color)
+        )
+
+    out_alpha = source_alpha + backdrop_alpha * (1 - source_alpha)
+    out_color = source_color * source_alpha + backdrop_color * backdrop_alpha * (
+        1 - source_alpha
+    )
+    np.divide(out_color, out_alpha, out=out_color, where=out_alpha > 0)
+    backdrop[..., :3] = out_color
+    backdrop[..., 3:] = out_alpha
+
+
+def composite(
+    width: int,
+    height: int,
+    layer_images: List[tuple],
+) -> np.ndarray:
+    """Composite cel images onto a transparent canvas, bottom layer first.
+    Each layer image is (image, x, y, opacity, blend_mode),
+    with opacity from 0 to 255."""
+    canvas = np.zeros((height, width, 4), dtype=np.float32)
+    for image, x, y, opacity, blend_mode in layer_images:
+        # Clip the cel to the canvas.
+        left, top = max(x, 0), max(y, 0)
+        right = min(x + image.shape[1], width)
+        bottom = min(y + image.shape[0], height)
+        if left >= right or top >= bottom:
+            continue
+        source = image[top - y : bottom - y, left - x : right - x]
+        blend(
+            canvas[top:bottom, left:right],
+            source.astype(np.float32) / 255,
+            opacity=opacity / 255,
+            blend_mode=blend_mode,
+        )
+    return np.rint(canvas * 255).astype(np.uint8)
+
+
+def is_background(layer: LayerChunk) -> bool:
+    return layer.flags & BACKGROUND_LAYER_FLAG != 0
@@ -0,0 +1,85 @@
+"""Remembers which aseprite file each anim is in, so updating scripts only reads
+the aseprite files of the attacks that changed."""
+
+from typing import List, Optional, TYPE_CHECKING, Dict, Iterable
+
+from rivals_workshop_assistant.paths import ATTACKS_FOLDER
+
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling.anims import Anim
+    from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
+    from rivals_workshop_assistant.script_handling.script_mod import Script
+
+ASEPRITE_FIELD = "aseprite"
+START_FIELD = "start"
+END_FIELD = "end"
+
+
+def get_script_anim_name(anim_name: str) -> str:
+    """Return the name of the attack script the anim belongs to."""
+    # HURTBOX just marks that the attack gets a hurtbox.
+    return anim_name.replace("HURTBOX", "").strip()
+
+
+def get_anim_name_for_script(script: "Script") -> Optional[str]:
+    """Return the name of the anim the script gets windows from.
+    None if it isn't an attack script."""
+    if script.path.parent.name != ATTACKS_FOLDER.name:
+        return None
+    return script.path.stem
+
+
+def get_anims_by_script_name(anims: Iterable["Anim"]) -> Dict[str, "Anim"]:
+    """If anims share a name, the first one is used."""
+    anims_by_script_name = {}
+    for anim in anims:
+        anims_by_script_name.setdefault(get_script_anim_name(anim.name), anim)
+    return anims_by_script_name
+
+
+def get_aseprites_for_scripts(
+    scripts: List["Script"],
+    aseprites: List["Aseprite"],
+    anim_index: Optional[dict],
+) -> List["Aseprite"]:
+    """Return the aseprite files with anims the scripts need.
+    Changed aseprite files are always needed, since their windows may have moved.
+    Unchanged ones are only needed if the index has the anim of a changed attack
+    script in them. Without an index, every file is needed."""
+    if anim_index is None:
+        return list(aseprites)
+    needed_keys = set()
+    for script in scripts:
+        if not script.is_fresh:
+            continue
+        entry = anim_index.get(get_anim_name_for_script(script))
+        if entry is not None:
+            needed_keys.add(entry[ASEPRITE_FIELD])
+    return [
+        aseprite
+        for aseprite in aseprites
+        if aseprite.is_fresh or aseprite.cache_key in needed_keys
+    ]
+
+
+def update_anim_index(
+    anim_index: dict, read_aseprites: List["Aseprite"], aseprites: List["Aseprite"]
+):
+    """Replace the entries of the read aseprite files with their current anims.
+    Entries of aseprite files that no longer exist are dropped."""
+    existing_keys = {aseprite.cache_key for aseprite in aseprites}
+    read_keys = {aseprite.cache_key for aseprite in read_aseprites}
+    for name in list(anim_index):
+        key = anim_index[name][ASEPRITE_FIELD]
+        if key in read_keys or key not in existing_keys:
+            del anim_index[name]
+    for aseprite in read_aseprites:
+        for anim in aseprite.anims:
+            anim_index.setdefault(
+                get_script_anim_name(anim.name),
+                {
+                    ASEPRITE_FIELD: aseprite.cache_key,
+                    START_FIELD: anim.start,
+                    END_FIELD: anim.end,
+                },
+            )
@@ -1,32 +1,53 @@
 import asyncio
+import functools
 import hashlib
 import itertools
+import json
 import os
 import pickle
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, TYPE_CHECKING, Dict
+from typing import List, TYPE_CHECKING, Dict, Optional, Set, Tuple
 
 from loguru import logger
 
-from rivals_workshop_assistant import paths
+from rivals_workshop_assistant import aseprite_cache_mod, paths, sprite_outputs_mod
+from rivals_workshop_assistant.assistant_config_mod import ExportBackend
 from rivals_workshop_assistant.aseprite_handling.windows import (
     Window,
 )
 from rivals_workshop_assistant.aseprite_handling._aseprite_loading.chunks import (
     LayerChunk,
 )
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.digests import (
+    is_digest,
+)
+from rivals_workshop_assistant.aseprite_handling.export_scheduler import (
+    ExportScheduler,
+)
+from rivals_workshop_assistant.aseprite_handling.lua_exports import (
+    LuaExportJob,
+    format_param_value,
+    run_lua_export,
+)
 from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
     EXPORT_ASEPRITE_LUA_PATH,
     CREATE_HURTBOX_LUA_PATH,
-    supply_lua_script,
 )
 from rivals_workshop_assistant.aseprite_handling.constants import (
     ANIMS_WHICH_CARE_ABOUT_SMALL_SPRITES,
     does_anim_get_a_hurtbox,
 )
+from rivals_workshop_assistant.aseprite_handling.native_export import (
+    make_strip,
+    make_hurtbox_strip,
+    save_strip,
+    load_strip,
+    make_export_key,
+    patch_strip,
+)
+from rivals_workshop_assistant.aseprite_handling.sprite_cache import SpriteCache
 from rivals_workshop_assistant.aseprite_handling.tag_objects import TagObject
-from rivals_workshop_assistant.paths import ASEPRITE_LUA_SCRIPTS_FOLDER
 
 if TYPE_CHECKING:
     from rivals_workshop_assistant.aseprite_handling.aseprites import (
@@ -39,6 +60,22 @@ if TYPE_CHECKING:
     )
 
 
+# How many exports per process may wait to run before reading more files waits.
+MAX_PENDING_EXPORTS_PER_PROCESS = 4
+
+
+@dataclass
+class AnimExport:
+    """One spritesheet an anim is exported to."""
+
+    base_name: str
+    target_layers: List[LayerChunk]
+    scale: int
+    is_hurtbox: bool = False
+    # What the spritesheet is made from. None if it can't be known.
+    digest: Optional[str] = None
+
+
 class Anim(TagObject):
     def __init__(
         self,
@@ -50,9 +87,17 @@ class Anim(TagObject):
         file_is_fresh=False,
         anim_hashes: Dict[str, str] = None,
         frame_hash=None,  # for testing overrides
+        sprite_outputs: Dict[str, str] = None,
+        window_hashes: Dict[str, str] = None,
     ):
         """A part of an aseprite file representing a single spritesheet.
         An Aseprite file may contain multiple anims.
+        sprite_outputs has the file names the aseprite file's anims were exported
+        to, by export name. Without it, old spritesheets are found by searching.
+        is_fresh is whether the anim's pixels changed, which is what exports use.
+        windows_are_fresh is whether its windows changed, which is what script
+        injection uses. Each is tracked by its own hash, which is only saved
+        once what uses it is done.
         """
         super().__init__(name, start, end)
         self.content = content
@@ -60,15 +105,32 @@ class Anim(TagObject):
             windows = []
         if anim_hashes is None:
             anim_hashes = {}
+        if window_hashes is None:
+            window_hashes = {}
         self.windows = windows
         self.anim_hashes = anim_hashes
+        self.window_hashes = window_hashes
+        self.sprite_outputs = sprite_outputs
         self.file_is_fresh = file_is_fresh
+        # Keys of the scheduled exports the anim's spritesheets wait on.
+        self._export_job_keys: Set[str] = set()
+        # What to record in sprite_outputs for each export, by export name, with
+        # the key of the scheduled export it waits on. Recorded in finish_exports.
+        # None for exports whose old spritesheet is gone, with no new one.
+        self._pending_outputs: Dict[str, Tuple[Optional[str], Optional[dict]]] = {}
 
         self._frame_hash = frame_hash
-        if self._frame_hash is None:
+        if self._frame_hash is None and self.file_is_fresh:
+            # An unchanged file keeps its previous hashes,
+            # so its frames don't need to be read.
             self._frame_hash = self._get_frame_hash()
         self.is_fresh = self._get_is_fresh()
-        self._save_hash()
+
+        self._window_hash = self._get_window_hash() if self.file_is_fresh else None
+        self.windows_are_fresh = (
+            self._window_hash is not None
+            and self.window_hashes.get(self.name) != self._window_hash
+        )
 
     @property
     def num_frames(self):
@@ -91,12 +153,68 @@ class Anim(TagObject):
     def __hash__(self):
         return hash(self.__get_keys())
 
-    async def save(
+    def save(
         self,
         path_params: "AsepritePathParams",
         config_params: "AsepriteConfigParams",
         aseprite_file_path: Path,
+        scheduler: ExportScheduler,
+        sprite_cache: SpriteCache = None,
     ):
+        """Export the anim's spritesheets with Aseprite, one process each.
+        The exports are only scheduled, and run when the scheduler runs.
+        Spritesheets in the sprite cache are copied instead of exported.
+        Call finish_exports once the scheduler is done."""
+        jobs = self.get_lua_export_jobs(
+            path_params, config_params, aseprite_file_path, sprite_cache
+        )
+        for job in jobs:
+            scheduler.add(
+                key=_get_job_key(job),
+                run=functools.partial(
+                    run_lua_export,
+                    path_params,
+                    job,
+                    timeout=config_params.export_timeout,
+                    sprite_cache=sprite_cache,
+                ),
+            )
+
+    def save_native(
+        self,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+        aseprite_file_path: Path,
+        job_key: str,
+        sprite_cache: SpriteCache = None,
+    ) -> bool:
+        """Export the anim's changed spritesheets without Aseprite,
+        and return if they all succeeded.
+        job_key is the key of the scheduled export this runs in."""
+        self._export_job_keys.add(job_key)
+        # Not all, so every export is tried.
+        return all(
+            [
+                self._run_native_export(
+                    path_params=path_params,
+                    export=export,
+                    job_key=job_key,
+                    cache_key=self._get_sprite_cache_key(export, sprite_cache),
+                    sprite_cache=sprite_cache,
+                )
+                for export in self.get_fresh_exports(
+                    path_params, config_params, aseprite_file_path
+                )
+            ]
+        )
+
+    def get_exports(
+        self,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+        aseprite_file_path: Path,
+    ) -> List["AnimExport"]:
+        """Return every spritesheet the anim is exported to."""
         root_name = get_anim_file_name_root(
             path_params.root_dir, aseprite_file_path, self.save_name.lower()
         )
@@ -127,105 +245,313 @@ class Anim(TagObject):
         ]
         all_run_params = normal_run_params + splits_run_params + opts_run_params
 
-        coroutines = []
-
+        exports = []
         for run_params in all_run_params:
-            target_layers = _get_layer_indices(run_params.target_layers)
-            coroutines.append(
-                self._run_lua_export(
-                    path_params=path_params,
-                    aseprite_file_path=aseprite_file_path,
+            exports.append(
+                AnimExport(
                     base_name=run_params.name,
-                    script_name=EXPORT_ASEPRITE_LUA_PATH,
-                    lua_params={
-                        "scale": scale_param,
-                        "targetLayers": target_layers,
-                    },
+                    target_layers=run_params.target_layers,
+                    scale=scale_param,
                 )
             )
-
             if config_params.hurtboxes_enabled and self.gets_a_hurtbox():
-                coroutines.append(
-                    self._run_lua_export(
-                        path_params=path_params,
-                        aseprite_file_path=aseprite_file_path,
+                exports.append(
+                    AnimExport(
                         base_name=f"{run_params.name}_hurt",
-                        script_name=CREATE_HURTBOX_LUA_PATH,
-                        lua_params={
-                            "scale": hurtbox_scale_param,
-                            "targetLayers": target_layers,
-                            "hurtboxLayer": self.content.layers.hurtbox,
-                            "hurtmaskLayer": self.content.layers.hurtmask,
-                        },
+                        target_layers=run_params.target_layers,
+                        scale=hurtbox_scale_param,
+                        is_hurtbox=True,
                     )
                 )
-        await asyncio.gather(*coroutines)
+        return exports
 
-    async def _run_lua_export(
+    def get_fresh_exports(
         self,
         path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
         aseprite_file_path: Path,
-        base_name: str,
-        script_name: str,
-        lua_params: dict = None,
-    ):
-        full_script_path = (
-            path_params.exe_dir / ASEPRITE_LUA_SCRIPTS_FOLDER / script_name
-        ).absolute()
-        supply_lua_script(
-            path=full_script_path,
+    ) -> List["AnimExport"]:
+        """Return the spritesheets whose layers changed since they were exported,
+        with their digests. Editing one OPT layer only re-exports that opt."""
+        fresh_exports = []
+        for export in self.get_exports(path_params, config_params, aseprite_file_path):
+            export.digest = self._get_export_digest(export)
+            if self._is_export_fresh(path_params.root_dir, export):
+                fresh_exports.append(export)
+            else:
+                logger.debug(f"Skipping {export.base_name}, since it didn't change.")
+        return fresh_exports
+
+    def _is_export_fresh(self, root_dir: Path, export: "AnimExport") -> bool:
+        previous = self._get_previous_output(export.base_name)
+        if (
+            export.digest is None
+            or previous is None
+            or previous.get(sprite_outputs_mod.DIGEST_FIELD) != export.digest
+        ):
+            return True
+        # Export again if the spritesheet was deleted, or never made.
+        return not (
+            root_dir / paths.SPRITES_FOLDER / previous[sprite_outputs_mod.FILE_FIELD]
+        ).exists()
+
+    def _get_export_digest(self, export: "AnimExport") -> Optional[str]:
+        """Return a digest of only the layers the export is made from,
+        and how it's made from them. None if the file can't give one."""
+        if not is_digest(self._frame_hash):
+            return None
+        try:
+            layers_digest = self.content.file_data.get_layers_digest(
+                self.start, self.end, self._get_digest_layer_indices(export)
+            )
+        except (AttributeError, ValueError, IndexError, KeyError):
+            return None
+        content = json.dumps(
+            [
+                layers_digest,
+                [layer.layer_index for layer in export.target_layers],
+                export.scale,
+                export.is_hurtbox,
+            ]
         )
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def _get_digest_layer_indices(self, export: "AnimExport") -> List[int]:
+        """Return the layers whose cels the export is drawn from.
+        Hurtboxes also use the HURTBOX and HURTMASK layers."""
+        layer_indices = [layer.layer_index for layer in export.target_layers]
+        if export.is_hurtbox:
+            layer_indices += [
+                layer.layer_index
+                for layer in (self.content.layers.hurtbox, self.content.layers.hurtmask)
+                if layer is not None
+            ]
+        return layer_indices
 
-        if lua_params is None:
-            lua_params = {}
+    def get_lua_export_jobs(
+        self,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+        aseprite_file_path: Path,
+        sprite_cache: SpriteCache = None,
+        job_key: Optional[str] = None,
+    ) -> List[LuaExportJob]:
+        """Return the lua script runs that export the anim's changed spritesheets.
+        Their old spritesheets are deleted, and the ones in the sprite cache
+        are copied from it instead of getting a job.
+        job_key is the key the jobs are scheduled with, if they're run together.
+        Otherwise each is scheduled by the name of its spritesheet."""
+        jobs = []
+        for export in self.get_fresh_exports(
+            path_params, config_params, aseprite_file_path
+        ):
+            dest = self._prepare_export_dest(path_params.root_dir, export)
+            output = {
+                sprite_outputs_mod.FILE_FIELD: dest.name,
+                sprite_outputs_mod.DIGEST_FIELD: export.digest,
+            }
+            cache_key = self._get_sprite_cache_key(export, sprite_cache)
+            if cache_key is not None and sprite_cache.fetch(cache_key, dest):
+                self._pending_outputs[export.base_name] = (None, output)
+                continue
+            lua_params = {
+                "filename": aseprite_file_path,
+                "dest": dest,
+                "startFrame": self.start + 1,
+                "endFrame": self.end + 1,
+                "scale": export.scale,
+                "targetLayers": _get_layer_indices(export.target_layers),
+            }
+            if export.is_hurtbox:
+                script_name = CREATE_HURTBOX_LUA_PATH
+                lua_params["hurtboxLayer"] = self.content.layers.hurtbox
+                lua_params["hurtmaskLayer"] = self.content.layers.hurtmask
+            else:
+                script_name = EXPORT_ASEPRITE_LUA_PATH
+            job = LuaExportJob(
+                script_name=script_name,
+                params={
+                    key: format_param_value(value) for key, value in lua_params.items()
+                },
+                cache_key=cache_key,
+            )
+            job_key_of_export = job_key or _get_job_key(job)
+            self._export_job_keys.add(job_key_of_export)
+            self._pending_outputs[export.base_name] = (job_key_of_export, output)
+            jobs.append(job)
+        return jobs
+
+    def _get_sprite_cache_key(
+        self, export: "AnimExport", sprite_cache: Optional[SpriteCache]
+    ) -> Optional[str]:
+        """None if the export can't be cached."""
+        if sprite_cache is None or export.digest is None:
+            return None
+        return sprite_cache.make_key(export_digest=export.digest)
+
+    def _run_native_export(
+        self,
+        path_params: "AsepritePathParams",
+        export: "AnimExport",
+        job_key: str,
+        cache_key: Optional[str] = None,
+        sprite_cache: SpriteCache = None,
+    ) -> bool:
+        """Return if the export succeeded.
+        Spritesheets are copied from the sprite cache if they're there.
+        Otherwise, if only some frames changed since the last export,
+        just those frames are redrawn."""
+        if export.is_hurtbox:
+            make_strip_function = make_hurtbox_strip
+        else:
+            make_strip_function = make_strip
+        layer_indices = [layer.layer_index for layer in export.target_layers]
+        export_key, frame_digests = self._get_native_export_digests(export)
+        previous = self._get_previous_output(export.base_name)
+
+        dest = None
+        fetched = False
+        if cache_key is None or not sprite_cache.has(cache_key):
+            dest = self._patch_native_export(
+                path_params.root_dir,
+                previous,
+                export_key=export_key,
+                frame_digests=frame_digests,
+                layer_indices=layer_indices,
+                scale=export.scale,
+                make_strip_function=make_strip_function,
+            )
+        if dest is None:
+            dest = self._prepare_export_dest(path_params.root_dir, export)
+            fetched = cache_key is not None and sprite_cache.fetch(cache_key, dest)
+            if not fetched:
+                try:
+                    strip = make_strip_function(
+                        self.content.get_raw_file(),
+                        start=self.start,
+                        end=self.end,
+                        layer_indices=layer_indices,
+                        scale=export.scale,
+                    )
+                    save_strip(strip, dest)
+                    logger.debug(f"Exported {dest}")
+                except (ValueError, OSError) as e:
+                    logger.error(f"Exporting {export.base_name} failed. {e!r}")
+                    self._pending_outputs[export.base_name] = (job_key, None)
+                    return False
+        if cache_key is not None and not fetched:
+            sprite_cache.store(cache_key, dest)
+        output = {
+            sprite_outputs_mod.FILE_FIELD: dest.name,
+            sprite_outputs_mod.DIGEST_FIELD: export.digest,
+        }
+        if export_key is not None:
+            output[sprite_outputs_mod.EXPORT_KEY_FIELD] = export_key
+            output[sprite_outputs_mod.FRAME_DIGESTS_FIELD] = frame_digests
+        self._pending_outputs[export.base_name] = (job_key, output)
+        return True
+
+    def _patch_native_export(
+        self,
+        root_dir: Path,
+        previous: Optional[dict],
+        export_key: Optional[str],
+        frame_digests: Optional[List[str]],
+        layer_indices: List[int],
+        scale: int,
+        make_strip_function,
+    ) -> Optional[Path]:
+        """Redraw the frames that changed since the previous export in place,
+        and return its path. None if it can't be patched."""
+        if (
+            previous is None
+            or export_key is None
+            or previous.get(sprite_outputs_mod.EXPORT_KEY_FIELD) != export_key
+        ):
+            return None
+        previous_digests = previous.get(sprite_outputs_mod.FRAME_DIGESTS_FIELD)
+        if previous_digests is None or len(previous_digests) != len(frame_digests):
+            return None
+        changed_indices = [
+            self.start + offset
+            for offset, (previous_digest, frame_digest) in enumerate(
+                zip(previous_digests, frame_digests)
+            )
+            if previous_digest != frame_digest
+        ]
+        if len(changed_indices) == len(frame_digests):
+            # Everything changed, so there's nothing to keep.
+            return None
 
-        _delete_paths_from_glob(
-            path_params.root_dir,
-            f"{base_name}_strip*.png",
-        )
+        path = root_dir / paths.SPRITES_FOLDER / previous[sprite_outputs_mod.FILE_FIELD]
+        try:
+            strip = patch_strip(
+                load_strip(path),
+                self.content.get_raw_file(),
+                start=self.start,
+                end=self.end,
+                changed_indices=changed_indices,
+                layer_indices=layer_indices,
+                scale=scale,
+                make_strip_function=make_strip_function,
+            )
+            if strip is None:
+                return None
+            if changed_indices:
+                save_strip(strip, path)
+        except (ValueError, OSError) as e:
+            logger.debug(f"Couldn't patch {path}, so exporting it fully. {e!r}")
+            return None
+        logger.debug(f"Redrew {len(changed_indices)} frames of {path}")
+        return path
+
+    def _get_native_export_digests(self, export: "AnimExport") -> tuple:
+        """Return the export key and frame digests of the export,
+        or None for both if the file can't give them.
+        Frame digests only cover the layers the export is drawn from."""
+        file_data = self.content.file_data
+        digest_layer_indices = self._get_digest_layer_indices(export)
+        try:
+            export_key = make_export_key(
+                file_data.get_settings_digest(),
+                layer_indices=[layer.layer_index for layer in export.target_layers],
+                scale=export.scale,
+                is_hurtbox=export.is_hurtbox,
+            )
+            frame_digests = [
+                file_data.get_layers_frame_digest(index, digest_layer_indices).hex()
+                for index in range(self.start, self.end + 1)
+            ]
+        except (AttributeError, ValueError, IndexError, KeyError):
+            return None, None
+        return export_key, frame_digests
+
+    def _get_previous_output(self, base_name: str) -> Optional[dict]:
+        if self.sprite_outputs is None:
+            return None
+        return self.sprite_outputs.get(base_name)
+
+    def _prepare_export_dest(self, root_dir: Path, export: "AnimExport") -> Path:
+        """Delete the export's old spritesheets, and return the path for the new one."""
+        base_name = export.base_name
+        previous = self._get_previous_output(base_name)
+        if previous is None:
+            _delete_paths_from_glob(
+                root_dir,
+                f"{base_name}_strip*.png",
+            )
+        else:
+            previous_path = (
+                root_dir
+                / paths.SPRITES_FOLDER
+                / previous[sprite_outputs_mod.FILE_FIELD]
+            )
+            previous_path.unlink(missing_ok=True)
 
         dest_name = f"{base_name}_strip{self.num_frames}.png"
-        dest = path_params.root_dir / paths.SPRITES_FOLDER / dest_name
+        dest = root_dir / paths.SPRITES_FOLDER / dest_name
         dest.parent.mkdir(parents=True, exist_ok=True)
-
-        command_parts = (
-            [
-                f'"{path_params.aseprite_program_path}"',
-                "-b",
-                _format_param("filename", aseprite_file_path),
-                _format_param("dest", dest),
-                _format_param("startFrame", self.start + 1),
-                _format_param("endFrame", self.end + 1),
-            ]
-            + [_format_param(key, value) for key, value in lua_params.items()]
-            + [
-                f'-script "{full_script_path}"',
-            ]
-        )
-        export_command = " ".join(command_parts)
-        try:
-            proc = await asyncio.create_subprocess_shell(
-                export_command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            stdout, stderr = await proc.communicate()
-            logger.debug(f"Ran lua script: {export_command}")
-            if stdout:
-                logger.debug(f"[stdout] {stdout}")
-            if proc.returncode != 0:
-                logger.error(f"Lua script command failed.")
-                if stderr:
-                    logger.error(f"[stderr] {stderr.decode()}")
-            elif not aseprite_file_path.exists():
-                logger.error(
-                    f"Exported aseprite file {aseprite_file_path} not found, "
-                    f"although no error from aseprite."
-                )
-        except FileNotFoundError:
-            logger.error(f"Aseprite not found at {path_params.aseprite_program_path}")
-        except PermissionError as e:
-            logger.error(repr(e))
+        return dest
 
     def gets_a_hurtbox(self):
         return does_anim_get_a_hurtbox(self.name)
@@ -238,12 +564,33 @@ class Anim(TagObject):
             return False
 
         anim_hash_from_previous_run = self.anim_hashes.get(self.name, None)
-        return self._frame_hash != anim_hash_from_previous_run
+        if self._frame_hash == anim_hash_from_previous_run:
+            return False
+        if (
+            anim_hash_from_previous_run is not None
+            and is_digest(self._frame_hash)
+            and not is_digest(anim_hash_from_previous_run)
+        ):
+            # Hashed by an older version. Compare the old way once,
+            # then the new hash is saved in its place.
+            return self._get_legacy_frame_hash() != anim_hash_from_previous_run
+        return True
 
     def _get_frame_hash(self):
+        try:
+            return self.content.file_data.get_anim_digest(self.start, self.end)
+        except (AttributeError, ValueError):
+            logger.error(
+                f"Could not make checksum for "
+                f"{dict({'name': self.name, 'start': self.start, 'end': self.end})}"
+            )
+            return 0
+
+    def _get_legacy_frame_hash(self):
+        """The hash older versions saved, made from the pickled frames."""
         try:
             return hashlib.md5(
-                pickle.dumps(self.content.file_data.frames[self.start : self.end + 1])
+                pickle.dumps(self.content.file_data.get_frames(self.start, self.end))
             ).hexdigest()
         except AttributeError:
             logger.error(
@@ -252,25 +599,66 @@ class Anim(TagObject):
             )
             return 0
 
-    def _save_hash(self):
-        self.anim_hashes[self.name] = self._frame_hash
+    def finish_exports(self, failed_keys: Set[str]) -> bool:
+        """Return if all the anim's exports succeeded, given the keys of the
+        scheduled exports that failed. The spritesheets that were made are
+        recorded in sprite_outputs. If they all were, the anim's pixels are
+        recorded as exported. Otherwise it stays fresh, so the next run tries again."""
+        succeeded = not self._export_job_keys & failed_keys
+        if self.sprite_outputs is not None:
+            self._record_outputs(failed_keys)
+        self._pending_outputs = {}
+        self._export_job_keys = set()
+        if succeeded:
+            self.save_hash()
+        return succeeded
+
+    def _record_outputs(self, failed_keys: Set[str]):
+        for base_name, (job_key, output) in self._pending_outputs.items():
+            if output is None or job_key in failed_keys:
+                # The old spritesheet was deleted before exporting.
+                self.sprite_outputs.pop(base_name, None)
+            else:
+                self.sprite_outputs[base_name] = output
+
+    def save_hash(self):
+        """Record the pixels as exported, so the anim isn't fresh until they change.
+        Only the anims stage should, once they are, or it would skip exports
+        it hasn't done."""
+        if self._frame_hash is not None:
+            self.anim_hashes[self.name] = self._frame_hash
+
+    def _get_window_hash(self) -> str:
+        content = json.dumps(
+            [[window.name, window.start, window.end] for window in self.windows]
+        )
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    @property
+    def window_hash(self) -> str:
+        """Identifies the windows, whether or not they changed."""
+        if self._window_hash is None:
+            return self._get_window_hash()
+        return self._window_hash
+
+    def save_window_hash(self):
+        """Record the windows as injected, so they aren't fresh until they change."""
+        if self._window_hash is not None:
+            self.window_hashes[self.name] = self._window_hash
 
     def __str__(self):
         return self.name
 
 
+def _get_job_key(job: LuaExportJob) -> str:
+    return Path(job.dest).name
+
+
 def _get_layer_indices(layers: List[LayerChunk]) -> List[int]:
     # change to 1-indexing
     return [layer.layer_index + 1 for layer in layers]
 
 
-def _format_param(param_name, value):
-    if isinstance(value, list):
-        # Format list as `a,b,c` instead of `[a, b, c]` for easier parsing.
-        value = ",".join(str(item) for item in value)
-    return f'-script-param {param_name}="{value}"'
-
-
 def _delete_paths_from_glob(root_dir: Path, paths_glob: str):
     """Delete paths matching the glob"""
     old_paths = (root_dir / paths.SPRITES_FOLDER).glob(paths_glob)
@@ -307,18 +695,82 @@ async def save_anims(
     path_params: "AsepritePathParams",
     config_params: "AsepriteConfigParams",
     aseprites: List["Aseprite"],
-):
-    if not path_params.aseprite_program_path:
+    export_durations: Dict[str, float] = None,
+    sprite_cache: SpriteCache = None,
+    sprite_outputs: dict = None,
+) -> List["Aseprite"]:
+    """Return the aseprites whose anims are all exported, counting unchanged ones.
+    Files with a failed export are left out, so they're tried again.
+    export_durations are how long each Aseprite export took on previous runs.
+    They're updated with the durations of this run.
+    If sprite_outputs is given, spritesheets of anims that no longer exist
+    are deleted.
+    Files are read one at a time, and each file's exports start while the next
+    is read. Native exports run on worker threads for that. Once a file's
+    exports are queued, the frames read for them are dropped, or for native
+    exports, once they're done. Reading waits while too many exports are queued."""
+    if (
+        not path_params.aseprite_program_path
+        and config_params.export_backend != ExportBackend.NATIVE
+    ):
         logger.warning(
             "Not saving anims, because no aseprite path has been supplied.\n"
             "Add a path to your aseprite.exe in assistant/assistant_config.yaml to "
             "process aseprite files."
         )
-        return
-    coroutines = []
-    for aseprite in aseprites:
-        if aseprite.is_fresh:
-            coroutines.append(
-                aseprite.save(path_params=path_params, config_params=config_params)
+        return []
+    scheduler = ExportScheduler(
+        max_processes=config_params.export_processes,
+        durations=export_durations,
+        max_pending=config_params.export_processes * MAX_PENDING_EXPORTS_PER_PROCESS,
+    )
+    # Unchanged files get None, so they don't need to be read.
+    expected_exports: Dict[str, Optional[Set[str]]] = {}
+    scheduler.start()
+    try:
+        for aseprite in aseprites:
+            key = aseprite_cache_mod.get_key(path_params.root_dir, aseprite.path)
+            if not aseprite.is_fresh:
+                expected_exports[key] = None
+                continue
+            await scheduler.wait_for_room()
+            await aseprite.save(
+                path_params=path_params,
+                config_params=config_params,
+                scheduler=scheduler,
+                sprite_cache=sprite_cache,
+            )
+            expected_exports[key] = _get_export_names(
+                path_params, config_params, aseprite
             )
-    await asyncio.gather(*coroutines)
+            if config_params.export_backend != ExportBackend.NATIVE:
+                aseprite.content.release()
+            # Let queued exports start before reading the next file.
+            await asyncio.sleep(0)
+    finally:
+        await scheduler.finish()
+    exported = [
+        aseprite
+        for aseprite in aseprites
+        if not aseprite.is_fresh or aseprite.finish_exports(scheduler.failed)
+    ]
+
+    if sprite_outputs is not None:
+        sprite_outputs_mod.sweep_orphans(
+            sprite_outputs,
+            root_dir=path_params.root_dir,
+            expected=expected_exports,
+        )
+    return exported
+
+
+def _get_export_names(
+    path_params: "AsepritePathParams",
+    config_params: "AsepriteConfigParams",
+    aseprite: "Aseprite",
+) -> Set[str]:
+    return {
+        export.base_name
+        for anim in aseprite.anims
+        for export in anim.get_exports(path_params, config_params, aseprite.path)
+    }
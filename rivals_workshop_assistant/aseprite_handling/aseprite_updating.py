@@ -1,4 +1,6 @@
-import subprocess
+import asyncio
+from pathlib import Path
+from typing import Optional
 
 from loguru import logger
 
@@ -6,44 +8,124 @@ from rivals_workshop_assistant.aseprite_handling import (
     AsepritePathParams,
     AsepriteConfigParams,
 )
+from rivals_workshop_assistant.aseprite_handling.anim_index import update_anim_index
 from rivals_workshop_assistant.aseprite_handling.anims import save_anims
 from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
+from rivals_workshop_assistant.aseprite_handling.sprite_cache import make_sprite_cache
 from rivals_workshop_assistant.assistant_config_mod import (
+    ExportBackend,
+    get_aseprite_batch_export,
+    get_aseprite_export_processes,
+    get_aseprite_export_timeout,
     get_aseprite_program_path,
+    get_export_backend,
     get_hurtboxes_enabled,
     get_is_ssl,
+    get_sprite_cache_location,
 )
 from rivals_workshop_assistant.character_config_mod import get_has_small_sprites
+from rivals_workshop_assistant.dotfile_mod import (
+    ANIM_EXPORT_DURATIONS_FIELD,
+    ANIM_INDEX_FIELD,
+    ASEPRITE_VERSION_FIELD,
+)
 from rivals_workshop_assistant.run_context import RunContext
 from rivals_workshop_assistant.script_handling.script_mod import Script
 
+VERSION_TIMEOUT = 30
+
 
 async def update_anims(
     run_context: RunContext,
     scripts: list[Script],
     aseprites: list[Aseprite],
-):
+) -> Optional[list[Aseprite]]:
+    """Return the aseprites whose anims are all exported.
+    None if the anims weren't saved, because there's no way to export them."""
     aseprite_program_path = get_aseprite_program_path(run_context.assistant_config)
+    export_backend = get_export_backend(run_context.assistant_config)
+    if not aseprite_program_path and export_backend != ExportBackend.NATIVE:
+        return None
+    version = None
     if aseprite_program_path:
-        version = subprocess.check_output(
-            [f"{aseprite_program_path}", "--version"]
-        ).decode("utf8")
-
+        version = await get_aseprite_version(
+            aseprite_program_path, dotfile=run_context.dotfile
+        )
         logger.info(f"Aseprite version is: {version}")
-        await save_anims(
-            path_params=AsepritePathParams(
-                exe_dir=run_context.exe_dir,
-                root_dir=run_context.root_dir,
-                aseprite_program_path=aseprite_program_path,
+    exported = await save_anims(
+        path_params=AsepritePathParams(
+            exe_dir=run_context.exe_dir,
+            root_dir=run_context.root_dir,
+            aseprite_program_path=aseprite_program_path,
+        ),
+        config_params=AsepriteConfigParams(
+            has_small_sprites=get_has_small_sprites(
+                scripts=scripts, character_config=run_context.character_config
+            ),
+            hurtboxes_enabled=get_hurtboxes_enabled(
+                assistant_config=run_context.assistant_config
             ),
-            config_params=AsepriteConfigParams(
-                has_small_sprites=get_has_small_sprites(
-                    scripts=scripts, character_config=run_context.character_config
-                ),
-                hurtboxes_enabled=get_hurtboxes_enabled(
-                    assistant_config=run_context.assistant_config
-                ),
-                is_ssl=get_is_ssl(assistant_config=run_context.assistant_config),
+            is_ssl=get_is_ssl(assistant_config=run_context.assistant_config),
+            export_backend=export_backend,
+            batch_export=get_aseprite_batch_export(run_context.assistant_config),
+            export_processes=get_aseprite_export_processes(
+                run_context.assistant_config
             ),
+            export_timeout=get_aseprite_export_timeout(run_context.assistant_config),
+        ),
+        aseprites=aseprites,
+        export_durations=run_context.dotfile.setdefault(
+            ANIM_EXPORT_DURATIONS_FIELD, {}
+        ),
+        sprite_cache=make_sprite_cache(
+            location=get_sprite_cache_location(run_context.assistant_config),
+            root_dir=run_context.root_dir,
+            exe_dir=run_context.exe_dir,
+            export_backend=export_backend,
+            aseprite_version=version,
+        ),
+        sprite_outputs=run_context.sprite_outputs,
+    )
+    # Only an index that has every file can be kept up to date with the changed ones.
+    if ANIM_INDEX_FIELD in run_context.dotfile:
+        update_anim_index(
+            run_context.dotfile[ANIM_INDEX_FIELD],
+            read_aseprites=[aseprite for aseprite in aseprites if aseprite.is_fresh],
             aseprites=aseprites,
         )
+    return exported
+
+
+async def get_aseprite_version(aseprite_program_path: Path, dotfile: dict) -> str:
+    """Return what `aseprite --version` prints.
+    It's saved in the dotfile, and only asked again when the executable changes."""
+    mtime_ns = aseprite_program_path.stat().st_mtime_ns
+    saved = dotfile.get(ASEPRITE_VERSION_FIELD)
+    if (
+        isinstance(saved, dict)
+        and saved.get("path") == aseprite_program_path.as_posix()
+        and saved.get("mtime_ns") == mtime_ns
+    ):
+        return saved["version"]
+
+    proc = await asyncio.create_subprocess_exec(
+        str(aseprite_program_path),
+        "--version",
+        stdout=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), VERSION_TIMEOUT)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        logger.warning(
+            f"Aseprite didn't give its version in {VERSION_TIMEOUT} seconds."
+        )
+        return "unknown"
+    version = stdout.decode("utf8")
+    dotfile[ASEPRITE_VERSION_FIELD] = {
+        "path": aseprite_program_path.as_posix(),
+        "mtime_ns": mtime_ns,
+        "version": version,
+    }
+    return version
@@ -1,18 +1,48 @@
 import asyncio
+import functools
 import itertools
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from pathlib import Path
-from typing import List, TYPE_CHECKING, Iterable, Dict
+from typing import List, TYPE_CHECKING, Iterable, Dict, Optional, Set
 
-from rivals_workshop_assistant import assistant_config_mod
+from loguru import logger
+
+from rivals_workshop_assistant import (
+    assistant_config_mod,
+    aseprite_cache_mod,
+    ledger_mod,
+)
+from rivals_workshop_assistant.assistant_config_mod import ExportBackend
 from rivals_workshop_assistant.aseprite_handling.anims import Anim
+from rivals_workshop_assistant.aseprite_handling.export_scheduler import (
+    ExportScheduler,
+)
+from rivals_workshop_assistant.aseprite_handling.lua_exports import (
+    run_lua_export_batch,
+)
 from rivals_workshop_assistant.aseprite_handling.windows import Window
-from rivals_workshop_assistant.dotfile_mod import get_script_processed_time
+from rivals_workshop_assistant.dotfile_mod import (
+    get_script_processed_time,
+    get_processed_times,
+    WINDOW_HASHES_FIELD,
+)
 from rivals_workshop_assistant.file_handling import File, _get_modified_time
+from rivals_workshop_assistant.file_index import FileKind, index_file
+from rivals_workshop_assistant.ledger_mod import FileState, Stage
 from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
     RawAsepriteFile,
+    MappedAsepriteFile,
+)
+from rivals_workshop_assistant.aseprite_handling.cached_files import (
+    CachedAsepriteFile,
+    make_cache_entry,
+    read_cache_entry,
+    load_layers,
 )
 from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
+from rivals_workshop_assistant.aseprite_handling.sprite_cache import SpriteCache
 from rivals_workshop_assistant.run_context import RunContext
 
 if TYPE_CHECKING:
@@ -40,7 +70,8 @@ class AsepriteFileContent:
         self.is_fresh = is_fresh
 
         if layers is None and file_data is not None:
-            self.layers = AsepriteLayers.from_file(self.file_data)
+            layers = AsepriteLayers.from_file(self.file_data)
+        self.layers = layers
 
     @property
     def num_frames(self):
@@ -50,6 +81,18 @@ class AsepriteFileContent:
     def tags(self):
         return self.file_data.get_tags()
 
+    def get_raw_file(self) -> RawAsepriteFile:
+        """Return the parsed file, opening it if only its cache entry was read."""
+        if isinstance(self.file_data, CachedAsepriteFile):
+            return self.file_data.open()
+        return self.file_data
+
+    def release(self):
+        """Drop the frames read for exporting, and close the file until frames
+        are needed again. Tags, layers and digests are kept."""
+        if self.file_data is not None:
+            self.file_data.release_frames()
+
     @classmethod
     def from_path(
         cls,
@@ -57,10 +100,14 @@ class AsepriteFileContent:
         anim_tag_colors: List["TagColor"],
         window_tag_colors: List["TagColor"],
         is_fresh: bool,
+        metadata_only: bool = False,
+        decompression_threads: int = 1,
     ):
-        with open(path, "rb") as f:
-            contents = f.read()
-            raw_aseprite_file = RawAsepriteFile(contents)
+        raw_aseprite_file = MappedAsepriteFile(
+            path,
+            metadata_only=metadata_only,
+            decompression_workers=decompression_threads,
+        )
         return cls(
             file_data=raw_aseprite_file,
             anim_tag_colors=anim_tag_colors,
@@ -80,25 +127,81 @@ class Aseprite(File):
         content=None,
         anims: Anim = None,
         anim_hashes: Dict[str, str] = None,  # None for testing only
+        decompression_threads: int = 1,
+        cache: dict = None,
+        cache_key: str = None,
+        sprite_outputs: Dict[str, str] = None,
+        window_hashes: Dict[str, str] = None,
+        ledger_state: FileState = None,
+        is_fresh: bool = None,
     ):
-        super().__init__(path, modified_time, processed_time)
+        """If a cache is given, the file is only opened if it changed since
+        its entry was made."""
+        super().__init__(
+            path,
+            modified_time,
+            processed_time,
+            ledger_state=ledger_state,
+            is_fresh=is_fresh,
+        )
         self.anim_tag_colors = anim_tag_colors
+        self.decompression_threads = decompression_threads
+        self.cache = cache
+        self.cache_key = cache_key
         self.window_tag_colors = window_tag_colors
         self.anim_hashes = anim_hashes
+        self.window_hashes = window_hashes
+        self.sprite_outputs = sprite_outputs
         self._content = content
         self._anims = anims
 
     @property
     def content(self) -> AsepriteFileContent:
+        if self._content is None and self.cache is not None:
+            self._content = self._read_cached_content()
         if self._content is None:
+            stat = self.path.stat()
             self._content = AsepriteFileContent.from_path(
                 path=self.path,
                 anim_tag_colors=self.anim_tag_colors,
                 window_tag_colors=self.window_tag_colors,
                 is_fresh=self.is_fresh,
+                # Anims read the chunks of their own frames when they need them.
+                metadata_only=True,
+                decompression_threads=self.decompression_threads,
             )
+            # Reading every digest now lets the file be closed until
+            # frames are needed, so it isn't held open while it's edited.
+            entry = make_cache_entry(self._content.file_data, self._content.layers)
+            self._content.release()
+            if self.cache is not None:
+                aseprite_cache_mod.set_entry(
+                    self.cache, self.cache_key, self.path, entry, stat=stat
+                )
         return self._content
 
+    @property
+    def is_cached(self) -> bool:
+        return (
+            self.cache is not None
+            and aseprite_cache_mod.get_entry(self.cache, self.cache_key, self.path)
+            is not None
+        )
+
+    def _read_cached_content(self):
+        entry = aseprite_cache_mod.get_entry(self.cache, self.cache_key, self.path)
+        if entry is None:
+            return None
+        return AsepriteFileContent(
+            file_data=CachedAsepriteFile(
+                self.path, entry, decompression_workers=self.decompression_threads
+            ),
+            anim_tag_colors=self.anim_tag_colors,
+            window_tag_colors=self.window_tag_colors,
+            is_fresh=self.is_fresh,
+            layers=load_layers(entry),
+        )
+
     @property
     def name(self):
         return self.path.stem
@@ -113,14 +216,108 @@ class Aseprite(File):
         self,
         path_params: "AsepritePathParams",
         config_params: "AsepriteConfigParams",
+        scheduler: ExportScheduler = None,
+        sprite_cache: SpriteCache = None,
     ):
-        coroutines = []
-        for anim in self.anims:
-            if anim.is_fresh:
-                coroutines.append(
-                    anim.save(path_params, config_params, aseprite_file_path=self.path)
+        """If a scheduler is given, Aseprite exports are added to it
+        instead of being run, and finish_exports should be called once it's done."""
+        owns_scheduler = scheduler is None
+        if owns_scheduler:
+            scheduler = ExportScheduler(max_processes=config_params.export_processes)
+
+        fresh_anims = [anim for anim in self.anims if anim.is_fresh]
+        key = aseprite_cache_mod.get_key(path_params.root_dir, self.path)
+        if config_params.export_backend == ExportBackend.NATIVE:
+            if fresh_anims:
+                scheduler.add(
+                    key=key,
+                    run=functools.partial(
+                        self._run_native_exports,
+                        path_params,
+                        config_params,
+                        fresh_anims,
+                        key,
+                        sprite_cache,
+                    ),
+                )
+        elif (
+            config_params.batch_export
+            and config_params.export_backend == ExportBackend.ASEPRITE
+        ):
+            jobs = list(
+                itertools.chain(
+                    *[
+                        anim.get_lua_export_jobs(
+                            path_params,
+                            config_params,
+                            self.path,
+                            sprite_cache,
+                            job_key=key,
+                        )
+                        for anim in fresh_anims
+                    ]
+                )
+            )
+            if jobs:
+                scheduler.add(
+                    key=key,
+                    run=functools.partial(
+                        run_lua_export_batch,
+                        path_params,
+                        self.path,
+                        jobs,
+                        timeout=config_params.export_timeout,
+                        sprite_cache=sprite_cache,
+                    ),
+                )
+        else:
+            for anim in fresh_anims:
+                anim.save(
+                    path_params,
+                    config_params,
+                    aseprite_file_path=self.path,
+                    scheduler=scheduler,
+                    sprite_cache=sprite_cache,
                 )
-        await asyncio.gather(*coroutines)
+        if owns_scheduler:
+            await scheduler.run()
+            self.finish_exports(scheduler.failed)
+
+    async def _run_native_exports(
+        self,
+        path_params: "AsepritePathParams",
+        config_params: "AsepriteConfigParams",
+        anims: List["Anim"],
+        job_key: str,
+        sprite_cache: Optional[SpriteCache],
+    ) -> bool:
+        """Export the anims on a worker thread, so the next file can be read
+        meanwhile. The frames read for them are dropped once they're done."""
+
+        def export() -> bool:
+            try:
+                return all(
+                    [
+                        anim.save_native(
+                            path_params,
+                            config_params,
+                            self.path,
+                            job_key=job_key,
+                            sprite_cache=sprite_cache,
+                        )
+                        for anim in anims
+                    ]
+                )
+            finally:
+                self.content.release()
+
+        return await asyncio.get_running_loop().run_in_executor(None, export)
+
+    def finish_exports(self, failed_keys: Set[str]) -> bool:
+        """Return if all the file's exports succeeded, given the keys of the
+        scheduled exports that failed. Anims whose exports all succeeded are
+        recorded as exported."""
+        return all([anim.finish_exports(failed_keys) for anim in self.anims])
 
     def get_anims(self):
         tag_anims = [
@@ -166,6 +363,8 @@ class Aseprite(File):
             file_is_fresh=file_is_fresh,
             content=content,
             anim_hashes=anim_hashes,
+            sprite_outputs=self.sprite_outputs,
+            window_hashes=self.window_hashes,
         )
 
     def get_windows_in_frame_range(self, start: int, end: int):
@@ -186,35 +385,115 @@ class Aseprite(File):
         return self.path.name
 
 
-def read_aseprites(run_context: RunContext) -> List[Aseprite]:
-    ase_paths: Iterable[Path] = itertools.chain(
-        *[
-            list((run_context.root_dir / "anims").rglob(f"*.{filetype}"))
-            for filetype in ("ase", "aseprite")
+def read_aseprites(
+    run_context: RunContext, stages: List[Stage] = None
+) -> List[Aseprite]:
+    """With the ledger, aseprite files are fresh if any of the stages
+    hasn't processed them. Defaults to every stage."""
+    if stages is None:
+        stages = list(Stage)
+    if run_context.file_index is not None:
+        ase_files = run_context.file_index.get_files(FileKind.ASEPRITE)
+    else:
+        ase_paths: Iterable[Path] = itertools.chain(
+            *[
+                list((run_context.root_dir / "anims").rglob(f"*.{filetype}"))
+                for filetype in ("ase", "aseprite")
+            ]
+        )
+        ase_files = [
+            index_file(run_context.root_dir, path, FileKind.ASEPRITE)
+            for path in ase_paths
         ]
-    )
     processed_time = get_script_processed_time(dotfile=run_context.dotfile)
+    processed_times = get_processed_times(dotfile=run_context.dotfile, stages=stages)
     aseprites = []
-    for path in ase_paths:
+    for file in ase_files:
+        ledger_state, is_fresh = None, None
+        if run_context.ledger is not None:
+            ledger_state, is_fresh = ledger_mod.read_file(
+                run_context.ledger,
+                root_dir=run_context.root_dir,
+                file=file,
+                processed_times=processed_times,
+            )
         aseprite = read_aseprite(
             run_context=run_context,
-            path=path,
+            path=run_context.root_dir / file.path,
             processed_time=processed_time,
+            modified_time=file.modified_time,
+            ledger_state=ledger_state,
+            is_fresh=is_fresh,
         )
         aseprites.append(aseprite)
+    if run_context.aseprite_cache is not None:
+        aseprite_cache_mod.remove_missing(
+            run_context.aseprite_cache,
+            keys=[aseprite.cache_key for aseprite in aseprites],
+        )
+        read_cache_entries_in_parallel(
+            [aseprite for aseprite in aseprites if not aseprite.is_cached],
+            processes=assistant_config_mod.get_aseprite_parse_processes(
+                run_context.assistant_config
+            ),
+        )
     return aseprites
 
 
+def read_cache_entries_in_parallel(aseprites: List[Aseprite], processes: int):
+    """Read the aseprites in worker processes, and cache what was read.
+    Any that can't be read this way are left to be read in this process."""
+    if processes <= 1 or len(aseprites) <= 1:
+        return
+    stats = [aseprite.path.stat() for aseprite in aseprites]
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(processes, len(aseprites))
+        ) as executor:
+            futures = [
+                executor.submit(read_cache_entry, aseprite.path)
+                for aseprite in aseprites
+            ]
+            for aseprite, stat, future in zip(aseprites, stats, futures):
+                try:
+                    entry = future.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception as e:
+                    logger.warning(
+                        f"Couldn't read {aseprite.path} in a worker process. {e!r}"
+                    )
+                    continue
+                aseprite_cache_mod.set_entry(
+                    aseprite.cache, aseprite.cache_key, aseprite.path, entry, stat=stat
+                )
+    except (OSError, BrokenProcessPool) as e:
+        logger.warning(
+            f"Worker processes failed, so aseprite files will be read one at a time. "
+            f"{e!r}"
+        )
+
+
 def read_aseprite(
-    run_context: RunContext, path: Path, processed_time: datetime = None
+    run_context: RunContext,
+    path: Path,
+    processed_time: datetime = None,
+    modified_time: datetime = None,
+    ledger_state: FileState = None,
+    is_fresh: bool = None,
 ) -> Aseprite:
     if processed_time is None:
         processed_time = get_script_processed_time(dotfile=run_context.dotfile)
+    if modified_time is None:
+        modified_time = _get_modified_time(path)
+    cache_key = aseprite_cache_mod.get_key(run_context.root_dir, path)
 
     aseprite = Aseprite(
         path=path,
-        modified_time=_get_modified_time(path),
+        modified_time=modified_time,
         processed_time=processed_time,
+        ledger_state=ledger_state,
+        is_fresh=is_fresh,
         anim_tag_colors=assistant_config_mod.get_anim_tag_color(
             run_context.assistant_config
         ),
@@ -224,5 +503,18 @@ def read_aseprite(
         anim_hashes=run_context.dotfile.setdefault("anim_hashes", {}).setdefault(
             path.stem, {}
         ),
+        window_hashes=run_context.dotfile.setdefault(
+            WINDOW_HASHES_FIELD, {}
+        ).setdefault(path.stem, {}),
+        decompression_threads=assistant_config_mod.get_aseprite_decompression_threads(
+            run_context.assistant_config
+        ),
+        cache=run_context.aseprite_cache,
+        cache_key=cache_key,
+        sprite_outputs=(
+            None
+            if run_context.sprite_outputs is None
+            else run_context.sprite_outputs.setdefault(cache_key, {})
+        ),
     )
     return aseprite
@@ -0,0 +1,188 @@
+"""Stand-ins for aseprite files, made from what a previous run cached about them."""
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+    MappedAsepriteFile,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.digests import (
+    combine_digests,
+    combine_layer_digests,
+)
+from rivals_workshop_assistant.aseprite_handling.layers import AsepriteLayers
+from rivals_workshop_assistant.aseprite_handling.tags import AsepriteTag
+
+
+class CachedLayer:
+    """The parts of a layer chunk that are needed after reading the file."""
+
+    def __init__(self, name: str, layer_index: int):
+        self.name = name
+        self.layer_index = layer_index
+
+    def __str__(self):
+        return self.name
+
+
+class CachedAsepriteFile:
+    """Answers like a metadata-only RawAsepriteFile, without opening the file.
+    The file is only opened if frames are needed."""
+
+    metadata_only = True
+
+    def __init__(self, path: Path, entry: dict, decompression_workers: int = 1):
+        self.path = path
+        self.entry = entry
+        self.decompression_workers = decompression_workers
+        self._file_data = None
+
+    def get_num_frames(self):
+        return self.entry["num_frames"]
+
+    def get_tags(self):
+        return [
+            AsepriteTag(
+                name=name,
+                start=start,
+                end=end,
+                color=color if isinstance(color, str) else tuple(color),
+            )
+            for name, start, end, color in self.entry["tags"]
+        ]
+
+    def get_anim_digest(self, start: int, end: int) -> str:
+        end = min(end, self.get_num_frames() - 1)
+        return combine_digests(
+            bytes.fromhex(self.entry["settings_digest"]),
+            [
+                bytes.fromhex(frame_digest)
+                for frame_digest in self.entry["frame_digests"][start : end + 1]
+            ],
+        )
+
+    def get_settings_digest(self) -> bytes:
+        return bytes.fromhex(self.entry["settings_digest"])
+
+    def get_frame_digest(self, index: int) -> bytes:
+        return bytes.fromhex(self.entry["frame_digests"][index])
+
+    def get_layers_digest(self, start: int, end: int, layer_indices: List[int]) -> str:
+        end = min(end, self.get_num_frames() - 1)
+        return combine_digests(
+            self.get_settings_digest(),
+            [
+                self.get_layers_frame_digest(index, layer_indices)
+                for index in range(start, end + 1)
+            ],
+        )
+
+    def get_layers_frame_digest(self, index: int, layer_indices: List[int]) -> bytes:
+        return combine_layer_digests(self.get_frame_layer_digests(index), layer_indices)
+
+    def get_frame_layer_digests(self, index: int) -> Dict[int, bytes]:
+        return {
+            layer_index: bytes.fromhex(layer_digest)
+            for layer_index, layer_digest in self.entry["frame_layer_digests"][index]
+        }
+
+    def get_frames(self, start: int, end: int):
+        return self.open().get_frames(start, end)
+
+    def get_frames_at(self, indices: Iterable[int]):
+        return self.open().get_frames_at(indices)
+
+    def release_frames(self):
+        """Close the file, if it was opened. It's opened again if needed."""
+        if self._file_data is not None:
+            self._file_data.close()
+            self._file_data = None
+
+    def open(self) -> MappedAsepriteFile:
+        """Return the file, read metadata-only."""
+        if self._file_data is None:
+            self._file_data = MappedAsepriteFile(
+                self.path,
+                metadata_only=True,
+                decompression_workers=self.decompression_workers,
+            )
+        return self._file_data
+
+
+def read_cache_entry(path: Path) -> dict:
+    """Read the file and return what's cached about it.
+    Runs in worker processes, so it only returns plain data."""
+    with MappedAsepriteFile(path, metadata_only=True) as file_data:
+        entry = make_cache_entry(file_data, AsepriteLayers.from_file(file_data))
+    return entry
+
+
+def make_cache_entry(file_data: RawAsepriteFile, layers: AsepriteLayers) -> dict:
+    num_frames = file_data.get_num_frames()
+    return {
+        "num_frames": num_frames,
+        "tags": [
+            [tag.name, tag.start, tag.end, tag.color] for tag in file_data.get_tags()
+        ],
+        "layers": _dump_layers(layers),
+        "settings_digest": file_data.get_settings_digest().hex(),
+        "frame_digests": [
+            file_data.get_frame_digest(index).hex() for index in range(num_frames)
+        ],
+        "frame_layer_digests": [
+            [
+                [layer_index, layer_digest.hex()]
+                for layer_index, layer_digest in file_data.get_frame_layer_digests(
+                    index
+                ).items()
+            ]
+            for index in range(num_frames)
+        ],
+    }
+
+
+def load_layers(entry: dict) -> AsepriteLayers:
+    layers = entry["layers"]
+    return AsepriteLayers(
+        normals=_load_layer_list(layers["normals"]),
+        hurtbox=_load_layer(layers["hurtbox"]),
+        hurtmask=_load_layer(layers["hurtmask"]),
+        splits={
+            name: _load_layer_list(split) for name, split in layers["splits"].items()
+        },
+        opts={name: _load_layer_list(opt) for name, opt in layers["opts"].items()},
+    )
+
+
+def _dump_layers(layers: AsepriteLayers) -> dict:
+    return {
+        "normals": _dump_layer_list(layers.normals),
+        "hurtbox": _dump_layer(layers.hurtbox),
+        "hurtmask": _dump_layer(layers.hurtmask),
+        "splits": {
+            name: _dump_layer_list(split) for name, split in layers.splits.items()
+        },
+        "opts": {name: _dump_layer_list(opt) for name, opt in layers.opts.items()},
+    }
+
+
+def _dump_layer(layer) -> Optional[list]:
+    if layer is None:
+        return None
+    return [layer.name, layer.layer_index]
+
+
+def _dump_layer_list(layers) -> List[list]:
+    return [_dump_layer(layer) for layer in layers]
+
+
+def _load_layer(dumped: Optional[list]) -> Optional[CachedLayer]:
+    if dumped is None:
+        return None
+    name, layer_index = dumped
+    return CachedLayer(name=name, layer_index=layer_index)
+
+
+def _load_layer_list(dumped: List[list]) -> List[CachedLayer]:
+    return [_load_layer(layer) for layer in dumped]
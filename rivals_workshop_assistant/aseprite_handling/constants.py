@@ -1,5 +1,6 @@
 HURTMASK_LAYER_NAME = "HURTMASK"
 HURTBOX_LAYER_NAME = "HURTBOX"
+NOHURT_LAYER_PREFIX = "NOHURT"
 
 ANIMS_WHICH_GET_HURTBOXES = {
     "jab",
@@ -0,0 +1,126 @@
+"""Runs Aseprite exports a limited number at a time, longest first."""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+
+@dataclass(order=True)
+class ScheduledExport:
+    priority: tuple
+    key: str = field(compare=False)
+    # Returns False if the export failed.
+    run: Callable[[], Awaitable[Optional[bool]]] = field(compare=False)
+
+
+class ExportScheduler:
+    def __init__(
+        self,
+        max_processes: int = 1,
+        durations: Dict[str, float] = None,
+        max_pending: Optional[int] = None,
+    ):
+        """Durations are how many seconds each export took on previous runs,
+        by key. They're updated as exports finish, so they can be saved.
+        max_pending is how many exports may wait for a process before
+        wait_for_room makes whoever is adding them wait too.
+        The keys of exports that failed are kept in failed."""
+        self.max_processes = max(max_processes, 1)
+        if durations is None:
+            durations = {}
+        self.durations = durations
+        self.max_pending = max_pending
+        self.failed: Set[str] = set()
+        self._pending: List[ScheduledExport] = []
+        self._counter = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._is_finishing = False
+
+    def add(self, key: str, run: Callable[[], Awaitable[Optional[bool]]]):
+        """Schedule the export. run is only called once a process is free.
+        It fails if it raises or returns False."""
+        heapq.heappush(
+            self._pending,
+            ScheduledExport(priority=self._get_priority(key), key=key, run=run),
+        )
+        self._notify()
+
+    def _get_priority(self, key: str) -> tuple:
+        """Exports that took longest before go first, so a slow one doesn't run
+        alone at the end. Exports with no duration yet could be slow, so they
+        go before the rest. Ties go in the order they were added."""
+        return -self.durations.get(key, float("inf")), next(self._counter)
+
+    def get_order(self) -> List[ScheduledExport]:
+        """Return the scheduled exports that haven't started, in the order they'd run."""
+        return sorted(self._pending)
+
+    def start(self):
+        """Start running exports as they're added, while more may still be added.
+        Call finish once they all have been."""
+        self._changed = asyncio.Event()
+        self._is_finishing = False
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.max_processes)
+        ]
+
+    async def wait_for_room(self):
+        """Wait until few enough exports are waiting for a process.
+        This keeps the one adding them from getting too far ahead."""
+        if self.max_pending is None or self._changed is None:
+            return
+        await self._wait_until(lambda: len(self._pending) < self.max_pending)
+
+    async def finish(self):
+        """Wait for every export to finish, including ones added while waiting."""
+        self._is_finishing = True
+        self._notify()
+        try:
+            await asyncio.gather(*self._workers)
+        finally:
+            for worker in self._workers:
+                worker.cancel()
+            self._workers = []
+            self._changed = None
+
+    async def run(self):
+        """Run all the scheduled exports, and wait for them to finish."""
+        self.start()
+        await self.finish()
+
+    async def _work(self):
+        while True:
+            await self._wait_until(lambda: self._pending or self._is_finishing)
+            if not self._pending:
+                return
+            export = heapq.heappop(self._pending)
+            self._notify()
+            start = time.perf_counter()
+            try:
+                succeeded = await export.run()
+            except Exception as e:
+                # One broken export shouldn't stop the rest.
+                logger.error(f"Exporting {export.key} failed. {e!r}")
+                self.failed.add(export.key)
+                continue
+            if succeeded is False:
+                self.failed.add(export.key)
+            else:
+                self.failed.discard(export.key)
+            self.durations[export.key] = round(time.perf_counter() - start, 3)
+
+    async def _wait_until(self, predicate: Callable[[], bool]):
+        while not predicate():
+            self._changed.clear()
+            await self._changed.wait()
+
+    def _notify(self):
+        """Wake everything waiting, so they check again."""
+        if self._changed is not None:
+            self._changed.set()
@@ -0,0 +1,243 @@
+"""Runs the lua scripts that make Aseprite export anims to spritesheets."""
+
+import asyncio
+import json
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from loguru import logger
+
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    BATCH_EXPORT_LUA_PATH,
+    supply_lua_script,
+)
+from rivals_workshop_assistant.paths import ASEPRITE_LUA_SCRIPTS_FOLDER
+
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.aseprite_handling.params import (
+        AsepritePathParams,
+    )
+    from rivals_workshop_assistant.aseprite_handling.sprite_cache import SpriteCache
+
+MANIFEST_FILENAME = "manifest.json"
+RESULTS_FILENAME = "results.json"
+
+
+@dataclass
+class LuaExportJob:
+    """One spritesheet for a lua script to export.
+    The params are passed to the script as app.params."""
+
+    script_name: str
+    params: Dict[str, str]
+    # Where the spritesheet goes in the sprite cache, if it should be cached.
+    cache_key: Optional[str] = None
+
+    @property
+    def dest(self) -> str:
+        return self.params["dest"]
+
+
+def format_param_value(value) -> str:
+    if isinstance(value, list):
+        # Format list as `a,b,c` instead of `[a, b, c]` for easier parsing.
+        return ",".join(str(item) for item in value)
+    return str(value)
+
+
+def _get_script_path(path_params: "AsepritePathParams", script_name: str) -> Path:
+    """Return the absolute path of the lua script, creating it if needed."""
+    full_script_path = (
+        path_params.exe_dir / ASEPRITE_LUA_SCRIPTS_FOLDER / script_name
+    ).absolute()
+    supply_lua_script(path=full_script_path)
+    return full_script_path
+
+
+async def run_lua_export(
+    path_params: "AsepritePathParams",
+    job: LuaExportJob,
+    timeout: Optional[float] = None,
+    sprite_cache: "SpriteCache" = None,
+) -> bool:
+    """Export the job with its own Aseprite process, and return if it succeeded."""
+    succeeded = await _run_lua_script(
+        path_params=path_params,
+        script_path=_get_script_path(path_params, job.script_name),
+        params=job.params,
+        timeout=timeout,
+    )
+    aseprite_file_path = Path(job.params["filename"])
+    if succeeded and not aseprite_file_path.exists():
+        logger.error(
+            f"Exported aseprite file {aseprite_file_path} not found, "
+            f"although no error from aseprite."
+        )
+    if succeeded:
+        _store_in_cache(job, sprite_cache)
+    return succeeded
+
+
+async def run_lua_export_batch(
+    path_params: "AsepritePathParams",
+    aseprite_file_path: Path,
+    jobs: List[LuaExportJob],
+    timeout: Optional[float] = None,
+    sprite_cache: "SpriteCache" = None,
+) -> bool:
+    """Export all the jobs for the aseprite file with one Aseprite process,
+    which opens the file once, and return if every job succeeded.
+    The timeout is per job.
+    If the batch can't be run, the jobs are exported one at a time instead."""
+    if not jobs:
+        return True
+    with tempfile.TemporaryDirectory() as temp_dir:
+        manifest_path = Path(temp_dir) / MANIFEST_FILENAME
+        results_path = Path(temp_dir) / RESULTS_FILENAME
+        manifest = make_manifest(
+            path_params=path_params,
+            aseprite_file_path=aseprite_file_path,
+            jobs=jobs,
+            results_path=results_path,
+        )
+        manifest_path.write_text(json.dumps(manifest))
+
+        succeeded = await _run_lua_script(
+            path_params=path_params,
+            script_path=_get_script_path(path_params, BATCH_EXPORT_LUA_PATH),
+            params={"manifest": manifest_path},
+            timeout=None if timeout is None else timeout * len(jobs),
+        )
+        results = read_results(results_path) if succeeded else None
+
+    if results is None:
+        logger.warning(
+            f"Batch export of {aseprite_file_path} failed. "
+            f"Exporting its anims one at a time."
+        )
+        all_succeeded = True
+        for job in jobs:
+            if not await run_lua_export(
+                path_params, job, timeout=timeout, sprite_cache=sprite_cache
+            ):
+                all_succeeded = False
+        return all_succeeded
+    log_results(results)
+    succeeded_dests = {result.get("dest") for result in results if result.get("ok")}
+    for job in jobs:
+        if job.dest in succeeded_dests:
+            _store_in_cache(job, sprite_cache)
+    return all(job.dest in succeeded_dests for job in jobs)
+
+
+def _store_in_cache(job: LuaExportJob, sprite_cache: Optional["SpriteCache"]):
+    if sprite_cache is None or job.cache_key is None:
+        return
+    if Path(job.dest).exists():
+        sprite_cache.store(job.cache_key, Path(job.dest))
+
+
+def make_manifest(
+    path_params: "AsepritePathParams",
+    aseprite_file_path: Path,
+    jobs: List[LuaExportJob],
+    results_path: Path,
+) -> dict:
+    """Return what the batch export script needs to run the jobs."""
+    script_names = sorted({job.script_name for job in jobs})
+    return {
+        "filename": str(aseprite_file_path.absolute()),
+        "results": str(results_path),
+        "scripts": {
+            script_name: str(_get_script_path(path_params, script_name))
+            for script_name in script_names
+        },
+        "jobs": [{"script": job.script_name, "params": job.params} for job in jobs],
+    }
+
+
+def read_results(results_path: Path) -> Optional[List[dict]]:
+    """Return the result of each job the batch export script ran.
+    None if the script didn't finish."""
+    try:
+        results = json.loads(results_path.read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+    # Aseprite encodes an empty table as an object.
+    if results == {}:
+        return []
+    if not isinstance(results, list):
+        return None
+    return results
+
+
+def log_results(results: List[dict]):
+    for result in results:
+        if result.get("ok"):
+            logger.debug(f"Exported {result.get('dest')}")
+        else:
+            logger.error(
+                f"Exporting {result.get('dest')} failed. {result.get('error')}"
+            )
+
+
+async def _run_lua_script(
+    path_params: "AsepritePathParams",
+    script_path: Path,
+    params: dict,
+    timeout: Optional[float] = None,
+) -> bool:
+    """Run the lua script in Aseprite, and return if it succeeded.
+    Aseprite is killed if it takes longer than the timeout, in seconds."""
+    command = (
+        [str(path_params.aseprite_program_path), "-b"]
+        + [
+            part
+            for key, value in params.items()
+            for part in ("--script-param", f"{key}={value}")
+        ]
+        + ["--script", str(script_path)]
+    )
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        logger.error(f"Aseprite not found at {path_params.aseprite_program_path}")
+        return False
+    except PermissionError as e:
+        logger.error(repr(e))
+        return False
+
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Lua script timed out after {timeout} seconds: {command}")
+        await _kill(proc)
+        return False
+    except asyncio.CancelledError:
+        await _kill(proc)
+        raise
+
+    logger.debug(f"Ran lua script: {command}")
+    if stdout:
+        logger.debug(f"[stdout] {stdout}")
+    if proc.returncode != 0:
+        logger.error(f"Lua script command failed.")
+        if stderr:
+            logger.error(f"[stderr] {stderr.decode()}")
+        return False
+    return True
+
+
+async def _kill(proc: asyncio.subprocess.Process):
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        # It finished already.
+        pass
+    await proc.wait()
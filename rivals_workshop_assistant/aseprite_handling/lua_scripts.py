@@ -321,9 +321,70 @@ app.command.ExportSpriteSheet {
 }
 """
 
+#  language=lua
+BATCH_EXPORT = """\
+-- Runs every export in the manifest, opening the aseprite file only once.
+-- Each export runs its usual script on a copy of the sprite,
+-- with app.params set to the export's params.
+local function readFile(path)
+    local file = assert(io.open(path, "r"))
+    local content = file:read("a")
+    file:close()
+    return content
+end
+
+local function writeFile(path, content)
+    local file = assert(io.open(path, "w"))
+    file:write(content)
+    file:close()
+end
+
+local manifest = json.decode(readFile(app.params["manifest"]))
+local source = app.open(manifest.filename)
+
+local scripts = {}
+for scriptName, scriptPath in pairs(manifest.scripts) do
+    scripts[scriptName] = readFile(scriptPath)
+end
+
+local results = {}
+for _, job in ipairs(manifest.jobs) do
+    local copies = {}
+    local jobApp = setmetatable({
+        params = job.params,
+        open = function()
+            local copy = Sprite(source)
+            table.insert(copies, copy)
+            app.activeSprite = copy
+            return copy
+        end,
+    }, { __index = app, __newindex = app })
+    local jobEnv = setmetatable({ app = jobApp }, { __index = _G })
+
+    local ok, err = pcall(function()
+        local run = assert(load(scripts[job.script], "=" .. job.script, "t", jobEnv))
+        run()
+    end)
+    for _, copy in ipairs(copies) do
+        copy:close()
+    end
+    app.activeSprite = source
+
+    local result = { dest = job.params.dest, ok = ok }
+    if not ok then
+        result.error = tostring(err)
+    end
+    table.insert(results, result)
+end
+
+source:close()
+writeFile(manifest.results, json.encode(results))
+"""
+
 LUA_SCRIPTS = {
     "export_aseprite": EXPORT_ASEPRITE,
     "create_hurtbox": CREATE_HURTBOX,
+    "batch_export": BATCH_EXPORT,
 }
 
 
@@ -341,3 +402,4 @@ def supply_lua_script(path: Path):
 
 EXPORT_ASEPRITE_LUA_PATH = "export_aseprite.lua"
 CREATE_HURTBOX_LUA_PATH = "create_hurtbox.lua"
+BATCH_EXPORT_LUA_PATH = "batch_export.lua"
@@ -0,0 +1,189 @@
+"""Exports anim spritesheets from the parsed aseprite file, without running Aseprite."""
+
+import json
+from hashlib import blake2b
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+    LayerChunk,
+)
+from rivals_workshop_assistant.aseprite_handling.constants import (
+    HURTBOX_LAYER_NAME,
+    HURTMASK_LAYER_NAME,
+    NOHURT_LAYER_PREFIX,
+)
+from rivals_workshop_assistant.aseprite_handling.layers import NORMAL_LAYER_TYPE
+
+HURTBOX_COLOR = (0, 255, 0, 255)
+
+# Increase when exported spritesheets change, so cached ones aren't used.
+NATIVE_EXPORT_VERSION = 1
+
+
+def get_image_layers(file_data: RawAsepriteFile) -> List[LayerChunk]:
+    """Return the layers that hold images, in the order target layer indices use."""
+    return [
+        layer for layer in file_data.layers if layer.layer_type == NORMAL_LAYER_TYPE
+    ]
+
+
+def make_strip(
+    file_data: RawAsepriteFile,
+    start: int,
+    end: int,
+    layer_indices: List[int],
+    scale: int,
+) -> np.ndarray:
+    """Return frames start through end side by side, as a horizontal RGBA strip.
+    Only the visible layers among the target layers are drawn,
+    and each pixel is scaled up to a scale x scale square."""
+    image_layers = get_image_layers(file_data)
+    target_layers = {id(image_layers[index]) for index in layer_indices}
+    layers = [
+        layer for layer in file_data.get_visible_layers() if id(layer) in target_layers
+    ]
+    # Read in one go, so their cels are decompressed together.
+    file_data.get_frames(start, end)
+    frame_images = [
+        file_data.get_frame_image(index, layers) for index in range(start, end + 1)
+    ]
+    strip = np.concatenate(frame_images, axis=1)
+    return scale_image(strip, scale)
+
+
+def make_hurtbox_strip(
+    file_data: RawAsepriteFile,
+    start: int,
+    end: int,
+    layer_indices: List[int],
+    scale: int,
+) -> np.ndarray:
+    """Return the hurtboxes of frames start through end as a horizontal strip.
+    A frame's hurtbox is the HURTBOX layer's pixels if it has any there,
+    or else the target layers without NOHURT layers. The HURTMASK layer's
+    pixels are cut out of it, and what's left is painted green."""
+    image_layers = get_image_layers(file_data)
+    hurtbox_layer = _get_last_layer_named(image_layers, HURTBOX_LAYER_NAME)
+    hurtmask_layer = _get_last_layer_named(image_layers, HURTMASK_LAYER_NAME)
+    special_layers = {id(hurtbox_layer), id(hurtmask_layer)}
+    nohurt_layers = {id(layer) for layer in get_nohurt_layers(file_data)}
+    target_layers = {id(image_layers[index]) for index in layer_indices}
+    content_layers = [
+        layer
+        for layer in file_data.get_visible_layers()
+        if id(layer) in target_layers
+        and id(layer) not in special_layers
+        and id(layer) not in nohurt_layers
+    ]
+
+    file_data.get_frames(start, end)
+    frame_masks = []
+    for index in range(start, end + 1):
+        mask = _get_layer_mask(file_data, index, hurtbox_layer)
+        if mask is None:
+            mask = file_data.get_frame_image(index, content_layers)[..., 3] > 0
+        hurtmask = _get_layer_mask(file_data, index, hurtmask_layer)
+        if hurtmask is not None:
+            mask &= ~hurtmask
+        frame_masks.append(mask)
+    mask = np.concatenate(frame_masks, axis=1)
+
+    strip = np.zeros(mask.shape + (4,), dtype=np.uint8)
+    strip[mask] = HURTBOX_COLOR
+    return scale_image(strip, scale)
+
+
+def get_nohurt_layers(file_data: RawAsepriteFile) -> List[LayerChunk]:
+    """Return the layers left out of hurtboxes.
+    Their names start with NOHURT, or their user data mentions it."""
+    user_data = file_data.get_layer_user_data()
+    return [
+        layer
+        for index, layer in enumerate(file_data.layers)
+        if layer.name.startswith(NOHURT_LAYER_PREFIX)
+        or NOHURT_LAYER_PREFIX in (getattr(user_data.get(index), "string", None) or "")
+    ]
+
+
+def _get_last_layer_named(layers: List[LayerChunk], name: str) -> Optional[LayerChunk]:
+    matching_layers = [layer for layer in layers if layer.name == name]
+    return matching_layers[-1] if matching_layers else None
+
+
+def _get_layer_mask(
+    file_data: RawAsepriteFile, index: int, layer: Optional[LayerChunk]
+) -> Optional[np.ndarray]:
+    """Return where the layer has pixels in the frame, drawn even if it's hidden.
+    None if the layer has no cel there."""
+    if layer is None or file_data.get_layer_cel(index, layer) is None:
+        return None
+    return file_data.get_frame_image(index, [layer])[..., 3] > 0
+
+
+def scale_image(image: np.ndarray, scale: int) -> np.ndarray:
+    """Scale the image up with nearest-neighbor sampling."""
+    if scale == 1:
+        return image
+    return image.repeat(scale, axis=0).repeat(scale, axis=1)
+
+
+def save_strip(strip: np.ndarray, dest: Path):
+    Image.fromarray(strip, "RGBA").save(dest)
+
+
+def load_strip(path: Path) -> np.ndarray:
+    with Image.open(path) as image:
+        return np.array(image.convert("RGBA"))
+
+
+def make_export_key(
+    settings_digest: bytes, layer_indices: List[int], scale: int, is_hurtbox: bool
+) -> str:
+    """Return what a strip's frames depend on, besides the frames themselves.
+    A strip can only be patched if this hasn't changed."""
+    content = json.dumps(
+        [
+            NATIVE_EXPORT_VERSION,
+            settings_digest.hex(),
+            layer_indices,
+            scale,
+            is_hurtbox,
+        ]
+    )
+    return blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def patch_strip(
+    strip: np.ndarray,
+    file_data: RawAsepriteFile,
+    start: int,
+    end: int,
+    changed_indices: Iterable[int],
+    layer_indices: List[int],
+    scale: int,
+    make_strip_function: Callable[..., np.ndarray],
+) -> Optional[np.ndarray]:
+    """Redraw the changed frames of a strip that make_strip_function made before.
+    Return None if the strip isn't the size the frames need."""
+    num_frames = end - start + 1
+    changed_indices = list(changed_indices)
+    file_data.get_frames_at(changed_indices)
+    for index in changed_indices:
+        frame = make_strip_function(
+            file_data,
+            start=index,
+            end=index,
+            layer_indices=layer_indices,
+            scale=scale,
+        )
+        height, width = frame.shape[:2]
+        if strip.shape != (height, width * num_frames, 4):
+            return None
+        left = (index - start) * width
+        strip[:, left : left + width] = frame
+    return strip
@@ -1,5 +1,8 @@
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
+
+from rivals_workshop_assistant.assistant_config_mod import ExportBackend
 
 
 @dataclass
@@ -14,3 +17,7 @@ class AsepriteConfigParams:
     has_small_sprites: bool = False
     hurtboxes_enabled: bool = False
     is_ssl: bool = False
+    export_backend: ExportBackend = ExportBackend.ASEPRITE
+    batch_export: bool = False
+    export_processes: int = 1
+    export_timeout: Optional[float] = None
@@ -0,0 +1,111 @@
+"""Keeps exported spritesheets by what they were made from, so an anim that was
+exported before, in any checkout, is copied instead of exported again."""
+
+import json
+import os
+import shutil
+import tempfile
+from hashlib import blake2b
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from rivals_workshop_assistant.aseprite_handling.lua_scripts import (
+    CREATE_HURTBOX,
+    EXPORT_ASEPRITE,
+)
+from rivals_workshop_assistant.aseprite_handling.native_export import (
+    NATIVE_EXPORT_VERSION,
+)
+from rivals_workshop_assistant.assistant_config_mod import (
+    ExportBackend,
+    SpriteCacheLocation,
+)
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+PROJECT_SPRITE_CACHE_FOLDER = ASSISTANT_FOLDER / ".sprite_cache"
+SHARED_SPRITE_CACHE_FOLDER = Path("sprite_cache")
+
+
+class SpriteCache:
+    def __init__(self, directory: Path, exporter_version: str):
+        """The exporter version is part of every key, so spritesheets made by
+        a different exporter are never used."""
+        self.directory = directory
+        self.exporter_version = exporter_version
+
+    def make_key(self, **parts) -> str:
+        """Return the key of the spritesheet made from the parts.
+        They must be JSON serializable."""
+        content = json.dumps(
+            {"exporter_version": self.exporter_version, **parts}, sort_keys=True
+        )
+        return blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def has(self, key: str) -> bool:
+        return self.get_path(key).exists()
+
+    def fetch(self, key: str, dest: Path) -> bool:
+        """Copy the cached spritesheet to dest, and return if it was cached."""
+        try:
+            shutil.copyfile(self.get_path(key), dest)
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"Couldn't copy cached spritesheet to {dest}. {e!r}")
+            return False
+        logger.debug(f"Copied cached spritesheet to {dest}")
+        return True
+
+    def store(self, key: str, exported_path: Path):
+        """Add the exported spritesheet to the cache.
+        It's written under a temporary name and then renamed, so other runs
+        sharing the cache never see half a file."""
+        path = self.get_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=path.parent, suffix=".tmp", delete=False
+            ) as temp_file:
+                temp_path = Path(temp_file.name)
+            try:
+                shutil.copyfile(exported_path, temp_path)
+                os.replace(temp_path, path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Couldn't cache spritesheet {exported_path}. {e!r}")
+
+
+def make_sprite_cache(
+    location: SpriteCacheLocation,
+    root_dir: Path,
+    exe_dir: Path,
+    export_backend: ExportBackend,
+    aseprite_version: Optional[str] = None,
+) -> Optional[SpriteCache]:
+    if location == SpriteCacheLocation.NONE:
+        return None
+    if location == SpriteCacheLocation.SHARED:
+        directory = exe_dir / SHARED_SPRITE_CACHE_FOLDER
+    else:
+        directory = root_dir / PROJECT_SPRITE_CACHE_FOLDER
+    return SpriteCache(
+        directory=directory,
+        exporter_version=get_exporter_version(export_backend, aseprite_version),
+    )
+
+
+def get_exporter_version(
+    export_backend: ExportBackend, aseprite_version: Optional[str] = None
+) -> str:
+    if export_backend == ExportBackend.NATIVE:
+        return f"{export_backend.value} {NATIVE_EXPORT_VERSION}"
+    scripts_digest = blake2b(
+        (EXPORT_ASEPRITE + CREATE_HURTBOX).encode(), digest_size=8
+    ).hexdigest()
+    return f"{export_backend.value} {(aseprite_version or '').strip()} {scripts_digest}"
@@ -21,7 +21,7 @@ def get_required_assets(scripts: List[Script]) -> Set[Asset]:
 def _get_required_assets_for_script(script: Script) -> Set[Asset]:
     assets = set()
     for asset_type in ASSET_TYPES:
-        assets.update(asset_type.get_from_text(script.working_content))
+        assets.update(asset_type.get_from_text(script.document.tokens))
     return assets
 
 
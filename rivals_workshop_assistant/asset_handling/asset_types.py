@@ -4,6 +4,10 @@ import abc
 from typing import Set
 
 from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.script_handling.gml_lexer import (
+    TokenKind,
+    get_gml_tokens,
+)
 from .sprite_generation import generate_sprite_for_file_name
 
 
@@ -26,11 +30,32 @@ class Asset(abc.ABC):
 
 
 class Sprite(Asset):
-    _pattern = r"""sprite_get\(\s*["']([^)"']+?)["')]\s*\)"""
+    _function_name = "sprite_get"
+    _call_start_pattern = re.compile(r"\(\s*")
+    _call_end_pattern = re.compile(r"\s*\)")
+    _name_pattern = re.compile(r"""[^)"']+""")
 
     @classmethod
     def get_from_text(cls, text) -> Set["Sprite"]:
-        asset_strings = set(re.findall(pattern=cls._pattern, string=text))
+        """Only finds sprite_get calls in code, not in comments or strings.
+        The text's tokens can be given instead."""
+        gml_tokens = get_gml_tokens(text)
+        text = gml_tokens.gml
+        tokens = gml_tokens.tokens
+        asset_strings = set()
+        for function, argument in zip(tokens, tokens[1:]):
+            if (
+                function.kind == TokenKind.IDENTIFIER
+                and function.text == cls._function_name
+                and argument.kind == TokenKind.STRING
+                and cls._call_start_pattern.fullmatch(
+                    text, function.end, argument.start
+                )
+                and cls._call_end_pattern.match(text, argument.end)
+            ):
+                quote, name = argument.text[0], argument.text[1:-1]
+                if argument.text.endswith(quote) and cls._name_pattern.fullmatch(name):
+                    asset_strings.add(name)
         return set(Sprite(string) for string in asset_strings)
 
     async def supply(self, root_dir: Path):
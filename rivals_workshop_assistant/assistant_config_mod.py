@@ -1,4 +1,5 @@
 import enum
+import os
 from typing import List, TYPE_CHECKING, Optional
 from pathlib import Path
 
@@ -55,6 +56,64 @@ def get_library_update_level(config: dict) -> UpdateLevel:
     )
 
 
+class ExportBackend(enum.Enum):
+    ASEPRITE = "aseprite"
+    NATIVE = "native"
+
+
+EXPORT_BACKEND_FIELD = "anim_export_backend"
+EXPORT_BACKEND_DEFAULT = ExportBackend.ASEPRITE
+
+
+def get_export_backend(assistant_config: dict) -> ExportBackend:
+    value = assistant_config.get(EXPORT_BACKEND_FIELD, EXPORT_BACKEND_DEFAULT)
+    try:
+        return ExportBackend(value)
+    except ValueError:
+        logger.warning(
+            f"WARNING: {EXPORT_BACKEND_FIELD} in your assistant config should be one "
+            f"of {[backend.value for backend in ExportBackend]}. "
+            f"Using {EXPORT_BACKEND_DEFAULT.value}."
+        )
+        return EXPORT_BACKEND_DEFAULT
+
+
+class SpriteCacheLocation(enum.Enum):
+    NONE = "none"
+    PROJECT = "project"
+    SHARED = "shared"
+
+
+# Off unless opted into, since it keeps a copy of every exported spritesheet.
+# "project" keeps them in the project's assistant folder,
+# "shared" in the assistant's own folder, for all projects.
+SPRITE_CACHE_FIELD = "sprite_cache"
+SPRITE_CACHE_DEFAULT = SpriteCacheLocation.NONE
+
+
+def get_sprite_cache_location(assistant_config: dict) -> SpriteCacheLocation:
+    value = assistant_config.get(SPRITE_CACHE_FIELD, SPRITE_CACHE_DEFAULT)
+    try:
+        return SpriteCacheLocation(value)
+    except ValueError:
+        logger.warning(
+            f"WARNING: {SPRITE_CACHE_FIELD} in your assistant config should be one "
+            f"of {[location.value for location in SpriteCacheLocation]}. "
+            f"Using {SPRITE_CACHE_DEFAULT.value}."
+        )
+        return SPRITE_CACHE_DEFAULT
+
+
+ASEPRITE_BATCH_EXPORT_FIELD = "aseprite_batch_export"
+ASEPRITE_BATCH_EXPORT_DEFAULT = False
+
+
+def get_aseprite_batch_export(assistant_config: dict) -> bool:
+    return assistant_config.get(
+        ASEPRITE_BATCH_EXPORT_FIELD, ASEPRITE_BATCH_EXPORT_DEFAULT
+    )
+
+
 ASSISTANT_SELF_UPDATE_FIELD = "assistant_should_self_update"
 ASSISTANT_SELF_UPDATE_DEFAULT = True
 
@@ -117,6 +176,75 @@ def get_is_ssl(assistant_config: dict):
     return assistant_config.get(IS_SSL_FIELD, IS_SSL_DEFAULT)
 
 
+ASEPRITE_DECOMPRESSION_THREADS_FIELD = "aseprite_decompression_threads"
+ASEPRITE_DECOMPRESSION_THREADS_DEFAULT = 1
+
+
+def get_aseprite_decompression_threads(assistant_config: dict) -> int:
+    return _get_worker_count(
+        assistant_config,
+        ASEPRITE_DECOMPRESSION_THREADS_FIELD,
+        ASEPRITE_DECOMPRESSION_THREADS_DEFAULT,
+    )
+
+
+ASEPRITE_PARSE_PROCESSES_FIELD = "aseprite_parse_processes"
+ASEPRITE_PARSE_PROCESSES_DEFAULT = 1
+
+
+def get_aseprite_parse_processes(assistant_config: dict) -> int:
+    return _get_worker_count(
+        assistant_config,
+        ASEPRITE_PARSE_PROCESSES_FIELD,
+        ASEPRITE_PARSE_PROCESSES_DEFAULT,
+    )
+
+
+ASEPRITE_EXPORT_PROCESSES_FIELD = "aseprite_export_processes"
+
+
+def get_aseprite_export_processes(assistant_config: dict) -> int:
+    """Defaults to the number of CPUs."""
+    default = os.cpu_count() or 1
+    if assistant_config.get(ASEPRITE_EXPORT_PROCESSES_FIELD) is None:
+        return default
+    return _get_worker_count(assistant_config, ASEPRITE_EXPORT_PROCESSES_FIELD, default)
+
+
+ASEPRITE_EXPORT_TIMEOUT_FIELD = "aseprite_export_timeout"
+ASEPRITE_EXPORT_TIMEOUT_DEFAULT = 300
+
+
+def get_aseprite_export_timeout(assistant_config: dict) -> float:
+    timeout = assistant_config.get(
+        ASEPRITE_EXPORT_TIMEOUT_FIELD, ASEPRITE_EXPORT_TIMEOUT_DEFAULT
+    )
+    if (
+        not isinstance(timeout, (int, float))
+        or isinstance(timeout, bool)
+        or timeout <= 0
+    ):
+        logger.warning(
+            f"WARNING: {ASEPRITE_EXPORT_TIMEOUT_FIELD} in your assistant config "
+            f"should be a number of seconds above 0. "
+            f"Using {ASEPRITE_EXPORT_TIMEOUT_DEFAULT}."
+        )
+        return ASEPRITE_EXPORT_TIMEOUT_DEFAULT
+    return timeout
+
+
+def _get_worker_count(assistant_config: dict, field: str, default: int) -> int:
+    count = assistant_config.get(field, default)
+    if not isinstance(count, int) or isinstance(count, bool) or count < 1:
+        logger.warning(
+            f"WARNING: {field} in your assistant config "
+            f"should be a whole number of at least 1. "
+            f"Using {default}."
+        )
+        return default
+    return count
+
+
 DEFAULT_CONFIG = f"""\
 # Format is <key name>: <value> (with a space after the : )
 # For example
@@ -147,11 +275,44 @@ DEFAULT_CONFIG = f"""\
     # bottom of the attack's script.
 
 
+{EXPORT_BACKEND_FIELD}: {EXPORT_BACKEND_DEFAULT.value}
+    # What exports your anims to spritesheets.
+    # {ExportBackend.ASEPRITE.value} = Run Aseprite for each spritesheet. Needs {ASEPRITE_PATH_FIELD}.
+    # {ExportBackend.NATIVE.value} = The assistant draws the spritesheets itself, which is
+    #   much faster, and works without Aseprite installed.
+{ASEPRITE_BATCH_EXPORT_FIELD}: {ASEPRITE_BATCH_EXPORT_DEFAULT}
+    # If {ExportBackend.ASEPRITE.value} exports should run Aseprite once per aseprite file,
+    # instead of once per spritesheet. Much faster for files with many anims.
+    # Needs Aseprite 1.3 or later.
+{ASEPRITE_EXPORT_PROCESSES_FIELD}:
+    # How many Aseprite processes can export at once.
+    # Leave empty to use one per CPU. Lower it if exporting uses too much memory.
+{ASEPRITE_EXPORT_TIMEOUT_FIELD}: {ASEPRITE_EXPORT_TIMEOUT_DEFAULT}
+    # How many seconds an Aseprite export can take before it's stopped.
+{SPRITE_CACHE_FIELD}: {SPRITE_CACHE_DEFAULT.value}
+    # Where to keep copies of exported spritesheets, so anims that were exported
+    # before are copied instead of exported again, even after switching branches.
+    # {SpriteCacheLocation.NONE.value} = Don't keep copies.
+    # {SpriteCacheLocation.PROJECT.value} = In this character's assistant folder.
+    # {SpriteCacheLocation.SHARED.value} = Next to the assistant exe, shared by every
+    #   character and checkout that uses it.
+
+
 {GENERATE_HURTBOXES_FIELD}: {GENERATE_HURTBOXES_DEFAULT}
     # If the assistant should automatically generate hurtboxes from your anim files.
     # See https://rivalslib.com/assistant/animation_handling.html#hurtbox-generation
 
 
+{ASEPRITE_DECOMPRESSION_THREADS_FIELD}: {ASEPRITE_DECOMPRESSION_THREADS_DEFAULT}
+    # How many threads to use when decompressing the pixels of aseprite files.
+    # 1 decompresses them one at a time. Higher values can make large files
+    # with many layers load faster.
+{ASEPRITE_PARSE_PROCESSES_FIELD}: {ASEPRITE_PARSE_PROCESSES_DEFAULT}
+    # How many processes to use when reading aseprite files that changed since
+    # the last run. 1 reads them one at a time. Higher values make the first run
+    # on a character with many aseprite files faster.
+
+
 {LIBRARY_UPDATE_LEVEL_FIELD}: {LIBRARY_UPDATE_LEVEL_DEFAULT.value}
     # What kind of library updates to allow. 
     # This only affects the functions available to inject, not assistant behavior.
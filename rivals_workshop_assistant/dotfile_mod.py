@@ -3,6 +3,7 @@ from datetime import datetime
 from pathlib import Path
 
 import rivals_workshop_assistant.info_files as info_files
+from rivals_workshop_assistant.ledger_mod import Stage
 from rivals_workshop_assistant.modes import Mode
 from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
 from rivals_workshop_assistant.run_context import RunContext
@@ -33,6 +34,10 @@ LAST_UPDATED_FIELD = "last_updated"
 SCRIPT_PROCESSED_TIME_FIELD = "script_processed_time"
 ANIM_PROCESSED_TIME_FIELD = "anim_processed_time"
 INJECT_CLIENTS_FIELD = "injection_clients"
+ANIM_EXPORT_DURATIONS_FIELD = "anim_export_durations"
+ASEPRITE_VERSION_FIELD = "aseprite_version"
+WINDOW_HASHES_FIELD = "window_hashes"
+ANIM_INDEX_FIELD = "anim_index"
 
 
 async def read(root_dir: Path) -> dict:
@@ -82,6 +87,14 @@ def update_dotfile_injection_clients(
         dotfile[INJECT_CLIENTS_FIELD].pop(client_script.as_posix())
 
 
+def get_injection_dependencies(dotfile: dict, client_script: Path) -> typing.List[Path]:
+    """Return the inject files the script is a client of."""
+    dependencies = dotfile.get(INJECT_CLIENTS_FIELD, {}).get(
+        client_script.as_posix(), []
+    )
+    return [Path(dependency) for dependency in dependencies]
+
+
 def get_clients_for_injection(
     dotfile: dict, injection_script: Path
 ) -> typing.List[Path]:
@@ -102,3 +115,14 @@ def get_script_processed_time(dotfile: dict) -> typing.Optional[datetime]:
 
 def get_anim_processed_time(dotfile: dict) -> typing.Optional[datetime]:
     return dotfile.get(ANIM_PROCESSED_TIME_FIELD, None)
+
+
+def get_processed_times(
+    dotfile: dict, stages: typing.List[Stage]
+) -> typing.Dict[Stage, typing.Optional[datetime]]:
+    """Return when each stage last ran, by stage."""
+    getters = {
+        Stage.SCRIPTS: get_script_processed_time,
+        Stage.ANIMS: get_anim_processed_time,
+    }
+    return {stage: getters[stage](dotfile=dotfile) for stage in stages}
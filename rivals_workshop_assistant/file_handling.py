@@ -1,8 +1,12 @@
+import typing
 from datetime import datetime
 from pathlib import Path
 
 from loguru import logger
 
+if typing.TYPE_CHECKING:
+    from rivals_workshop_assistant.ledger_mod import FileState
+
 
 def create_file(path: Path, content: str, overwrite=False):
     """Creates or overwrites the file with the given content"""
@@ -27,12 +31,18 @@ class File:
         path: Path,
         modified_time: datetime = None,
         processed_time: datetime = None,
+        ledger_state: "FileState" = None,
+        is_fresh: bool = None,
     ):
-        if modified_time is None:
-            modified_time = _get_modified_time(path)
-
+        """If the file was read with the ledger, is_fresh is given by it,
+        instead of comparing the modified and processed times."""
         self.path = path
-        self.is_fresh = _get_is_fresh(processed_time, modified_time)
+        self.ledger_state = ledger_state
+        if is_fresh is None:
+            if modified_time is None:
+                modified_time = _get_modified_time(path)
+            is_fresh = _get_is_fresh(processed_time, modified_time)
+        self.is_fresh = is_fresh
 
 
 def _get_modified_time(path: Path) -> datetime:
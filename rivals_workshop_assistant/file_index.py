@@ -0,0 +1,128 @@
+"""Lists the project's files in one walk, which every stage reads from,
+instead of each searching and statting the folders again."""
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from loguru import logger
+
+from rivals_workshop_assistant.paths import (
+    SCRIPTS_FOLDER,
+    USER_INJECT_FOLDER,
+    INJECT_FOLDER,
+    ANIMS_FOLDER,
+    SPRITES_FOLDER,
+)
+
+
+class FileKind(Enum):
+    SCRIPT = "script"
+    USER_INJECT = "user_inject"
+    LIBRARY_INJECT = "library_inject"
+    ASEPRITE = "aseprite"
+    SPRITE = "sprite"
+
+
+@dataclass(frozen=True)
+class IndexedFolder:
+    folder: Path
+    kind: FileKind
+    suffixes: Tuple[str, ...]
+
+
+INDEXED_FOLDERS = [
+    IndexedFolder(SCRIPTS_FOLDER, FileKind.SCRIPT, (".gml",)),
+    IndexedFolder(USER_INJECT_FOLDER, FileKind.USER_INJECT, (".gml",)),
+    IndexedFolder(INJECT_FOLDER, FileKind.LIBRARY_INJECT, (".gml",)),
+    IndexedFolder(ANIMS_FOLDER, FileKind.ASEPRITE, (".ase", ".aseprite")),
+    IndexedFolder(SPRITES_FOLDER, FileKind.SPRITE, (".png",)),
+]
+
+
+@dataclass(frozen=True)
+class IndexedFile:
+    kind: FileKind
+    path: Path  # Relative to the root dir.
+    size: int
+    mtime_ns: int
+
+    @property
+    def modified_time(self) -> datetime:
+        return datetime.fromtimestamp(self.mtime_ns / 1e9)
+
+
+class FileIndex:
+    def __init__(self, root_dir: Path, files: List[IndexedFile]):
+        self.root_dir = root_dir
+        self._files_by_kind: Dict[FileKind, List[IndexedFile]] = {
+            kind: [] for kind in FileKind
+        }
+        for file in files:
+            self._files_by_kind[file.kind].append(file)
+
+    def get_files(self, kind: FileKind) -> List[IndexedFile]:
+        return self._files_by_kind[kind]
+
+
+def get_folder_kind(folder: Path) -> FileKind:
+    return next(
+        indexed_folder.kind
+        for indexed_folder in INDEXED_FOLDERS
+        if indexed_folder.folder == Path(folder)
+    )
+
+
+def index_file(root_dir: Path, path: Path, kind: FileKind) -> IndexedFile:
+    """Stat a file that was found without the index."""
+    stat = path.stat()
+    return IndexedFile(
+        kind=kind,
+        path=path.relative_to(root_dir),
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+    )
+
+
+def build_file_index(root_dir: Path) -> FileIndex:
+    """Walk the folders the assistant reads, and stat their files.
+    On Windows the stats come with the listing, so no file is opened."""
+    files = []
+    for indexed_folder in INDEXED_FOLDERS:
+        files.extend(_walk(root_dir, indexed_folder))
+    logger.debug(f"Indexed {len(files)} files")
+    return FileIndex(root_dir, files)
+
+
+def _walk(root_dir: Path, indexed_folder: IndexedFolder) -> Iterator[IndexedFile]:
+    """Yield each matching file in the folder, then in its subfolders,
+    like Path.rglob does."""
+    try:
+        with os.scandir(root_dir / indexed_folder.folder) as entries:
+            entries = list(entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    subfolders = []
+    for entry in entries:
+        if entry.is_dir():
+            subfolders.append(entry.name)
+        elif os.path.normcase(entry.name).endswith(indexed_folder.suffixes):
+            stat = entry.stat()
+            yield IndexedFile(
+                kind=indexed_folder.kind,
+                path=indexed_folder.folder / entry.name,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+            )
+    for subfolder in subfolders:
+        yield from _walk(
+            root_dir,
+            IndexedFolder(
+                indexed_folder.folder / subfolder,
+                indexed_folder.kind,
+                indexed_folder.suffixes,
+            ),
+        )
@@ -0,0 +1,175 @@
+"""Reads and saves what each input file held when each stage last processed it,
+so files are only processed again when their content changed, by stage."""
+
+import json
+import typing
+from datetime import datetime
+from enum import Enum
+from hashlib import blake2b
+from pathlib import Path
+
+from loguru import logger
+
+from rivals_workshop_assistant.file_handling import create_file, _get_is_fresh
+from rivals_workshop_assistant.modes import Mode
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+if typing.TYPE_CHECKING:
+    from rivals_workshop_assistant.file_handling import File
+    from rivals_workshop_assistant.file_index import IndexedFile
+    from rivals_workshop_assistant.run_context import RunContext
+
+FILENAME = ".ledger"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increase when the entries change shape, so old ones are dropped.
+VERSION = 1
+VERSION_FIELD = "version"
+FILES_FIELD = "files"
+
+SIZE_FIELD = "size"
+MTIME_FIELD = "mtime_ns"
+DIGEST_FIELD = "digest"
+# The digest of the content each stage last finished processing.
+STAGES_FIELD = "stages"
+# Recorded for a stage that failed to process the file, so it tries again
+# even though it ran since the file changed. No content has this digest.
+UNPROCESSED_DIGEST = ""
+
+
+class Stage(Enum):
+    SCRIPTS = "scripts"
+    ANIMS = "anims"
+
+
+class FileState(typing.NamedTuple):
+    """What a file held when it was read."""
+
+    key: str
+    size: int
+    mtime_ns: int
+    digest: str
+
+
+def get_stages(mode: Mode) -> typing.List[Stage]:
+    """Return the stages that run in the mode."""
+    return {
+        Mode.ALL: [Stage.SCRIPTS, Stage.ANIMS],
+        Mode.SCRIPTS: [Stage.SCRIPTS],
+        Mode.ANIMS: [Stage.ANIMS],
+    }[mode]
+
+
+def read(root_dir: Path) -> dict:
+    """Controller. Returns the entry of each file by path."""
+    try:
+        ledger = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("Ledger is unreadable, and being treated as empty.")
+        return {}
+    if not isinstance(ledger, dict) or ledger.get(VERSION_FIELD) != VERSION:
+        return {}
+    return ledger.get(FILES_FIELD, {})
+
+
+def save(run_context: "RunContext"):
+    """Controller"""
+    if run_context.ledger is None:
+        return
+    content = json.dumps(
+        {VERSION_FIELD: VERSION, FILES_FIELD: run_context.ledger},
+        separators=(",", ":"),
+    )
+    create_file(path=run_context.root_dir / PATH, content=content, overwrite=True)
+
+
+def get_digest(content: bytes) -> str:
+    return blake2b(content, digest_size=16).hexdigest()
+
+
+def read_state(ledger: dict, root_dir: Path, file: "IndexedFile") -> FileState:
+    """The file is only read if its size or mtime changed since it was recorded."""
+    key = file.path.as_posix()
+    entry = ledger.get(key)
+    if (
+        entry is not None
+        and entry.get(SIZE_FIELD) == file.size
+        and entry.get(MTIME_FIELD) == file.mtime_ns
+    ):
+        return FileState(key, file.size, file.mtime_ns, entry[DIGEST_FIELD])
+    digest = get_digest((root_dir / file.path).read_bytes())
+    if entry is not None and entry.get(DIGEST_FIELD) == digest:
+        # Touched but unchanged, so it needn't be read again next time.
+        entry[SIZE_FIELD] = file.size
+        entry[MTIME_FIELD] = file.mtime_ns
+    return FileState(key, file.size, file.mtime_ns, digest)
+
+
+def get_is_fresh(
+    ledger: dict,
+    state: FileState,
+    modified_time: datetime,
+    processed_times: typing.Dict[Stage, typing.Optional[datetime]],
+) -> bool:
+    """Return if any of the stages hasn't processed the file's current content.
+    A stage that hasn't recorded the file goes by when it last ran instead,
+    so files processed before there was a ledger aren't processed again."""
+    stage_digests = ledger.get(state.key, {}).get(STAGES_FIELD, {})
+    for stage, processed_time in processed_times.items():
+        stage_digest = stage_digests.get(stage.value)
+        if stage_digest is None:
+            if _get_is_fresh(processed_time, modified_time):
+                return True
+        elif stage_digest != state.digest:
+            return True
+    return False
+
+
+def read_file(
+    ledger: dict,
+    root_dir: Path,
+    file: "IndexedFile",
+    processed_times: typing.Dict[Stage, typing.Optional[datetime]],
+) -> typing.Tuple[FileState, bool]:
+    """Return the file's state, and if any of the stages should process it."""
+    state = read_state(ledger, root_dir, file)
+    return state, get_is_fresh(ledger, state, file.modified_time, processed_times)
+
+
+def record_processed(ledger: dict, files: typing.Iterable["File"], stage: Stage):
+    """Record that the stage finished processing the files' content.
+    Files read without the ledger are skipped."""
+    for file in files:
+        entry = _record_state(ledger, file)
+        if entry is not None:
+            entry[STAGES_FIELD][stage.value] = file.ledger_state.digest
+
+
+def record_unprocessed(ledger: dict, files: typing.Iterable["File"], stage: Stage):
+    """Record that the stage failed to process the files' content,
+    so they're processed again next time. Files read without the ledger are skipped."""
+    for file in files:
+        entry = _record_state(ledger, file)
+        if entry is not None:
+            entry[STAGES_FIELD][stage.value] = UNPROCESSED_DIGEST
+
+
+def _record_state(ledger: dict, file: "File") -> typing.Optional[dict]:
+    """Return the file's entry, updated to its state. None if it has no state."""
+    state = file.ledger_state
+    if state is None:
+        return None
+    entry = ledger.setdefault(state.key, {STAGES_FIELD: {}})
+    entry[SIZE_FIELD] = state.size
+    entry[MTIME_FIELD] = state.mtime_ns
+    entry[DIGEST_FIELD] = state.digest
+    return entry
+
+
+def remove_missing(ledger: dict, keys: typing.Iterable[str]):
+    """Drop entries for files that no longer exist."""
+    keys = set(keys)
+    for key in [key for key in ledger if key not in keys]:
+        del ledger[key]
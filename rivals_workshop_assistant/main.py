@@ -1,5 +1,6 @@
 import asyncio
 import datetime
+import multiprocessing
 import sys
 from pathlib import Path
 
@@ -10,12 +11,18 @@ from rivals_workshop_assistant.aseprite_handling.aseprite_updating import update
 from rivals_workshop_assistant.filelock import FileLock
 from rivals_workshop_assistant import (
     updating,
+    aseprite_cache_mod,
+    sprite_outputs_mod,
     dotfile_mod,
+    ledger_mod,
+    script_results_mod,
     paths,
 )
 from rivals_workshop_assistant.dotfile_mod import (
     update_dotfile_after_saving,
 )
+from rivals_workshop_assistant.file_index import build_file_index
+from rivals_workshop_assistant.ledger_mod import Stage
 from rivals_workshop_assistant.custom_logging import (
     log_lines,
     has_encountered_error,
@@ -174,6 +181,8 @@ async def update_files(exe_dir: Path, root_dir: Path, mode: Mode.ALL):
     run_context = await make_run_context_from_paths(exe_dir=exe_dir, root_dir=root_dir)
 
     await updating.update(run_context)
+    # Built after updating, since that may replace the injection library.
+    run_context.file_index = build_file_index(root_dir)
 
     scripts = read_scripts(run_context)
 
@@ -186,21 +195,44 @@ async def update_files(exe_dir: Path, root_dir: Path, mode: Mode.ALL):
         inject_scripts=user_inject_scripts + lib_inject_scripts,
     )
 
-    aseprites = read_aseprites(run_context)
+    aseprites = read_aseprites(run_context, stages=ledger_mod.get_stages(mode))
+    input_files = scripts + user_inject_scripts + lib_inject_scripts + aseprites
     if mode in (mode.ALL, mode.SCRIPTS):
         update_scripts(
             run_context=run_context,
             scripts=scripts,
             aseprites=aseprites,
+            inject_scripts=lib_inject_scripts + user_inject_scripts,
+        )
+        ledger_mod.record_processed(
+            run_context.ledger,
+            files=input_files,
+            stage=Stage.SCRIPTS,
         )
 
     if mode in (mode.ALL, mode.ANIMS):
-        await update_anims(
+        exported_aseprites = await update_anims(
             run_context=run_context,
             scripts=scripts,
             aseprites=aseprites,
         )
+        if exported_aseprites is not None:
+            ledger_mod.record_processed(
+                run_context.ledger, files=exported_aseprites, stage=Stage.ANIMS
+            )
+            ledger_mod.record_unprocessed(
+                run_context.ledger,
+                files=[
+                    aseprite
+                    for aseprite in aseprites
+                    if aseprite not in exported_aseprites
+                ],
+                stage=Stage.ANIMS,
+            )
 
+    ledger_mod.remove_missing(
+        run_context.ledger, keys=[file.ledger_state.key for file in input_files]
+    )
     update_dotfile_after_saving(
         now=datetime.datetime.now(), dotfile=run_context.dotfile, mode=mode
     )
@@ -209,7 +241,13 @@ async def update_files(exe_dir: Path, root_dir: Path, mode: Mode.ALL):
     await save_assets(run_context.root_dir, assets)
 
     dotfile_mod.save_dotfile(run_context)
+    aseprite_cache_mod.save(run_context)
+    sprite_outputs_mod.save(run_context)
+    ledger_mod.save(run_context)
+    script_results_mod.save(run_context)
 
 
 if __name__ == "__main__":
+    # Aseprite files may be read in worker processes, which the frozen exe runs.
+    multiprocessing.freeze_support()
     run_as_file()
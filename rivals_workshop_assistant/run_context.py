@@ -1,16 +1,23 @@
 import asyncio
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import List, TYPE_CHECKING
 
 from loguru import logger
 
 from rivals_workshop_assistant import (
+    aseprite_cache_mod,
     dotfile_mod,
+    sprite_outputs_mod,
     assistant_config_mod,
     character_config_mod,
+    ledger_mod,
+    script_results_mod,
 )
 
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.file_index import FileIndex
+
 
 @dataclass
 class RunContext:
@@ -19,6 +26,11 @@ class RunContext:
     dotfile: dict
     assistant_config: dict
     character_config: dict
+    aseprite_cache: dict = None
+    sprite_outputs: dict = None
+    file_index: "FileIndex" = None
+    ledger: dict = None
+    script_results: dict = None
 
 
 async def make_run_context_from_paths(exe_dir: Path, root_dir: Path) -> RunContext:
@@ -29,6 +41,10 @@ async def make_run_context_from_paths(exe_dir: Path, root_dir: Path) -> RunConte
         dotfile=dotfile,
         assistant_config=assistant_config,
         character_config=character_config,
+        aseprite_cache=aseprite_cache_mod.read(root_dir),
+        sprite_outputs=sprite_outputs_mod.read(root_dir),
+        ledger=ledger_mod.read(root_dir),
+        script_results=script_results_mod.read(root_dir),
     )
     logger.info(f"Dotfile is {dotfile}")
     logger.info(f"assistant config is {assistant_config}")
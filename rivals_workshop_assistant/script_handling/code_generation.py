@@ -4,6 +4,8 @@ import typing
 import parse
 from inflector import English
 
+from rivals_workshop_assistant.script_handling.script_document import ScriptDocument
+
 if typing.TYPE_CHECKING:
     from rivals_workshop_assistant.script_handling.script_mod import Script
 
@@ -11,14 +13,28 @@ if typing.TYPE_CHECKING:
 def handle_codegen(scripts: list["Script"]):
     for script in scripts:
         if script.is_fresh:
-            script.working_content = handle_codegen_for_script(script.working_content)
+            handle_codegen_for_document(script.document)
 
 
 def handle_codegen_for_script(content: str) -> str:
-    lines = content.split("\n")
-    new_lines = [handle_codegen_for_line(line) for line in lines]
-    content = "\n".join(new_lines)
-    return content
+    document = ScriptDocument(content)
+    handle_codegen_for_document(document)
+    return document.text
+
+
+def handle_codegen_for_document(document: ScriptDocument):
+    new_lines = []
+    is_changed = False
+    for line in document.lines:
+        new_line = handle_codegen_for_line(line)
+        if new_line == line:
+            new_lines.append(line)
+        else:
+            # Generated code can be several lines.
+            new_lines.extend(new_line.split("\n"))
+            is_changed = True
+    if is_changed:
+        document.set_lines(new_lines)
 
 
 def handle_codegen_for_line(line: str) -> str:
@@ -0,0 +1,140 @@
+"""Splits GML into the tokens the assistant looks for, in one pass,
+so names inside comments and strings aren't mistaken for code."""
+
+import re
+from enum import Enum
+from typing import Dict, List, NamedTuple, Set, Union
+
+# noinspection PyPackageRequirements
+from backports.cached_property import cached_property
+
+
+class TokenKind(Enum):
+    IDENTIFIER = "identifier"
+    STRING = "string"
+    COMMENT = "comment"
+    DIRECTIVE = "directive"
+
+
+class Token(NamedTuple):
+    kind: TokenKind
+    text: str
+    start: int
+    end: int
+
+
+# Rivals uses GameMaker 1.4, where strings have no escapes and may span lines.
+# Numbers are matched so the letters in 2f or $FF aren't read as identifiers,
+# but aren't kept. Region directives take the rest of their line as a label.
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+    |(?P<string>"[^"]*(?:"|\Z)|'[^']*(?:'|\Z))
+    |(?P<directive>\#(?:region|endregion)\b[^\n]*|\#[A-Za-z_]\w*)
+    |(?P<number>\d\w*|\$[0-9A-Fa-f]\w*|\.\d\w*)
+    |(?P<identifier>[A-Za-z_]\w*)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+_KINDS_BY_GROUP = {kind.value: kind for kind in TokenKind}
+
+DEFINE_DIRECTIVE = "#define"
+MACRO_DIRECTIVE = "#macro"
+
+
+def tokenize(gml: str) -> List[Token]:
+    return [
+        Token(_KINDS_BY_GROUP[match.lastgroup], match.group(), *match.span())
+        for match in _TOKEN_PATTERN.finditer(gml)
+        if match.lastgroup in _KINDS_BY_GROUP
+    ]
+
+
+class GmlTokens:
+    """The tokens of some GML, and what's found from them."""
+
+    def __init__(self, gml: str):
+        self.gml = gml
+        self.tokens = tokenize(gml)
+
+    @cached_property
+    def used_names(self) -> Set[str]:
+        """Identifiers in code, other than the names directives declare."""
+        return {
+            token.text
+            for previous, token in self._pairs()
+            if token.kind == TokenKind.IDENTIFIER and not _is_declaration(previous)
+        }
+
+    @cached_property
+    def called_names(self) -> Set[str]:
+        """Used names that are called, like name()."""
+        return {
+            token.text
+            for previous, token in self._pairs()
+            if token.kind == TokenKind.IDENTIFIER
+            and not _is_declaration(previous)
+            and self.gml.startswith("(", token.end)
+        }
+
+    @cached_property
+    def declared_names(self) -> Dict[str, Set[str]]:
+        """The names after each directive, like the name in #define name,
+        by directive."""
+        declared_names = {}
+        for previous, token in self._pairs():
+            if token.kind == TokenKind.IDENTIFIER and _is_declaration(previous):
+                declared_names.setdefault(previous.text, set()).add(token.text)
+        return declared_names
+
+    @cached_property
+    def code_lines(self) -> List[str]:
+        """The GML's lines, with comments and the insides of strings blanked out.
+        Blanking keeps every other character where it was."""
+        pieces = []
+        position = 0
+        for token in self.tokens:
+            if token.kind == TokenKind.COMMENT:
+                blanked = _blank(token.text)
+            elif token.kind == TokenKind.STRING:
+                blanked = _blank_string(token.text)
+            else:
+                continue
+            pieces.append(self.gml[position : token.start])
+            pieces.append(blanked)
+            position = token.end
+        pieces.append(self.gml[position:])
+        return "".join(pieces).split("\n")
+
+    def _pairs(self):
+        """Yield each token with the one before it, or None for the first."""
+        return zip([None, *self.tokens], self.tokens)
+
+
+def _is_declaration(previous: Token) -> bool:
+    return (
+        previous is not None
+        and previous.kind == TokenKind.DIRECTIVE
+        and previous.text in (DEFINE_DIRECTIVE, MACRO_DIRECTIVE)
+    )
+
+
+def _blank(text: str) -> str:
+    return re.sub(r"[^\n]", " ", text)
+
+
+def _blank_string(text: str) -> str:
+    """Keep the quotes, so the string still reads as a value."""
+    quote = text[0]
+    is_closed = len(text) > 1 and text.endswith(quote)
+    if is_closed:
+        return quote + _blank(text[1:-1]) + quote
+    return quote + _blank(text[1:])
+
+
+def get_gml_tokens(gml: Union[str, GmlTokens]) -> GmlTokens:
+    """Tokens can be given instead of GML, so whoever holds GML that's looked at
+    many times can keep its tokens, and it's only tokenized once."""
+    if isinstance(gml, GmlTokens):
+        return gml
+    return GmlTokens(gml)
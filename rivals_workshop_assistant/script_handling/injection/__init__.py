@@ -2,6 +2,7 @@ import typing
 from typing import List
 
 from .application import apply_injection
+from .dependency_handling import GmlInjection
 from .library import read_injection_library
 
 from rivals_workshop_assistant.aseprite_handling import Anim
@@ -13,10 +14,15 @@ if typing.TYPE_CHECKING:
 
 
 def handle_injection(
-    run_context: RunContext, scripts: list["Script"], anims: List[Anim]
+    run_context: RunContext,
+    scripts: list["Script"],
+    anims: List[Anim],
+    injection_library: List[GmlInjection] = None,
 ):
-    """Controller"""
-    injection_library = read_injection_library(run_context.root_dir)
+    """Controller
+    The injection library is read if it isn't given."""
+    if injection_library is None:
+        injection_library = read_injection_library(run_context.root_dir)
     apply_injection(
         scripts=scripts,
         injection_library=injection_library,
@@ -38,4 +44,4 @@ def freshen_scripts_that_have_modified_dependencies(
             )
             for script in scripts:
                 if script.path in clients:
-                    script.file_is_fresh = True
+                    script.is_fresh = True
@@ -1,9 +1,18 @@
 import abc
-import string
 import textwrap
 from typing import List, Tuple, Union
 from pathlib import Path
 
+# noinspection PyPackageRequirements
+from backports.cached_property import cached_property
+
+from rivals_workshop_assistant.script_handling.gml_lexer import (
+    GmlTokens,
+    get_gml_tokens,
+    DEFINE_DIRECTIVE,
+    MACRO_DIRECTIVE,
+)
+
 
 class GmlInjection(abc.ABC):
     def __init__(
@@ -20,10 +29,18 @@ class GmlInjection(abc.ABC):
         self.give_pattern = give_pattern
         self.filepath = filepath
 
+    @cached_property
+    def tokens(self) -> GmlTokens:
+        """Kept, since the injection's gml is checked for what it uses
+        for every script that uses it."""
+        return GmlTokens(self.gml)
+
     def is_used(self, gml):
+        """gml can be given as its tokens."""
         raise NotImplementedError
 
     def is_given(self, gml):
+        """gml can be given as its tokens."""
         raise NotImplementedError
 
     def __str__(self):
@@ -98,23 +115,11 @@ class Define(GmlDeclaration):
         )
 
     def is_used(self, gml):
-        use_splits = gml.split(f"{self.name}(")
-        # range len is clearer than enumerate here I think
-        for first_i in range(len(use_splits) - 1):
-            is_usage = (
-                _prev_char_is_terminator(use_splits[first_i])
-            ) and not use_splits[first_i].endswith("#define ")
-            if is_usage:
-                return True
-        return False
+        return self.name in get_gml_tokens(gml).called_names
 
     def is_given(self, gml):
-        use_splits = gml.split(f"#define {self.name}")
-        for first_i in range(len(use_splits) - 1):
-            is_usage = _next_char_is_terminator(use_splits[first_i + 1])
-            if is_usage:
-                return True
-        return False
+        declared_names = get_gml_tokens(gml).declared_names
+        return self.name in declared_names.get(DEFINE_DIRECTIVE, ())
 
     @classmethod
     def from_gml(cls, name: str, content: str, filepath: Path = None):
@@ -273,24 +278,11 @@ class Macro(GmlDeclaration):
         )
 
     def is_used(self, gml):
-        use_splits = gml.split(f"{self.name}")
-        for first_i in range(len(use_splits) - 1):
-            is_usage = (
-                _prev_char_is_terminator(use_splits[first_i])
-                and _next_char_is_terminator(use_splits[first_i + 1])
-                and not use_splits[first_i].endswith("#macro ")  # Isn't a definition
-            )
-            if is_usage:
-                return True
-        return False
+        return self.name in get_gml_tokens(gml).used_names
 
     def is_given(self, gml):
-        use_splits = gml.split(f"#macro {self.name}")
-        for first_i in range(len(use_splits) - 1):
-            is_usage = _next_char_is_terminator(use_splits[first_i + 1])
-            if is_usage:
-                return True
-        return False
+        declared_names = get_gml_tokens(gml).declared_names
+        return self.name in declared_names.get(MACRO_DIRECTIVE, ())
 
     @classmethod
     def from_gml(cls, name: str, content: str, filepath: Path = None):
@@ -304,23 +296,3 @@ class Macro(GmlDeclaration):
 
 
 INJECT_TYPES = (Define, Macro)
-
-
-def _char_is_token_terminator(char: str):
-    return char.isspace() or (char != "_" and char in string.punctuation)
-
-
-def _prev_char_is_terminator(split):
-    if split:
-        prev_char = split[-1]
-        return _char_is_token_terminator(prev_char)
-    else:
-        return True
-
-
-def _next_char_is_terminator(split):
-    if split:
-        prev_char = split[0]
-        return _char_is_token_terminator(prev_char)
-    else:
-        return True
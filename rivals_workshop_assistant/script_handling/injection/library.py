@@ -1,7 +1,7 @@
 import itertools
 import re
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Tuple, TYPE_CHECKING
 
 import rivals_workshop_assistant.paths
 from .dependency_handling import (
@@ -11,9 +11,24 @@ from .dependency_handling import (
     _normalize_block_comments,
 )
 
+if TYPE_CHECKING:
+    from rivals_workshop_assistant.script_handling.script_mod import Script
+
+
+def read_injection_library(
+    root_dir: Path, inject_scripts: List["Script"] = None
+) -> List[GmlInjection]:
+    """Controller
+    If the inject scripts were already read, their content is used
+    instead of reading the files again."""
+    if inject_scripts is not None:
+        full_lib = []
+        for script in inject_scripts:
+            full_lib.extend(
+                get_injection_library_from_script(script.original_content, script.path)
+            )
+        return full_lib
 
-def read_injection_library(root_dir: Path) -> List[GmlInjection]:
-    """Controller"""
     inject_gml_paths = list(
         (root_dir / rivals_workshop_assistant.paths.INJECT_FOLDER).rglob("*.gml")
     ) + list(
@@ -63,7 +78,11 @@ def get_injection_library_from_gml(gml: str) -> List[GmlInjection]:
 
 
 def get_injection_library_from_file(gml_path: Path) -> List[GmlInjection]:
-    dependencies = get_injection_library_from_gml(gml_path.read_text())
+    return get_injection_library_from_script(gml_path.read_text(), gml_path)
+
+
+def get_injection_library_from_script(gml: str, gml_path: Path) -> List[GmlInjection]:
+    dependencies = get_injection_library_from_gml(gml)
     #saving filepath ideally done through constructor 
     #didn't feel like upsetting signature of all other functions just yet
     for dep in dependencies:
@@ -0,0 +1,123 @@
+"""A script's lines, split once and shared by the processing stages,
+which read and edit them in place. It's only joined back into text when
+the text is needed, usually when saving."""
+
+from typing import List, Optional
+
+from rivals_workshop_assistant.script_handling.gml_lexer import GmlTokens
+
+OLD_INJECTION_START_MARKERS = ["// vvv LIBRARY DEFINES AND MACROS vvv\n"]
+INJECTION_START_MARKER = "// #region vvv LIBRARY DEFINES AND MACROS vvv\n"
+INJECTION_START_WARNING = (
+    "// DANGER File below this point will be overwritten! "
+    "Generated defines and macros below.\n"
+    "// Write NO-INJECT in a comment above this area to disable injection."
+)
+OLD_INJECTION_START_HEADERS = [
+    f"{start}{INJECTION_START_WARNING}" for start in OLD_INJECTION_START_MARKERS
+]
+INJECTION_START_HEADER = f"{INJECTION_START_MARKER}{INJECTION_START_WARNING}"
+INJECTION_END_HEADER = (
+    "// DANGER: "
+    "Write your code ABOVE the LIBRARY DEFINES AND MACROS header "
+    "or it will be overwritten!\n"
+    "// #endregion"
+)
+
+# Markers end with a newline, so within a line they're matched without it.
+_INJECTION_START_MARKER_LINES = [
+    marker.rstrip("\n")
+    for marker in [INJECTION_START_MARKER, *OLD_INJECTION_START_MARKERS]
+]
+
+
+class ScriptDocument:
+    def __init__(self, text: str):
+        self._lines = text.split("\n")
+        self._text: Optional[str] = text
+        self._user_content: Optional[str] = None
+        self._tokens: Optional[GmlTokens] = None
+        self._user_tokens: Optional[GmlTokens] = None
+
+    @property
+    def lines(self) -> List[str]:
+        """Don't edit the list directly, or the cached text won't know."""
+        return self._lines
+
+    @property
+    def tokens(self) -> GmlTokens:
+        """Kept until the text changes."""
+        if self._tokens is None:
+            self._tokens = GmlTokens(self.text)
+        return self._tokens
+
+    @property
+    def user_tokens(self) -> GmlTokens:
+        """The tokens of the user's part. Kept until that part changes."""
+        if self._user_tokens is None:
+            self._user_tokens = GmlTokens(self.user_content)
+        return self._user_tokens
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "\n".join(self._lines)
+        return self._text
+
+    def set_line(self, index: int, line: str):
+        """line mustn't contain newlines. Use set_lines to add lines."""
+        self._lines[index] = line
+        self._changed()
+
+    def set_lines(self, lines: List[str]):
+        self._lines = lines
+        self._changed()
+
+    def _changed(self):
+        self._text = None
+        self._user_content = None
+        self._tokens = None
+        self._user_tokens = None
+
+    @property
+    def user_content(self) -> str:
+        """The part of the script above the injection header, without trailing
+        whitespace. That's the part the user writes."""
+        if self._user_content is None:
+            self._user_content = self._get_user_content()
+        return self._user_content
+
+    def _get_user_content(self) -> str:
+        # The last line has no newline after it, so a marker can't end there.
+        for index, line in enumerate(self._lines[:-1]):
+            position = _find_start_marker(line)
+            if position is not None:
+                return "\n".join(self._lines[:index] + [line[:position]]).rstrip()
+        return self.text.rstrip()
+
+    def set_injected_gmls(self, gmls: List[str]):
+        """Replace everything below the user's part with the gmls,
+        between the injection headers. With no gmls, there are no headers."""
+        user_content = self.user_content
+        text = user_content
+        if gmls:
+            injection_gml = "\n\n".join(gmls)
+            text += f"""\
+
+
+{INJECTION_START_HEADER}
+{injection_gml}
+{INJECTION_END_HEADER}"""
+        self._lines = text.split("\n")
+        self._text = text
+        self._user_content = user_content
+        # The user's part is the same, so only the whole text's tokens are stale.
+        self._tokens = None
+
+
+def _find_start_marker(line: str) -> Optional[int]:
+    """Return where the marker that ends the line starts, if one does."""
+    for marker in _INJECTION_START_MARKER_LINES:
+        if line.endswith(marker):
+            return len(line) - len(marker)
+    return None
@@ -6,11 +6,12 @@ from typing import List
 
 from loguru import logger
 
-from rivals_workshop_assistant.file_handling import (
-    File,
-    _get_modified_time,
-)
+from rivals_workshop_assistant import ledger_mod
+from rivals_workshop_assistant.file_handling import File
 from rivals_workshop_assistant.dotfile_mod import get_script_processed_time
+from rivals_workshop_assistant.file_index import get_folder_kind, index_file
+from rivals_workshop_assistant.ledger_mod import FileState, Stage
+from rivals_workshop_assistant.script_handling.script_document import ScriptDocument
 
 from rivals_workshop_assistant.paths import (
     SCRIPTS_FOLDER,
@@ -28,8 +29,16 @@ class Script(File):
         original_content: str = None,
         working_content: str = None,
         processed_time: datetime = None,
+        ledger_state: FileState = None,
+        is_fresh: bool = None,
     ):
-        super().__init__(path, modified_time, processed_time)
+        super().__init__(
+            path,
+            modified_time,
+            processed_time,
+            ledger_state=ledger_state,
+            is_fresh=is_fresh,
+        )
         self._original_content = original_content
         self.working_content = working_content
 
@@ -41,8 +50,17 @@ class Script(File):
             )
         return self._original_content
 
+    @property
+    def document(self) -> ScriptDocument:
+        """The working content as lines, which processing edits in place."""
+        if self._document is None:
+            self._document = ScriptDocument(self.working_content)
+        return self._document
+
     @property
     def working_content(self):
+        if self._document is not None:
+            return self._document.text
         if self._working_content is None:
             self._working_content = self.original_content
         return self._working_content
@@ -50,12 +68,14 @@ class Script(File):
     @working_content.setter
     def working_content(self, value):
         self._working_content = value
+        self._document = None
 
     def save(self, root_dir: Path):
-        if self.working_content == "":
+        working_content = self.working_content
+        if working_content == "":
             logger.warning(f"Trying to save an empty file {self.path}")
             return
-        if self.working_content != self.original_content:
+        if working_content != self.original_content:
             with open(
                 (root_dir / self.path),
                 "w",
@@ -63,7 +83,18 @@ class Script(File):
                 errors="surrogateescape",
                 newline="\n",
             ) as f:
-                f.write(self.working_content)
+                f.write(working_content)
+            if self.ledger_state is not None:
+                # The saved content is what was processed.
+                stat = (root_dir / self.path).stat()
+                self.ledger_state = FileState(
+                    key=self.ledger_state.key,
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    digest=ledger_mod.get_digest(
+                        working_content.encode("UTF8", "surrogateescape")
+                    ),
+                )
 
     def __eq__(self, other: "Script"):
         return (
@@ -79,15 +110,32 @@ class Script(File):
 
 def read_scripts(run_context: RunContext, folder: str = SCRIPTS_FOLDER) -> List[Script]:
     """Returns all Scripts in a given directory (defaults to the scripts folder)."""
-    gml_paths = list((run_context.root_dir / folder).rglob("*.gml"))
+    kind = get_folder_kind(folder)
+    if run_context.file_index is not None:
+        gml_files = run_context.file_index.get_files(kind)
+    else:
+        gml_files = [
+            index_file(run_context.root_dir, path, kind)
+            for path in (run_context.root_dir / folder).rglob("*.gml")
+        ]
     processed_time = get_script_processed_time(dotfile=run_context.dotfile)
 
     scripts = []
-    for path in gml_paths:
+    for file in gml_files:
+        ledger_state, is_fresh = None, None
+        if run_context.ledger is not None:
+            ledger_state, is_fresh = ledger_mod.read_file(
+                run_context.ledger,
+                root_dir=run_context.root_dir,
+                file=file,
+                processed_times={Stage.SCRIPTS: processed_time},
+            )
         script = Script(
-            path=path,
-            modified_time=_get_modified_time(path),
+            path=run_context.root_dir / file.path,
+            modified_time=file.modified_time,
             processed_time=processed_time,
+            ledger_state=ledger_state,
+            is_fresh=is_fresh,
         )
         scripts.append(script)
 
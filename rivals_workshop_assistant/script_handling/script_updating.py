@@ -1,26 +1,58 @@
-from typing import List
+from pathlib import Path
+from typing import List, Dict, Optional
 
+from rivals_workshop_assistant import ledger_mod, script_results_mod
 from rivals_workshop_assistant.aseprite_handling import Anim
+from rivals_workshop_assistant.aseprite_handling.anim_index import (
+    get_aseprites_for_scripts,
+    get_anim_name_for_script,
+    get_anims_by_script_name,
+    update_anim_index,
+)
 from rivals_workshop_assistant.aseprite_handling.anims import get_anims
 from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
+from rivals_workshop_assistant.dotfile_mod import (
+    ANIM_INDEX_FIELD,
+    get_assistant_version_string,
+    get_injection_dependencies,
+    update_dotfile_injection_clients,
+)
 from rivals_workshop_assistant.run_context import RunContext
 from rivals_workshop_assistant.script_handling.code_generation import handle_codegen
-from rivals_workshop_assistant.script_handling.injection import handle_injection
+from rivals_workshop_assistant.script_handling.injection import (
+    GmlInjection,
+    handle_injection,
+    read_injection_library,
+)
 from rivals_workshop_assistant.script_handling.script_mod import Script, save_scripts
 from rivals_workshop_assistant.script_handling.warning_handling import handle_warning
+from rivals_workshop_assistant.script_handling.warning_handling.warnings import (
+    get_warning_types,
+)
 
 
 def update_scripts(
-    run_context: RunContext, scripts: list[Script], aseprites: list[Aseprite]
+    run_context: RunContext,
+    scripts: list[Script],
+    aseprites: list[Aseprite],
+    inject_scripts: list[Script] = None,
 ):
-    # I don't like that we need to load all anims to update scripts.
-    # Instead, could save the attack timing info to the dotfile when animations run,
-    # and then propagate to scripts. That would require doing animations first each run.
-    anims = get_anims(aseprites)
+    # Only the aseprite files with anims of changed attack scripts,
+    # or whose windows may have changed, are read.
+    needed_aseprites = get_aseprites_for_scripts(
+        scripts, aseprites, anim_index=run_context.dotfile.get(ANIM_INDEX_FIELD)
+    )
+    anims = get_anims(needed_aseprites)
+    update_anim_index(
+        run_context.dotfile.setdefault(ANIM_INDEX_FIELD, {}),
+        read_aseprites=needed_aseprites,
+        aseprites=aseprites,
+    )
     handle_scripts(
         run_context=run_context,
         scripts=scripts,
         anims=anims,
+        inject_scripts=inject_scripts,
     )
     save_scripts(run_context.root_dir, scripts)
 
@@ -29,7 +61,137 @@ def handle_scripts(
     run_context: RunContext,
     scripts: List[Script],
     anims: List[Anim],
+    inject_scripts: List[Script] = None,
 ):
+    """Scripts that were processed the same way before are given that result,
+    and only the rest are processed."""
+    injection_library = read_injection_library(
+        run_context.root_dir, inject_scripts=inject_scripts
+    )
+    result_keys = {}
+    if run_context.script_results is not None:
+        anims_by_script_name = get_anims_by_script_name(anims)
+        result_keys = _get_result_keys(
+            run_context,
+            scripts=scripts,
+            anims_by_script_name=anims_by_script_name,
+            injection_library=injection_library,
+        )
+        script_results_mod.remove_missing(
+            run_context.script_results,
+            paths=[
+                script_results_mod.get_path_key(run_context.root_dir, script.path)
+                for script in scripts
+            ],
+        )
+        scripts = [
+            script
+            for script in scripts
+            if not _apply_result(
+                run_context,
+                script,
+                key=result_keys.get(script.path),
+                anim=anims_by_script_name.get(get_anim_name_for_script(script)),
+            )
+        ]
+
     handle_warning(assistant_config=run_context.assistant_config, scripts=scripts)
     handle_codegen(scripts)
-    handle_injection(run_context, scripts=scripts, anims=anims)
+    handle_injection(
+        run_context,
+        scripts=scripts,
+        anims=anims,
+        injection_library=injection_library,
+    )
+
+    for script in scripts:
+        if script.path in result_keys:
+            script_results_mod.set_result(
+                run_context.script_results,
+                path=script_results_mod.get_path_key(run_context.root_dir, script.path),
+                key=result_keys[script.path],
+                content=script.working_content,
+                clients=[
+                    script_results_mod.get_path_key(run_context.root_dir, dependency)
+                    for dependency in get_injection_dependencies(
+                        run_context.dotfile, script.path
+                    )
+                ],
+            )
+
+
+def _get_result_keys(
+    run_context: RunContext,
+    scripts: List[Script],
+    anims_by_script_name: Dict[str, Anim],
+    injection_library: List[GmlInjection],
+) -> Dict[Path, str]:
+    """Return the result key of each script that would be processed, by path.
+    It covers everything processing the script depends on."""
+    warning_names = sorted(
+        type(warning_type).__name__
+        for warning_type in get_warning_types(run_context.assistant_config)
+    )
+    library_digest = script_results_mod.make_key(
+        injections=[
+            [
+                type(injection).__name__,
+                injection.name,
+                injection.gml,
+                (
+                    script_results_mod.get_path_key(
+                        run_context.root_dir, injection.filepath
+                    )
+                    if injection.filepath is not None
+                    else None
+                ),
+            ]
+            for injection in injection_library
+        ]
+    )
+    assistant_version = get_assistant_version_string(run_context.dotfile)
+
+    result_keys = {}
+    for script in scripts:
+        anim = anims_by_script_name.get(get_anim_name_for_script(script))
+        if not (script.is_fresh or (anim is not None and anim.windows_are_fresh)):
+            continue
+        result_keys[script.path] = script_results_mod.make_key(
+            content=ledger_mod.get_digest(
+                script.working_content.encode("UTF8", "surrogateescape")
+            ),
+            # Unchanged scripts are only injected into, when their windows change.
+            is_fresh=script.is_fresh,
+            warnings=warning_names,
+            library=library_digest,
+            windows=anim.window_hash if anim is not None else None,
+            assistant_version=assistant_version,
+        )
+    return result_keys
+
+
+def _apply_result(
+    run_context: RunContext, script: Script, key: Optional[str], anim: Optional[Anim]
+) -> bool:
+    """Give the script its previous result for the key, and return if it had one."""
+    if key is None:
+        return False
+    result = script_results_mod.get_result(
+        run_context.script_results,
+        path=script_results_mod.get_path_key(run_context.root_dir, script.path),
+        key=key,
+    )
+    if result is None:
+        return False
+    script.working_content = result[script_results_mod.CONTENT_FIELD]
+    update_dotfile_injection_clients(
+        dotfile=run_context.dotfile,
+        client_script=script.path,
+        dependencies=[
+            run_context.root_dir / client
+            for client in result[script_results_mod.CLIENTS_FIELD]
+        ],
+    )
+    if anim is not None:
+        anim.save_window_hash()
+    return True
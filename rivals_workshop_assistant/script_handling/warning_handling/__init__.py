@@ -1,12 +1,12 @@
-import re
-
 from rivals_workshop_assistant.script_handling.warning_handling.warnings import (
     get_warning_types,
 )
 from rivals_workshop_assistant.script_handling.warning_handling.base import (
     WARNING_PREFIX,
     WarningType,
+    write_warnings,
 )
+from rivals_workshop_assistant.script_handling.script_document import ScriptDocument
 from rivals_workshop_assistant.script_handling.script_mod import Script
 
 
@@ -18,17 +18,30 @@ def handle_warning(assistant_config: dict, scripts: list[Script]):
 
 
 def _apply_warnings_to_script(script: Script, warning_types: set[WarningType]):
-    script.working_content = remove_warnings(script.working_content)
+    remove_document_warnings(script.document)
+    # Every type checks the same tokens before any warning is written,
+    # since writing one changes the document.
+    warning_texts: dict[int, list[str]] = {}
     for warning_type in warning_types:
-        _apply_warning_to_script(script, warning_type)
+        for line_num in warning_type.detect(script):
+            warning_texts.setdefault(line_num, []).append(
+                warning_type.get_warning_text()
+            )
+    write_warnings(warning_texts, document=script.document)
 
 
 def remove_warnings(script_content: str) -> str:
-    stripped = re.sub(
-        pattern=fr"{WARNING_PREFIX}.*(\n|$)", repl="\n", string=script_content
-    )
-    return stripped
-
-
-def _apply_warning_to_script(script: Script, warning_type: WarningType):
-    warning_type.apply(script)
+    document = ScriptDocument(script_content)
+    remove_document_warnings(document)
+    return document.text
+
+
+def remove_document_warnings(document: ScriptDocument):
+    lines = document.lines
+    if not any(WARNING_PREFIX in line for line in lines):
+        return
+    stripped = [line.split(WARNING_PREFIX, maxsplit=1)[0] for line in lines]
+    if WARNING_PREFIX in lines[-1]:
+        # A warning on the last line is replaced with a newline, like the others.
+        stripped.append("")
+    document.set_lines(stripped)
@@ -1,7 +1,8 @@
 import abc
 from pathlib import Path
-from typing import List
+from typing import Dict, Iterator, List, Tuple
 
+from rivals_workshop_assistant.script_handling.script_document import ScriptDocument
 from rivals_workshop_assistant.script_handling.script_mod import Script
 
 WARNING_PREFIX = " // WARN: "
@@ -14,35 +15,36 @@ class WarningType(abc.ABC):
         raise NotImplementedError
 
     def apply(self, script: Script):
-        if not self._should_apply_to_script(script):
+        detection_lines = self.detect(script)
+        if not detection_lines:
             return []
-
-        detection_lines = self.get_detection_lines(script)
-        script.working_content = self.write_warning(
-            detection_lines=detection_lines, gml=script.working_content
-        )
+        self.write_warning(detection_lines=detection_lines, document=script.document)
 
         # This is just for debugging purposes
-        return [
-            line
-            for i, line in enumerate(script.working_content.splitlines())
-            if i in detection_lines
-        ]
+        return [script.document.lines[i] for i in detection_lines]
+
+    def detect(self, script: Script) -> List[int]:
+        """Return the numbers of the lines to warn on, without writing the warnings."""
+        if not self._should_apply_to_script(script):
+            return []
+        return self.get_detection_lines(script)
 
     def get_detection_lines(self, script: Script):
+        """Lines are checked without their comments and strings,
+        other than for NO-WARN."""
         detection_lines = []
-        for number, line in enumerate(script.working_content.splitlines()):
+        for number, (line, code_line) in enumerate(get_lines_with_code(script)):
             if not is_line_suppressed(line) and self._should_warn_for_line(
-                script, line
+                script, code_line
             ):
                 detection_lines.append(number)
         return detection_lines
 
-    def write_warning(self, detection_lines: List[int], gml: str) -> str:
-        lines = gml.split("\n")
-        for line_num in detection_lines:
-            lines[line_num] += self.get_warning_text()
-        return "\n".join(lines)
+    def write_warning(self, detection_lines: List[int], document: ScriptDocument):
+        write_warnings(
+            {line_num: [self.get_warning_text()] for line_num in detection_lines},
+            document=document,
+        )
 
     @classmethod
     def get_warning_text(cls) -> str:
@@ -62,6 +64,23 @@ class WarningType(abc.ABC):
         return True
 
 
+def write_warnings(warning_texts: Dict[int, List[str]], document: ScriptDocument):
+    """Append each line's warning texts, by line number.
+    The document is changed once, so its tokens are only made again once."""
+    if not warning_texts:
+        return
+    lines = list(document.lines)
+    for line_num, texts in warning_texts.items():
+        lines[line_num] += "".join(texts)
+    document.set_lines(lines)
+
+
+def get_lines_with_code(script: Script) -> Iterator[Tuple[str, str]]:
+    """Yield each line of the script, with its code without comments and strings."""
+    document = script.document
+    return zip(document.lines, document.tokens.code_lines)
+
+
 def is_line_suppressed(line: str):
     return "NO-WARN" in line.upper()
 
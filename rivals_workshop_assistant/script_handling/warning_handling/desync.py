@@ -6,6 +6,7 @@ from rivals_workshop_assistant.script_handling.warning_handling.base import (
     WarningType,
     is_line_suppressed,
     is_draw_script,
+    get_lines_with_code,
 )
 
 
@@ -20,20 +21,32 @@ class ObjectVarSetInDrawScript(WarningType):
             return []
         detection_lines = []
         local_vars = []
-        for number, line in enumerate(script.working_content.splitlines()):
-            local_vars_in_line = re.findall(pattern=r"(?<=var )\w+", string=line)
-            local_vars += local_vars_in_line
+        pattern = _make_object_var_set_pattern(local_vars)
+        for number, (line, code_line) in enumerate(get_lines_with_code(script)):
+            local_vars_in_line = LOCAL_VAR_PATTERN.findall(code_line)
+            if local_vars_in_line:
+                local_vars += local_vars_in_line
+                pattern = _make_object_var_set_pattern(local_vars)
 
             if not is_line_suppressed(line) and self._should_warn_for_line(
-                local_vars=local_vars, line=line
+                pattern=pattern, line=code_line
             ):
                 detection_lines.append(number)
         return detection_lines
 
-    def _should_warn_for_line(self, local_vars: List[str], line: str) -> bool:
-        # A variable is set without 'var', and it is not in the list of local_vars
-        pattern = fr'^\s*(?!(?:{"|".join(["var"] + local_vars)}))\w+\s*(=|\+=|-=|\*=|\/=)\s*\S'
-        return re.search(pattern=pattern, string=line) is not None
+    def _should_warn_for_line(self, pattern: re.Pattern, line: str) -> bool:
+        return pattern.search(line) is not None
+
+
+LOCAL_VAR_PATTERN = re.compile(r"(?<=var )\w+")
+
+
+def _make_object_var_set_pattern(local_vars: List[str]) -> re.Pattern:
+    """Matches a variable set without 'var', that isn't one of the local_vars.
+    It's only made again when more local vars are found."""
+    return re.compile(
+        fr'^\s*(?!(?:{"|".join(["var"] + local_vars)}))\w+\s*(=|\+=|-=|\*=|\/=)\s*\S'
+    )
 
 
 class UnsafeCameraReadX(WarningType):
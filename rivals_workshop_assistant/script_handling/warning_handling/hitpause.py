@@ -5,6 +5,7 @@ from rivals_workshop_assistant.script_handling.script_mod import Script
 from rivals_workshop_assistant.script_handling.warning_handling.base import (
     is_line_suppressed,
     WarningType,
+    get_lines_with_code,
 )
 
 
@@ -12,13 +13,13 @@ class ABCHitpauseWarning(WarningType, abc.ABC):
     def get_detection_lines(self, script: Script):
         detection_lines = []
         guard_seen = False
-        for number, line in enumerate(script.working_content.splitlines()):
-            if _is_hitpause_guard(line):
+        for number, (line, code_line) in enumerate(get_lines_with_code(script)):
+            if _is_hitpause_guard(code_line):
                 guard_seen = True
             if (
                 not guard_seen
                 and not is_line_suppressed(line)
-                and self._should_warn_for_line(script=script, line=line)
+                and self._should_warn_for_line(script=script, line=code_line)
             ):
                 detection_lines.append(number)
         return detection_lines
@@ -38,9 +39,12 @@ def _is_hitpause_guard(line: str) -> bool:
     return NOT_HITPAUSE in line and "window_timer" not in line
 
 
+WINDOW_TIMER_EQ_PATTERN = re.compile(r"^\s*if.*(= window_timer\s*|\s*window_timer\s*=)")
+
+
 def _has_window_timer_eq_check(line: str) -> bool:
-    pattern = r"^\s*if.*(= window_timer\s*|\s*window_timer\s*=)"
-    return re.search(pattern=pattern, string=line) is not None
+    # Most lines don't mention it, so they skip the regex.
+    return "window_timer" in line and WINDOW_TIMER_EQ_PATTERN.search(line) is not None
 
 
 class CheckWindowTimerModuloWithoutCheckHitpause(ABCHitpauseWarning):
@@ -50,6 +54,8 @@ class CheckWindowTimerModuloWithoutCheckHitpause(ABCHitpauseWarning):
         return _has_window_timer_mod_check(line) and not NOT_HITPAUSE in line
 
 
+WINDOW_TIMER_MOD_PATTERN = re.compile(r"^\s*if.*window_timer\s*%\s*\S+\s*==?\s*0")
+
+
 def _has_window_timer_mod_check(line: str) -> bool:
-    pattern = r"^\s*if.*window_timer\s*%\s*\S+\s*==?\s*0"
-    return re.search(pattern=pattern, string=line) is not None
+    return "window_timer" in line and WINDOW_TIMER_MOD_PATTERN.search(line) is not None
@@ -0,0 +1,95 @@
+"""Reads and saves what processing each script gave on previous runs,
+by everything the result depends on, so a script that was processed the same
+way before is given that result instead of being processed again."""
+
+import json
+import typing
+from hashlib import blake2b
+from pathlib import Path
+
+from loguru import logger
+
+from rivals_workshop_assistant.file_handling import create_file
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER
+
+if typing.TYPE_CHECKING:
+    from rivals_workshop_assistant.run_context import RunContext
+
+FILENAME = ".script_results"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increase when the entries change shape, so old ones are dropped.
+VERSION = 3
+VERSION_FIELD = "version"
+SCRIPTS_FIELD = "scripts"
+
+KEY_FIELD = "key"
+CONTENT_FIELD = "content"
+# The inject files the script was recorded as a client of, by path key.
+CLIENTS_FIELD = "injection_clients"
+
+
+def read(root_dir: Path) -> dict:
+    """Controller. Returns the latest result of each script, by path.
+    Only the latest is kept, so the file stays about the size of the scripts."""
+    try:
+        results = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("Script results file is unreadable, and being treated as empty.")
+        return {}
+    if not isinstance(results, dict) or results.get(VERSION_FIELD) != VERSION:
+        return {}
+    return results.get(SCRIPTS_FIELD, {})
+
+
+def save(run_context: "RunContext"):
+    """Controller"""
+    if run_context.script_results is None:
+        return
+    content = json.dumps(
+        {VERSION_FIELD: VERSION, SCRIPTS_FIELD: run_context.script_results},
+        separators=(",", ":"),
+    )
+    create_file(path=run_context.root_dir / PATH, content=content, overwrite=True)
+
+
+def get_path_key(root_dir: Path, path: Path) -> str:
+    """Paths are kept relative to the project, so moving it keeps its results."""
+    try:
+        return path.relative_to(root_dir).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def make_key(**parts) -> str:
+    """Return the key of the result made from the parts.
+    They must be JSON serializable."""
+    content = json.dumps(parts, sort_keys=True)
+    return blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+def get_result(results: dict, path: str, key: str) -> typing.Optional[dict]:
+    result = results.get(path)
+    if result is None or result[KEY_FIELD] != key:
+        return None
+    return result
+
+
+def set_result(
+    results: dict,
+    path: str,
+    key: str,
+    content: str,
+    clients: typing.List[str],
+):
+    """Replace the script's result."""
+    results[path] = {KEY_FIELD: key, CONTENT_FIELD: content, CLIENTS_FIELD: clients}
+
+
+def remove_missing(results: dict, paths: typing.Iterable[str]):
+    """Drop results for scripts that no longer exist."""
+    paths = set(paths)
+    for path in [path for path in results if path not in paths]:
+        del results[path]
@@ -0,0 +1,96 @@
+"""Reads and saves which spritesheets each anim was exported to,
+so old ones can be deleted without searching the sprites folder."""
+
+import json
+import typing
+from pathlib import Path
+
+from loguru import logger
+
+from rivals_workshop_assistant.file_handling import create_file
+from rivals_workshop_assistant.paths import ASSISTANT_FOLDER, SPRITES_FOLDER
+
+if typing.TYPE_CHECKING:
+    from rivals_workshop_assistant.run_context import RunContext
+
+FILENAME = ".sprite_outputs"
+PATH = ASSISTANT_FOLDER / FILENAME
+
+# Increase when the entries change shape, so old ones are dropped.
+VERSION = 3
+VERSION_FIELD = "version"
+OUTPUTS_FIELD = "outputs"
+
+FILE_FIELD = "file"
+# What the spritesheet was made from, so it's only exported again if that changed.
+DIGEST_FIELD = "digest"
+# Natively exported spritesheets also record what their frames were made from,
+# so changed frames can be redrawn in place.
+EXPORT_KEY_FIELD = "export_key"
+FRAME_DIGESTS_FIELD = "frame_digests"
+
+
+def read(root_dir: Path) -> dict:
+    """Controller. Returns the entry of each exported spritesheet by export name,
+    by aseprite path."""
+    try:
+        outputs = json.loads((root_dir / PATH).read_text())
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logger.warning("Sprite outputs file is unreadable, and being treated as empty.")
+        return {}
+    if not isinstance(outputs, dict) or outputs.get(VERSION_FIELD) != VERSION:
+        return {}
+    return outputs.get(OUTPUTS_FIELD, {})
+
+
+def save(run_context: "RunContext"):
+    """Controller"""
+    if run_context.sprite_outputs is None:
+        return
+    content = json.dumps(
+        {VERSION_FIELD: VERSION, OUTPUTS_FIELD: run_context.sprite_outputs},
+        separators=(",", ":"),
+    )
+    create_file(path=run_context.root_dir / PATH, content=content, overwrite=True)
+
+
+def sweep_orphans(
+    sprite_outputs: dict,
+    root_dir: Path,
+    expected: typing.Dict[str, typing.Optional[typing.Set[str]]],
+):
+    """Delete the spritesheets of anims that no longer exist.
+    expected has the export names of each aseprite file's anims, or None if
+    they weren't checked, in which case all of that file's outputs are kept.
+    Outputs of files missing from expected are all deleted."""
+    orphans = []
+    for source in list(sprite_outputs):
+        source_outputs = sprite_outputs[source]
+        if source not in expected:
+            orphans.extend(entry[FILE_FIELD] for entry in source_outputs.values())
+            del sprite_outputs[source]
+            continue
+        if expected[source] is None:
+            continue
+        for export_name in [
+            export_name
+            for export_name in source_outputs
+            if export_name not in expected[source]
+        ]:
+            orphans.append(source_outputs.pop(export_name)[FILE_FIELD])
+
+    # An anim that moved to another file may have been exported to the same name.
+    live_file_names = {
+        entry[FILE_FIELD]
+        for source_outputs in sprite_outputs.values()
+        for entry in source_outputs.values()
+    }
+    for file_name in orphans:
+        if file_name in live_file_names:
+            continue
+        path = root_dir / SPRITES_FOLDER / file_name
+        if path.exists():
+            logger.info(f"Deleting {path}, since its anim no longer exists.")
+            path.unlink()
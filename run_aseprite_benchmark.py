@@ -0,0 +1,112 @@
+"""Compares aseprite parsing throughput between the working tree and a git revision.
+
+python run_aseprite_benchmark.py --against HEAD~1 [aseprite files...]
+
+Defaults to the test sprites. Each tree is timed in its own process,
+so the two versions of the package never share an interpreter.
+Timings of small files vary a lot between runs, so the trees are timed in
+alternating rounds, and the median and range of the speedups are reported."""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+DEFAULT_PATHS = sorted(Path("tests/assets/sprites").glob("*.aseprite"))
+
+
+def time_parsing(paths: list[Path], repeats: int) -> dict:
+    """Time parsing the files with whichever package is first on the path."""
+    from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+        RawAsepriteFile,
+    )
+
+    contents = [path.read_bytes() for path in paths]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for content in contents:
+            RawAsepriteFile(content).get_tags()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "megabytes": sum(len(content) for content in contents) * repeats / 1e6,
+        "files": len(contents) * repeats,
+    }
+
+
+def run_in_tree(tree: Path, paths: list[Path], repeats: int) -> dict:
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            Path(__file__).absolute(),
+            "--worker",
+            "--repeats",
+            str(repeats),
+            *[str(path.absolute()) for path in paths],
+        ],
+        cwd=tree,
+    )
+    return json.loads(output)
+
+
+def extract_revision(revision: str, destination: Path):
+    archive = subprocess.check_output(
+        ["git", "archive", revision, "rivals_workshop_assistant"]
+    )
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(destination)
+
+
+def print_result(name: str, result: dict):
+    print(
+        f"{name}: {result['files'] / result['seconds']:.0f} files/s, "
+        f"{result['megabytes'] / result['seconds']:.2f} MB/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", type=Path)
+    parser.add_argument("--against", default="HEAD")
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    paths = args.paths or DEFAULT_PATHS
+
+    if args.worker:
+        sys.path.insert(0, str(Path.cwd()))
+        print(json.dumps(time_parsing(paths, args.repeats)))
+        return
+
+    baselines = []
+    currents = []
+    with tempfile.TemporaryDirectory() as baseline_tree:
+        extract_revision(args.against, Path(baseline_tree))
+        for _ in range(args.rounds):
+            baselines.append(run_in_tree(Path(baseline_tree), paths, args.repeats))
+            currents.append(run_in_tree(Path.cwd(), paths, args.repeats))
+
+    print_result(args.against, _get_median_result(baselines))
+    print_result("working tree", _get_median_result(currents))
+    speedups = [
+        baseline["seconds"] / current["seconds"]
+        for baseline, current in zip(baselines, currents)
+    ]
+    print(
+        f"Speedup: {statistics.median(speedups):.2f}x median "
+        f"({min(speedups):.2f}x to {max(speedups):.2f}x over {args.rounds} rounds)"
+    )
+
+
+def _get_median_result(results: list[dict]) -> dict:
+    return sorted(results, key=lambda result: result["seconds"])[len(results) // 2]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant.aseprite_handling.anim_index import (
+    get_aseprites_for_scripts,
+    update_anim_index,
+    get_anims_by_script_name,
+    ASEPRITE_FIELD,
+    START_FIELD,
+    END_FIELD,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from tests.test_aseprite_handling import make_anim
+from tests.testing_helpers import (
+    make_run_context,
+    make_script,
+    make_time,
+    TEST_LATER_DATETIME_STRING,
+)
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def read_test_aseprite(file_name: str, is_fresh: bool):
+    return read_aseprite(
+        run_context=make_run_context(root_dir=Path(".")),
+        path=TEST_SPRITES_PATH / f"{file_name}.aseprite",
+        processed_time=make_time("2000-01-01" if is_fresh else "2100-01-01"),
+    )
+
+
+def make_attack_script(name: str, is_fresh: bool):
+    return make_script(
+        path=Path(f"scripts/attacks/{name}.gml"),
+        processed_time=None if is_fresh else make_time(TEST_LATER_DATETIME_STRING),
+    )
+
+
+@pytest.fixture
+def aseprites():
+    return [
+        read_test_aseprite("1frame_2frame", is_fresh=False),
+        read_test_aseprite("nair", is_fresh=False),
+        read_test_aseprite("dair", is_fresh=True),
+    ]
+
+
+def test_get_aseprites_for_scripts__no_index(aseprites):
+    scripts = [make_attack_script("2frame", is_fresh=False)]
+
+    assert get_aseprites_for_scripts(scripts, aseprites, anim_index=None) == aseprites
+
+
+@pytest.mark.parametrize(
+    "scripts, expected_indices",
+    [
+        pytest.param([], [2], id="only_changed_files"),
+        pytest.param(
+            [make_attack_script("2frame", is_fresh=True)], [0, 2], id="changed_script"
+        ),
+        pytest.param(
+            [make_attack_script("2frame", is_fresh=False)],
+            [2],
+            id="unchanged_script",
+        ),
+        pytest.param(
+            [make_attack_script("unknown", is_fresh=True)], [2], id="unknown_anim"
+        ),
+    ],
+)
+def test_get_aseprites_for_scripts__index(aseprites, scripts, expected_indices):
+    anim_index = {}
+    update_anim_index(anim_index, read_aseprites=aseprites, aseprites=aseprites)
+
+    result = get_aseprites_for_scripts(scripts, aseprites, anim_index=anim_index)
+
+    assert result == [aseprites[index] for index in expected_indices]
+
+
+def test_update_anim_index(aseprites):
+    anim_index = {
+        "renamed": {ASEPRITE_FIELD: aseprites[0].cache_key},
+        "kept": {ASEPRITE_FIELD: aseprites[1].cache_key},
+        "gone": {ASEPRITE_FIELD: "anims/deleted.aseprite"},
+    }
+
+    update_anim_index(anim_index, read_aseprites=aseprites[:1], aseprites=aseprites)
+
+    assert anim_index == {
+        "kept": {ASEPRITE_FIELD: aseprites[1].cache_key},
+        "1frame": {
+            ASEPRITE_FIELD: aseprites[0].cache_key,
+            START_FIELD: 0,
+            END_FIELD: 0,
+        },
+        "2frame": {
+            ASEPRITE_FIELD: aseprites[0].cache_key,
+            START_FIELD: 1,
+            END_FIELD: 2,
+        },
+    }
+
+
+def test_get_anims_by_script_name():
+    hurtbox_anim = make_anim(name="HURTBOX bair")
+    anims = [hurtbox_anim, make_anim(name="bair"), make_anim(name="fair")]
+
+    result = get_anims_by_script_name(anims)
+
+    assert list(result) == ["bair", "fair"]
+    assert result["bair"] is hurtbox_anim
@@ -0,0 +1,204 @@
+import os
+import shutil
+from pathlib import Path
+
+from rivals_workshop_assistant import aseprite_cache_mod
+from rivals_workshop_assistant.aseprite_handling.aseprites import (
+    read_aseprite,
+    read_aseprites,
+)
+from rivals_workshop_assistant.aseprite_handling.cached_files import (
+    CachedAsepriteFile,
+)
+from tests.testing_helpers import make_run_context, make_time
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def copy_sprite(tmp_path: Path, file_name: str) -> Path:
+    path = tmp_path / "anims" / file_name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(TEST_SPRITES_PATH / file_name, path)
+    return path
+
+
+def read_with_cache(tmp_path: Path, path: Path, cache: dict, dotfile: dict = None):
+    return read_aseprite(
+        run_context=make_run_context(
+            root_dir=tmp_path, dotfile=dotfile, aseprite_cache=cache
+        ),
+        path=path,
+        processed_time=make_time("2000-01-01"),
+    )
+
+
+def get_anim_keys(aseprite):
+    return [
+        (anim.name, anim.start, anim.end, [window.gml for window in anim.windows])
+        for anim in aseprite.anims
+    ]
+
+
+def get_layer_keys(aseprite):
+    layers = aseprite.content.layers
+    return (
+        [(layer.name, layer.layer_index) for layer in layers.normals],
+        {
+            name: [(layer.name, layer.layer_index) for layer in split]
+            for name, split in layers.splits.items()
+        },
+    )
+
+
+def test_unchanged_aseprite_is_read_from_cache(tmp_path):
+    path = copy_sprite(tmp_path, "1blah_2uair_1blah.aseprite")
+    cache = {}
+    first_dotfile = {}
+    first = read_with_cache(tmp_path, path, cache, first_dotfile)
+    first_anims = get_anim_keys(first)
+
+    second_dotfile = {}
+    second = read_with_cache(tmp_path, path, cache, second_dotfile)
+
+    assert isinstance(second.content.file_data, CachedAsepriteFile)
+    assert second.content.file_data._file_data is None
+    assert get_anim_keys(second) == first_anims
+    assert second_dotfile == first_dotfile
+
+
+def test_cached_layers_match_file(tmp_path):
+    path = copy_sprite(tmp_path, "split_foobar1_groups.aseprite")
+    cache = {}
+    first = read_with_cache(tmp_path, path, cache)
+    first_layers = get_layer_keys(first)
+
+    second = read_with_cache(tmp_path, path, cache)
+
+    assert isinstance(second.content.file_data, CachedAsepriteFile)
+    assert get_layer_keys(second) == first_layers
+
+
+def test_cached_layers_digest_matches_file(tmp_path):
+    path = copy_sprite(tmp_path, "split_blah1_2layers.aseprite")
+    cache = {}
+    first = read_with_cache(tmp_path, path, cache)
+    first_digests = [
+        first.content.file_data.get_layers_digest(0, 0, layer_indices)
+        for layer_indices in ([0], [1, 2], [0, 1, 2])
+    ]
+
+    second = read_with_cache(tmp_path, path, cache)
+
+    assert isinstance(second.content.file_data, CachedAsepriteFile)
+    assert [
+        second.content.file_data.get_layers_digest(0, 0, layer_indices)
+        for layer_indices in ([0], [1, 2], [0, 1, 2])
+    ] == first_digests
+
+
+def test_changed_aseprite_is_not_read_from_cache(tmp_path):
+    path = copy_sprite(tmp_path, "nair.aseprite")
+    cache = {}
+    _ = read_with_cache(tmp_path, path, cache).content
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    aseprite = read_with_cache(tmp_path, path, cache)
+
+    assert not isinstance(aseprite.content.file_data, CachedAsepriteFile)
+    assert cache["anims/nair.aseprite"]["mtime_ns"] == path.stat().st_mtime_ns
+
+
+def test_read_aseprite_is_closed_until_frames_are_needed(tmp_path):
+    path = copy_sprite(tmp_path, "nair.aseprite")
+    aseprite = read_with_cache(tmp_path, path, cache={})
+    file_data = aseprite.content.file_data
+    assert not file_data.is_open
+
+    assert [anim.name for anim in aseprite.anims]
+    assert not file_data.is_open
+
+    file_data.get_frames(0, 1)
+    assert file_data.is_open
+    aseprite.content.release()
+    assert not file_data.is_open
+
+
+def test_aseprite_cache_is_saved_and_read(tmp_path):
+    path = copy_sprite(tmp_path, "nair.aseprite")
+    run_context = make_run_context(root_dir=tmp_path, aseprite_cache={})
+    _ = read_aseprite(run_context=run_context, path=path).content
+
+    aseprite_cache_mod.save(run_context)
+
+    assert aseprite_cache_mod.read(tmp_path) == run_context.aseprite_cache
+
+
+def test_unreadable_aseprite_cache_is_empty(tmp_path):
+    (tmp_path / aseprite_cache_mod.PATH).parent.mkdir(parents=True)
+    (tmp_path / aseprite_cache_mod.PATH).write_text("{not json")
+
+    assert aseprite_cache_mod.read(tmp_path) == {}
+
+
+def test_remove_missing_aseprites_from_cache():
+    cache = {"anims/a.aseprite": {}, "anims/b.aseprite": {}}
+
+    aseprite_cache_mod.remove_missing(cache, keys=["anims/b.aseprite"])
+
+    assert cache == {"anims/b.aseprite": {}}
+
+
+PARALLEL_FILE_NAMES = ["nair.aseprite", "2frame_with_groups.aseprite", "fair.aseprite"]
+
+
+def read_all_with_cache(tmp_path: Path, processes: int) -> dict:
+    run_context = make_run_context(
+        root_dir=tmp_path,
+        aseprite_cache={},
+        assistant_config={"aseprite_parse_processes": processes},
+    )
+    for aseprite in read_aseprites(run_context):
+        _ = aseprite.content
+    return run_context.aseprite_cache
+
+
+def test_parallel_reading_matches_serial_reading(tmp_path):
+    for file_name in PARALLEL_FILE_NAMES:
+        copy_sprite(tmp_path, file_name)
+
+    serial = read_all_with_cache(tmp_path, processes=1)
+    parallel = read_all_with_cache(tmp_path, processes=2)
+
+    assert parallel == serial
+
+
+def test_parallel_reading_fills_cache_before_content_is_read(tmp_path):
+    for file_name in PARALLEL_FILE_NAMES:
+        copy_sprite(tmp_path, file_name)
+    run_context = make_run_context(
+        root_dir=tmp_path,
+        aseprite_cache={},
+        assistant_config={"aseprite_parse_processes": 2},
+    )
+
+    aseprites = read_aseprites(run_context)
+
+    assert all(aseprite.is_cached for aseprite in aseprites)
+
+
+def test_parallel_reading_skips_unreadable_files(tmp_path):
+    copy_sprite(tmp_path, "nair.aseprite")
+    (tmp_path / "anims" / "broken.aseprite").write_bytes(b"not an aseprite file")
+    run_context = make_run_context(
+        root_dir=tmp_path,
+        aseprite_cache={},
+        assistant_config={"aseprite_parse_processes": 2},
+    )
+
+    read_aseprites(run_context)
+
+    assert set(run_context.aseprite_cache) == {"anims/nair.aseprite"}
@@ -143,6 +143,7 @@ def make_anim(
     content=None,
     anim_hashes=None,
     frame_hash=None,
+    window_hashes=None,
 ):
     return Anim(
         name=name,
@@ -153,6 +154,7 @@ def make_anim(
         file_is_fresh=True,
         anim_hashes=anim_hashes,
         frame_hash=frame_hash,
+        window_hashes=window_hashes,
     )  # todo replace none with fake
 
 
@@ -243,3 +245,41 @@ def test_anim_with_different_previous_hash_is_fresh():
 def test_anim_with_matching_previous_hash_is_not_fresh():
     anim = make_anim(name="name", anim_hashes={"name": MY_HASH}, frame_hash=MY_HASH)
     assert not anim.is_fresh
+
+
+def test_anim_with_no_previous_window_hash_has_fresh_windows():
+    anim = make_anim(windows=[Window("window", 1, 2)], window_hashes={})
+    assert anim.windows_are_fresh
+
+
+def test_anim_with_saved_window_hash_does_not_have_fresh_windows():
+    window_hashes = {}
+    make_anim(
+        windows=[Window("window", 1, 2)], window_hashes=window_hashes
+    ).save_window_hash()
+
+    anim = make_anim(
+        windows=[Window("window", 1, 2)],
+        window_hashes=window_hashes,
+        frame_hash=MY_HASH,
+    )
+
+    assert not anim.windows_are_fresh
+    assert anim.is_fresh
+
+
+def test_anim_with_moved_window_has_fresh_windows():
+    window_hashes = {}
+    make_anim(
+        windows=[Window("window", 1, 2)], window_hashes=window_hashes
+    ).save_window_hash()
+
+    anim = make_anim(
+        windows=[Window("window", 2, 3)],
+        window_hashes=window_hashes,
+        anim_hashes={"name": MY_HASH},
+        frame_hash=MY_HASH,
+    )
+
+    assert anim.windows_are_fresh
+    assert not anim.is_fresh
@@ -38,6 +38,7 @@ async def assert_aseprite_saves_right_anims(
     assistant_config: dict = None,
     has_small_sprites: bool = False,
     hurtboxes_enabled: bool = False,
+    batch_export: bool = False,
 ):
     if expected_missing_file_names is None:
         expected_missing_file_names = []
@@ -66,6 +67,7 @@ async def assert_aseprite_saves_right_anims(
             config_params=AsepriteConfigParams(
                 has_small_sprites=has_small_sprites,
                 hurtboxes_enabled=hurtboxes_enabled,
+                batch_export=batch_export,
             ),
         )
 
@@ -448,3 +450,47 @@ async def test_aseprite_export__with_opts(
         expected_missing_file_names=expected_missing_file_names,
         hurtboxes_enabled=True,
     )
+
+
+@pytest.mark.parametrize(
+    "aseprite_file_name, "
+    "save_file_names, "
+    "expected_file_names, "
+    "expected_missing_file_names",
+    [
+        pytest.param(
+            "1frame_2frame",
+            ["1frame_strip1", "2frame_strip2"],
+            ["1frame", "2frame"],
+            [],
+        ),
+        pytest.param(
+            "opt_hat",
+            ["opt_hat_strip1", "opt_hat_hat_strip1"],
+            ["opt_hat", "opt_hat_hat"],
+            [],
+        ),
+        pytest.param(
+            "1blah_1ftilt_with_mask",
+            ["ftilt_hurt_strip1"],
+            ["ftilt_hurt_with_mask"],
+            ["blah_hurt_strip1"],
+        ),
+    ],
+)
+@pytest.mark.aseprite
+@pytest.mark.asyncio
+async def test_aseprite_export__batched(
+    aseprite_file_name,
+    save_file_names,
+    expected_file_names,
+    expected_missing_file_names,
+):
+    await assert_aseprite_saves_right_anims(
+        aseprite_file_name=aseprite_file_name,
+        save_file_names=save_file_names,
+        expected_file_names=expected_file_names,
+        expected_missing_file_names=expected_missing_file_names,
+        hurtboxes_enabled=True,
+        batch_export=True,
+    )
@@ -0,0 +1,497 @@
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading import (
+    RawAsepriteFile,
+    MappedAsepriteFile,
+    CelChunk,
+    build_frame_offsets,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.pixels import (
+    decode_pixels,
+    blend,
+)
+from rivals_workshop_assistant.aseprite_handling._aseprite_loading.digests import (
+    is_digest,
+    iter_chunk_spans,
+    CEL_CHUNK_TYPE,
+    CEL_LAYER_OFFSET,
+    UINT16,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from tests.testing_helpers import make_run_context, make_time
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+TEST_ASEPRITE_PATHS = sorted(TEST_SPRITES_PATH.glob("*.aseprite"))
+
+
+def read_raw_aseprite(path: Path, **kwargs) -> RawAsepriteFile:
+    return RawAsepriteFile(path.read_bytes(), **kwargs)
+
+
+def get_layer_keys(raw_aseprite: RawAsepriteFile):
+    return [
+        (layer.name, layer.layer_type, layer.layer_child_level, layer.flags)
+        for layer in raw_aseprite.layers
+    ]
+
+
+def get_tag_keys(raw_aseprite: RawAsepriteFile):
+    return [
+        (tag.name, tag.start, tag.end, tag.color) for tag in raw_aseprite.get_tags()
+    ]
+
+
+@pytest.mark.parametrize("path", TEST_ASEPRITE_PATHS, ids=lambda path: path.stem)
+def test_metadata_only_matches_full_parse(path):
+    full = read_raw_aseprite(path)
+    metadata = read_raw_aseprite(path, metadata_only=True)
+
+    assert metadata.get_num_frames() == full.get_num_frames()
+    assert get_layer_keys(metadata) == get_layer_keys(full)
+    assert get_tag_keys(metadata) == get_tag_keys(full)
+
+
+@pytest.mark.parametrize("path", TEST_ASEPRITE_PATHS, ids=lambda path: path.stem)
+def test_metadata_only_skips_cels(path):
+    metadata = read_raw_aseprite(path, metadata_only=True)
+
+    assert not any(
+        isinstance(chunk, CelChunk)
+        for frame in metadata.frames
+        for chunk in frame.chunks
+    )
+
+
+def test_unchanged_aseprite_is_read_metadata_only():
+    path = TEST_SPRITES_PATH / "nair.aseprite"
+    dotfile = {"anim_hashes": {"nair": {"anim1": "old hash", "bair": "old hash"}}}
+    aseprite = read_aseprite(
+        run_context=make_run_context(dotfile=dotfile),
+        path=path,
+        processed_time=make_time("2999-01-01"),
+    )
+
+    anims = aseprite.anims
+
+    assert aseprite.content.file_data.metadata_only
+    assert not any(anim.is_fresh for anim in anims)
+    assert dotfile["anim_hashes"]["nair"] == {"anim1": "old hash", "bair": "old hash"}
+
+
+def test_changed_aseprite_reads_frames_to_hash_anims():
+    path = TEST_SPRITES_PATH / "nair.aseprite"
+    dotfile = {"anim_hashes": {"nair": {"anim1": "old hash", "bair": "old hash"}}}
+    aseprite = read_aseprite(
+        run_context=make_run_context(dotfile=dotfile),
+        path=path,
+        processed_time=make_time("2000-01-01"),
+    )
+
+    anims = aseprite.anims
+    for anim in anims:
+        anim.save_hash()
+
+    assert all(anim.is_fresh for anim in anims)
+    assert "old hash" not in dotfile["anim_hashes"]["nair"].values()
+
+
+# Anim hashes written to the dotfile by previous assistant versions.
+# If these change, every user's anims get re-exported on their next run.
+PREVIOUS_ANIM_HASHES = {
+    "1blah_1fair.aseprite": {"fair": "cc8301b69ce3f3945d783bc6f00b56f0"},
+    "1blah_1ftilt.aseprite": {
+        "blah": "a09c0c49ecddcec37914177004b8996f",
+        "ftilt": "e1bebd4676fbf1eabf04a931dbf01c47",
+    },
+    "1blah_1ftilt_with_mask.aseprite": {
+        "blah": "e82e2f95518085cd0a9cfb6cb882f189",
+        "ftilt": "df10c9546c524ba66444408294c16dfe",
+    },
+    "1blah_2uair_1blah.aseprite": {
+        "blah": "598cfda3e64e5ee2d5ec1633ff8ae73f",
+        "uair": "b4aa345497dbab659bf84733c8aba46a",
+        "blah2": "79c3dee20712ed446deb9128bb8d42d5",
+    },
+    "1blah_2uair_1blah_with_hurtbox_layer.aseprite": {
+        "blah": "f53ee9b81fb266e65c4611fe5b82c04c",
+        "uair": "38372858a085b3cab05ccbe11b0abaaa",
+        "blah2": "77692f2b89e8d92a01137bf7f591805e",
+    },
+    "1frame.aseprite": {"1frame": "92aca80622137f16d2fd34ff2d9ac519"},
+    "1frame_1bair.aseprite": {
+        "1frame": "9b432408e0d2ffab52fc0a4d1954a1b8",
+        "bair": "7d37d736b637495cf30202347817fcc6",
+    },
+    "1frame_1smallother.aseprite": {
+        "1frame": "c7166a3a923672bce2298bc7e23d40cc",
+        "SMALLothersprite": "7d37d736b637495cf30202347817fcc6",
+    },
+    "1frame_2frame.aseprite": {
+        "1frame": "27b59b235402a330ab8d0af1f26c647f",
+        "2frame": "e1fdef20a4b5d574a032e59b2645368f",
+    },
+    "1frame_2frame_red_tag.aseprite": {
+        "1frame_2frame_red_tag": "214a175d0357ac4f645466e90cbd2130"
+    },
+    "1frame_hurtbox_layer.aseprite": {
+        "1frame_hurtbox_layer": "a1715db71e809dfb96c527e545f4695b"
+    },
+    "1frame_hurtmask.aseprite": {"1frame_hurtmask": "fa4edfcd4eef4d6de81b0712c6b6fb08"},
+    "1frame_with_hidden_above.aseprite": {
+        "1frame_with_hidden_above": "d9e373c861fcf727f377c5c4ab7e98b7"
+    },
+    "1frame_with_hidden_below.aseprite": {
+        "1frame_with_hidden_below": "3736a17d4a1367e5072422a4dc91e853"
+    },
+    "1has_flattened.aseprite": {"1has_flattened": "197dc945be5389c117a84b6681bec33e"},
+    "2frame.aseprite": {"2frame": "e3c0d032ad99826bda7119d8dc202ea6"},
+    "2frame_with_groups.aseprite": {
+        "2frame_with_groups": "bda18b82d3578ccb3ec91fd290c49e5a"
+    },
+    "2uair_2dair_hurtmask.aseprite": {
+        "uair": "749dfc8f61962277d6b0947f10eac33f",
+        "dair": "5a1a77e816dffc19d2098ff3a5fe55a4",
+    },
+    "dair.aseprite": {"dair": "b3885d8844c685126ece52496ea25d25"},
+    "fair.aseprite": {"fair": "ddafe162e4edf0d3aa668831e024261b"},
+    "hurt_layers_fair.aseprite": {"fair": "b2bf8f8109e9c98aad5e9e3e5bc63e49"},
+    "nair.aseprite": {
+        "anim1": "0735b3f730599941104b6b4752e55394",
+        "bair": "644f24366d4336312181f8c9b320cb55",
+    },
+    "nair_multiple_colors.aseprite": {"anim1": "d8fac5345d2f1afa1b0fbe5d3384adb3"},
+    "nohurt_meta_fair.aseprite": {"fair": "e0b81e03076553df641493d71bf82d7c"},
+    "opt_hat.aseprite": {"opt_hat": "26a52d5bb390d59e316426f3712e33ea"},
+    "split_blah1.aseprite": {"split_blah1": "7cbe720c50527d1c1bdabc5b045a3f30"},
+    "split_blah1_2layers.aseprite": {
+        "split_blah1_2layers": "434ec1feef937e00e0c0826a3639e2f2"
+    },
+    "split_foobar1.aseprite": {"split_foobar1": "5800d22675dcd9bf8778d8879775ceb5"},
+    "split_foobar1_groups.aseprite": {
+        "split_foobar1_groups": "08ac9477c6ed019e9f4ffd63d463ff06"
+    },
+    "split_onlyblah_blah1.aseprite": {
+        "split_onlyblah_blah1": "1bd5c52810961793581ee38efff8fa79"
+    },
+    "with_hidden_layer.aseprite": {"bair": "92d40cfc1703fc2fb682effa1e1a47a6"},
+    "wrong_color_type.aseprite": {"fair": "5a7c79040fca8742339b60ed2b983b7f"},
+}
+
+
+@pytest.mark.parametrize(
+    "file_name, previous_hashes",
+    PREVIOUS_ANIM_HASHES.items(),
+    ids=PREVIOUS_ANIM_HASHES,
+)
+def test_anim_hashes_from_previous_versions_are_replaced(file_name, previous_hashes):
+    path = TEST_SPRITES_PATH / file_name
+    dotfile = {"anim_hashes": {path.stem: dict(previous_hashes)}}
+    aseprite = read_aseprite(
+        run_context=make_run_context(dotfile=dotfile),
+        path=path,
+        processed_time=make_time("2000-01-01"),
+    )
+
+    anims = aseprite.anims
+    for anim in anims:
+        anim.save_hash()
+
+    assert not any(anim.is_fresh for anim in anims)
+    new_hashes = dotfile["anim_hashes"][path.stem]
+    assert new_hashes.keys() == previous_hashes.keys()
+    assert all(is_digest(anim_hash) for anim_hash in new_hashes.values())
+
+
+def test_changed_anim_with_hash_from_previous_version_is_fresh():
+    path = TEST_SPRITES_PATH / "nair.aseprite"
+    previous_hashes = PREVIOUS_ANIM_HASHES["nair.aseprite"]
+    dotfile = {"anim_hashes": {"nair": {**previous_hashes, "bair": "0" * 32}}}
+    aseprite = read_aseprite(
+        run_context=make_run_context(dotfile=dotfile),
+        path=path,
+        processed_time=make_time("2000-01-01"),
+    )
+
+    freshness = {anim.name: anim.is_fresh for anim in aseprite.anims}
+
+    assert freshness == {"anim1": False, "bair": True}
+
+
+def get_cel_data(raw_aseprite: RawAsepriteFile):
+    return [
+        chunk.data
+        for frame in raw_aseprite.frames
+        for chunk in frame.chunks
+        if isinstance(chunk, CelChunk)
+    ]
+
+
+@pytest.mark.parametrize("path", TEST_ASEPRITE_PATHS, ids=lambda path: path.stem)
+def test_mapped_aseprite_matches_loaded_aseprite(path):
+    loaded = read_raw_aseprite(path)
+    with MappedAsepriteFile(path) as mapped:
+        assert get_cel_data(mapped) == get_cel_data(loaded)
+        assert get_layer_keys(mapped) == get_layer_keys(loaded)
+        assert get_tag_keys(mapped) == get_tag_keys(loaded)
+
+
+def test_mapped_aseprite_keeps_few_decompressed_cels():
+    with MappedAsepriteFile(
+        TEST_SPRITES_PATH / "nair.aseprite", pixel_cache_size=1
+    ) as mapped:
+        cel_data = get_cel_data(mapped)
+
+        assert len(cel_data) > 1
+        assert len(mapped.pixel_source._cache) == 1
+
+
+def get_frame_ranges(num_frames: int):
+    return [
+        (start, end) for start in range(num_frames) for end in range(start, num_frames)
+    ]
+
+
+@pytest.mark.parametrize("path", TEST_ASEPRITE_PATHS, ids=lambda path: path.stem)
+def test_get_frames_matches_full_parse(path):
+    full = read_raw_aseprite(path)
+    metadata = read_raw_aseprite(path, metadata_only=True)
+
+    for start, end in get_frame_ranges(full.get_num_frames()):
+        assert pickle.dumps(metadata.get_frames(start, end)) == pickle.dumps(
+            full.frames[start : end + 1]
+        )
+
+
+def test_get_frames_reads_only_requested_frames():
+    metadata = read_raw_aseprite(
+        TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite", metadata_only=True
+    )
+
+    frames = metadata.get_frames(1, 2)
+
+    assert len(frames) == 2
+    assert set(metadata._full_frames) == {1, 2}
+
+
+def test_get_frames_at_reads_only_given_frames():
+    path = TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite"
+    metadata = read_raw_aseprite(path, metadata_only=True)
+
+    frames = metadata.get_frames_at([3, 1])
+
+    assert set(metadata._full_frames) == {1, 3}
+    full = read_raw_aseprite(path)
+    assert pickle.dumps(frames) == pickle.dumps([full.frames[3], full.frames[1]])
+
+
+def test_get_frames_shares_layers_with_metadata():
+    metadata = read_raw_aseprite(
+        TEST_SPRITES_PATH / "2frame_with_groups.aseprite", metadata_only=True
+    )
+
+    frame = metadata.get_frames(0, 0)[0]
+
+    frame_layers = [chunk for chunk in frame.chunks if chunk in metadata.layers]
+    assert len(frame_layers) == len(metadata.layers)
+
+
+def test_build_frame_offsets():
+    data = (TEST_SPRITES_PATH / "nair.aseprite").read_bytes()
+    full = RawAsepriteFile(data)
+
+    offsets = build_frame_offsets(data)
+
+    assert offsets[0] == 128
+    assert [offset + frame.size for offset, frame in zip(offsets, full.frames)][
+        :-1
+    ] == offsets[1:]
+
+
+def test_out_of_date_frame_offsets_are_rebuilt():
+    data = (TEST_SPRITES_PATH / "nair.aseprite").read_bytes()
+    metadata = RawAsepriteFile(data, metadata_only=True, frame_offsets=[128, 129, 130])
+
+    frames = metadata.get_frames(0, 2)
+
+    assert pickle.dumps(frames) == pickle.dumps(RawAsepriteFile(data).frames)
+    assert metadata.frame_offsets == build_frame_offsets(data)
+
+
+@pytest.mark.parametrize("path", TEST_ASEPRITE_PATHS, ids=lambda path: path.stem)
+def test_parallel_decompression_matches_serial(path):
+    serial = read_raw_aseprite(path)
+    parallel = read_raw_aseprite(path, decompression_workers=4)
+
+    assert get_cel_data(parallel) == get_cel_data(serial)
+    assert pickle.dumps(parallel.frames) == pickle.dumps(serial.frames)
+
+
+def test_parallel_decompression_of_requested_frames():
+    path = TEST_SPRITES_PATH / "nair.aseprite"
+    with MappedAsepriteFile(
+        path, metadata_only=True, decompression_workers=4
+    ) as mapped:
+        frames = mapped.get_frames(0, 2)
+
+        cels = [chunk for frame in frames for chunk in frame.chunks]
+        assert not any(
+            isinstance(chunk, CelChunk) and chunk.has_pending_pixels for chunk in cels
+        )
+        assert pickle.dumps(frames) == pickle.dumps(read_raw_aseprite(path).frames)
+
+
+def test_anim_digest_only_depends_on_its_frames():
+    data = bytearray((TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite").read_bytes())
+    before = RawAsepriteFile(bytes(data), metadata_only=True)
+    _, cel_start, cel_end = next(
+        span
+        for span in iter_chunk_spans(data, before.frame_offsets[3])
+        if span[0] == CEL_CHUNK_TYPE
+    )
+    data[cel_end - 1] ^= 0xFF
+    after = RawAsepriteFile(bytes(data), metadata_only=True)
+
+    assert after.get_anim_digest(0, 2) == before.get_anim_digest(0, 2)
+    assert after.get_anim_digest(3, 3) != before.get_anim_digest(3, 3)
+
+
+def test_anim_digests_share_frame_digests():
+    raw = read_raw_aseprite(
+        TEST_SPRITES_PATH / "1blah_2uair_1blah.aseprite", metadata_only=True
+    )
+
+    raw.get_anim_digest(0, 1)
+    first_digests = dict(raw._frame_digests)
+    raw.get_anim_digest(1, 2)
+
+    assert raw._frame_digests[1] is first_digests[1]
+    assert set(raw._frame_digests) == {0, 1, 2}
+
+
+def test_release_frames():
+    with MappedAsepriteFile(
+        TEST_SPRITES_PATH / "nair.aseprite", metadata_only=True
+    ) as mapped:
+        before = mapped.get_frame_image(1)
+
+        mapped.release_frames()
+
+        assert mapped._full_frames == {}
+        assert not mapped.is_open
+        assert (mapped.get_frame_image(1) == before).all()
+        assert mapped.is_open
+
+
+def test_layers_digest_only_depends_on_its_layers():
+    data = bytearray((TEST_SPRITES_PATH / "opt_hat.aseprite").read_bytes())
+    before = RawAsepriteFile(bytes(data), metadata_only=True)
+    opt_layer_index = 1
+    _, cel_start, cel_end = next(
+        span
+        for span in iter_chunk_spans(data, before.frame_offsets[0])
+        if span[0] == CEL_CHUNK_TYPE
+        and UINT16.unpack_from(data, span[1] + CEL_LAYER_OFFSET)[0] == opt_layer_index
+    )
+    data[cel_end - 1] ^= 0xFF
+    after = RawAsepriteFile(bytes(data), metadata_only=True)
+
+    assert after.get_layers_digest(0, 0, [0]) == before.get_layers_digest(0, 0, [0])
+    assert after.get_layers_digest(0, 0, [1]) != before.get_layers_digest(0, 0, [1])
+    assert after.get_layers_digest(0, 0, [0, 1]) != before.get_layers_digest(
+        0, 0, [0, 1]
+    )
+
+
+def test_layers_digest_skips_groups():
+    raw = read_raw_aseprite(
+        TEST_SPRITES_PATH / "2frame_with_groups.aseprite", metadata_only=True
+    )
+
+    assert set(raw.get_frame_layer_digests(0)) == {0}
+    assert raw.get_layers_digest(0, 1, [0]) != raw.get_layers_digest(0, 1, [])
+
+
+def get_strip_image(raw_aseprite: RawAsepriteFile, layer_names=None, scale=2):
+    layers = None
+    if layer_names is not None:
+        layers = [layer for layer in raw_aseprite.layers if layer.name in layer_names]
+    frame_images = [
+        raw_aseprite.get_frame_image(index, layers)
+        for index in range(raw_aseprite.get_num_frames())
+    ]
+    strip = np.concatenate(frame_images, axis=1)
+    return strip.repeat(scale, axis=0).repeat(scale, axis=1)
+
+
+@pytest.mark.parametrize(
+    "file_name, layer_names, expected_file_name",
+    [
+        pytest.param("1frame", None, "1frame"),
+        pytest.param("2frame", None, "2frame"),
+        pytest.param("2frame_with_groups", None, "2frame"),
+        pytest.param("1frame_2frame", None, "1frame_2frame"),
+        pytest.param("1frame_with_hidden_above", None, "1frame"),
+        pytest.param("1frame_with_hidden_below", None, "1frame"),
+        pytest.param("1has_flattened", None, "1has_flattened"),
+        pytest.param("opt_hat", ["Layer 1"], "opt_hat"),
+        pytest.param("opt_hat", None, "opt_hat_hat"),
+    ],
+)
+def test_frame_images_match_aseprite_export(file_name, layer_names, expected_file_name):
+    raw_aseprite = read_raw_aseprite(
+        TEST_SPRITES_PATH / f"{file_name}.aseprite", metadata_only=True
+    )
+
+    strip = get_strip_image(raw_aseprite, layer_names)
+
+    with Image.open(TEST_SPRITES_PATH / f"{expected_file_name}.png") as expected:
+        assert np.array_equal(strip, np.asarray(expected.convert("RGBA")))
+
+
+def test_decode_grayscale_pixels():
+    image = decode_pixels(bytes([10, 255, 20, 0]), width=2, height=1, color_depth=16)
+
+    assert image.tolist() == [[[10, 10, 10, 255], [20, 20, 20, 0]]]
+
+
+def test_decode_indexed_pixels_with_transparent_index():
+    palette = np.zeros((256, 4), dtype=np.uint8)
+    palette[1] = (1, 2, 3, 255)
+    palette[2] = (4, 5, 6, 255)
+
+    image = decode_pixels(
+        bytes([1, 2]),
+        width=1,
+        height=2,
+        color_depth=8,
+        palette=palette,
+        transparent_index=2,
+    )
+
+    assert image.tolist() == [[[1, 2, 3, 255]], [[4, 5, 6, 0]]]
+
+
+@pytest.mark.parametrize(
+    "blend_mode, opacity, expected",
+    [
+        pytest.param(0, 1.0, [0.25, 0.5, 1.0, 1.0], id="normal"),
+        pytest.param(0, 0.5, [0.375, 0.5, 0.75, 1.0], id="normal half opacity"),
+        pytest.param(1, 1.0, [0.125, 0.25, 0.5, 1.0], id="multiply"),
+        pytest.param(4, 1.0, [0.25, 0.5, 0.5, 1.0], id="darken"),
+    ],
+)
+def test_blend(blend_mode, opacity, expected):
+    backdrop = np.array([[[0.5, 0.5, 0.5, 1.0]]], dtype=np.float32)
+    source = np.array([[[0.25, 0.5, 1.0, 1.0]]], dtype=np.float32)
+
+    blend(backdrop, source, opacity=opacity, blend_mode=blend_mode)
+
+    assert backdrop[0, 0].tolist() == pytest.approx(expected)
@@ -0,0 +1,227 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant.aseprite_handling.aseprite_updating import (
+    get_aseprite_version,
+)
+from rivals_workshop_assistant.aseprite_handling.export_scheduler import (
+    ExportScheduler,
+)
+from rivals_workshop_assistant.assistant_config_mod import (
+    get_aseprite_export_processes,
+    get_aseprite_export_timeout,
+    ASEPRITE_EXPORT_TIMEOUT_DEFAULT,
+)
+from rivals_workshop_assistant.dotfile_mod import ASEPRITE_VERSION_FIELD
+from loguru import logger
+
+logger.remove()
+
+
+def make_export(name: str, log: list, seconds: float = 0):
+    async def run():
+        log.append(name)
+        await asyncio.sleep(seconds)
+
+    return run
+
+
+@pytest.mark.parametrize(
+    "durations, expected_order",
+    [
+        pytest.param({}, ["a", "b", "c"], id="no_durations"),
+        pytest.param({"a": 1, "b": 3, "c": 2}, ["b", "c", "a"], id="longest_first"),
+        pytest.param({"a": 1, "c": 2}, ["b", "c", "a"], id="unknown_first"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_export_scheduler__order(durations, expected_order):
+    log = []
+    scheduler = ExportScheduler(max_processes=1, durations=durations)
+    for name in ["a", "b", "c"]:
+        scheduler.add(name, make_export(name, log))
+
+    await scheduler.run()
+
+    assert log == expected_order
+
+
+@pytest.mark.parametrize("max_processes", [1, 2, 5])
+@pytest.mark.asyncio
+async def test_export_scheduler__max_processes(max_processes):
+    running = 0
+    most_running = 0
+
+    async def run():
+        nonlocal running, most_running
+        running += 1
+        most_running = max(most_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    scheduler = ExportScheduler(max_processes=max_processes)
+    for index in range(4):
+        scheduler.add(str(index), run)
+
+    await scheduler.run()
+
+    assert most_running == min(max_processes, 4)
+
+
+@pytest.mark.asyncio
+async def test_export_scheduler__records_durations():
+    durations = {"old": 5}
+    scheduler = ExportScheduler(max_processes=2, durations=durations)
+    scheduler.add("a", make_export("a", [], seconds=0.02))
+    scheduler.add("b", make_export("b", []))
+
+    await scheduler.run()
+
+    assert set(durations) == {"old", "a", "b"}
+    assert durations["a"] >= 0.02
+    assert durations["a"] > durations["b"]
+
+
+@pytest.mark.asyncio
+async def test_export_scheduler__failed_export_doesnt_stop_others():
+    log = []
+    errors = []
+
+    async def fail():
+        log.append("broken")
+        raise RuntimeError("Aseprite crashed")
+
+    handler_id = logger.add(errors.append, level="ERROR")
+    try:
+        scheduler = ExportScheduler(max_processes=1)
+        scheduler.add("a", make_export("a", log))
+        scheduler.add("broken", fail)
+        scheduler.add("c", make_export("c", log))
+        await scheduler.run()
+    finally:
+        logger.remove(handler_id)
+
+    assert log == ["a", "broken", "c"]
+    assert len(errors) == 1 and "broken" in errors[0]
+    assert "broken" not in scheduler.durations
+    assert scheduler.failed == {"broken"}
+
+
+@pytest.mark.asyncio
+async def test_export_scheduler__records_failed_exports():
+    async def fail():
+        return False
+
+    async def succeed():
+        return True
+
+    scheduler = ExportScheduler(max_processes=2)
+    scheduler.add("a", make_export("a", []))
+    scheduler.add("failed", fail)
+    scheduler.add("succeeded", succeed)
+
+    await scheduler.run()
+
+    assert scheduler.failed == {"failed"}
+
+
+@pytest.mark.asyncio
+async def test_export_scheduler__runs_exports_added_after_start():
+    log = []
+    scheduler = ExportScheduler(max_processes=2)
+    scheduler.start()
+
+    scheduler.add("a", make_export("a", log))
+    await asyncio.sleep(0)
+    started_before_more_added = list(log)
+    scheduler.add("b", make_export("b", log))
+    await scheduler.finish()
+
+    assert started_before_more_added == ["a"]
+    assert log == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_export_scheduler__wait_for_room():
+    log = []
+    scheduler = ExportScheduler(max_processes=1, max_pending=2)
+    scheduler.start()
+    pending_counts = []
+
+    for name in ["a", "b", "c", "d", "e"]:
+        await scheduler.wait_for_room()
+        pending_counts.append(len(scheduler.get_order()))
+        scheduler.add(name, make_export(name, log, seconds=0.01))
+    await scheduler.finish()
+
+    assert max(pending_counts) < 2
+    assert log == ["a", "b", "c", "d", "e"]
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        pytest.param({}, None, id="default"),
+        pytest.param({"aseprite_export_processes": None}, None, id="empty"),
+        pytest.param({"aseprite_export_processes": 3}, 3, id="set"),
+        pytest.param({"aseprite_export_processes": 0}, None, id="invalid"),
+    ],
+)
+def test_get_aseprite_export_processes(config, expected):
+    result = get_aseprite_export_processes(config)
+
+    assert result >= 1
+    if expected is not None:
+        assert result == expected
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        pytest.param({}, ASEPRITE_EXPORT_TIMEOUT_DEFAULT, id="default"),
+        pytest.param({"aseprite_export_timeout": 2.5}, 2.5, id="set"),
+        pytest.param(
+            {"aseprite_export_timeout": -1}, ASEPRITE_EXPORT_TIMEOUT_DEFAULT, id="bad"
+        ),
+    ],
+)
+def test_get_aseprite_export_timeout(config, expected):
+    assert get_aseprite_export_timeout(config) == expected
+
+
+@pytest.mark.asyncio
+async def test_get_aseprite_version__cached():
+    program = Path(sys.executable)
+    dotfile = {
+        ASEPRITE_VERSION_FIELD: {
+            "path": program.as_posix(),
+            "mtime_ns": program.stat().st_mtime_ns,
+            "version": "Aseprite 1.3",
+        }
+    }
+
+    assert await get_aseprite_version(program, dotfile) == "Aseprite 1.3"
+
+
+@pytest.mark.asyncio
+async def test_get_aseprite_version__executable_changed():
+    program = Path(sys.executable)
+    dotfile = {
+        ASEPRITE_VERSION_FIELD: {
+            "path": program.as_posix(),
+            "mtime_ns": 0,
+            "version": "Aseprite 1.2",
+        }
+    }
+
+    version = await get_aseprite_version(program, dotfile)
+
+    assert version.startswith("Python")
+    assert dotfile[ASEPRITE_VERSION_FIELD] == {
+        "path": program.as_posix(),
+        "mtime_ns": program.stat().st_mtime_ns,
+        "version": version,
+    }
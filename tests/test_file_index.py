@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.file_index import (
+    build_file_index,
+    FileKind,
+    get_folder_kind,
+)
+from rivals_workshop_assistant.script_handling.script_mod import read_scripts
+from tests.testing_helpers import make_run_context
+from loguru import logger
+
+logger.remove()
+
+
+def make_files(root_dir: Path, file_contents: dict):
+    for path, content in file_contents.items():
+        path = root_dir / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+
+
+@pytest.mark.parametrize(
+    "file_contents, kind, expected",
+    [
+        pytest.param(
+            {"scripts/a.gml": "a", "scripts/attacks/b.gml": "bb"},
+            FileKind.SCRIPT,
+            [("scripts/a.gml", 1), ("scripts/attacks/b.gml", 2)],
+            id="scripts_in_subfolders",
+        ),
+        pytest.param(
+            {"scripts/a.gml": "a", "scripts/notes.txt": "", "scripts/b.GML.bak": ""},
+            FileKind.SCRIPT,
+            [("scripts/a.gml", 1)],
+            id="other_suffixes_skipped",
+        ),
+        pytest.param(
+            {"anims/a.ase": "", "anims/b.aseprite": "", "anims/c.png": ""},
+            FileKind.ASEPRITE,
+            [("anims/a.ase", 0), ("anims/b.aseprite", 0)],
+            id="aseprite_suffixes",
+        ),
+        pytest.param(
+            {"assistant/.inject/a.gml": "", "assistant/user_inject/b.gml": ""},
+            FileKind.LIBRARY_INJECT,
+            [("assistant/.inject/a.gml", 0)],
+            id="library_inject_separate_from_user_inject",
+        ),
+        pytest.param(
+            {"scripts/a.gml": ""},
+            FileKind.SPRITE,
+            [],
+            id="missing_folder",
+        ),
+    ],
+)
+def test_build_file_index(tmp_path, file_contents, kind, expected):
+    make_files(tmp_path, file_contents)
+
+    file_index = build_file_index(tmp_path)
+
+    assert (
+        sorted((file.path.as_posix(), file.size) for file in file_index.get_files(kind))
+        == expected
+    )
+
+
+def test_build_file_index__modified_time(tmp_path):
+    make_files(tmp_path, {"scripts/a.gml": ""})
+
+    (file,) = build_file_index(tmp_path).get_files(FileKind.SCRIPT)
+
+    assert file.mtime_ns == (tmp_path / "scripts/a.gml").stat().st_mtime_ns
+
+
+@pytest.mark.parametrize(
+    "folder, expected",
+    [
+        pytest.param(paths.SCRIPTS_FOLDER, FileKind.SCRIPT, id="scripts"),
+        pytest.param(paths.USER_INJECT_FOLDER, FileKind.USER_INJECT, id="user_inject"),
+        pytest.param(paths.INJECT_FOLDER, FileKind.LIBRARY_INJECT, id="inject"),
+    ],
+)
+def test_get_folder_kind(folder, expected):
+    assert get_folder_kind(folder) == expected
+
+
+def test_read_scripts__same_with_file_index(tmp_path):
+    make_files(
+        tmp_path,
+        {"scripts/a.gml": "a", "scripts/attacks/b.gml": "b", "scripts/c/d/e.gml": "e"},
+    )
+
+    without_index = read_scripts(make_run_context(root_dir=tmp_path))
+    with_index = read_scripts(
+        make_run_context(root_dir=tmp_path, file_index=build_file_index(tmp_path))
+    )
+
+    assert with_index == without_index
@@ -0,0 +1,73 @@
+import pytest
+
+import rivals_workshop_assistant.script_handling.gml_lexer as src
+from rivals_workshop_assistant.asset_handling.asset_types import Sprite
+from loguru import logger
+
+logger.remove()
+
+
+@pytest.mark.parametrize(
+    "gml, expected",
+    [
+        pytest.param("a = b(c);", {"a", "b", "c"}, id="code"),
+        pytest.param("a = 1; // b(c)", {"a"}, id="line_comment"),
+        pytest.param("a /* b\nc */ = 1", {"a"}, id="block_comment"),
+        pytest.param("a = \"b(c)\" + 'd'", {"a"}, id="strings"),
+        pytest.param("a = 2f + $FF;", {"a"}, id="numbers"),
+        pytest.param("#define a\nb()", {"b"}, id="define_name"),
+        pytest.param("#region a b\nc", {"c"}, id="region_label"),
+    ],
+)
+def test_used_names(gml, expected):
+    assert src.get_gml_tokens(gml).used_names == expected
+
+
+@pytest.mark.parametrize(
+    "gml, expected",
+    [
+        pytest.param("a(); b = c;", {"a"}, id="call"),
+        pytest.param("a (); b", set(), id="space_before_paren"),
+        pytest.param("#define a()\nb()", {"b"}, id="define_not_call"),
+        pytest.param("// a()", set(), id="comment"),
+    ],
+)
+def test_called_names(gml, expected):
+    assert src.get_gml_tokens(gml).called_names == expected
+
+
+def test_declared_names():
+    gml = "#define a\n#define b()\n#macro C 1\n// #define d\n#region e"
+    assert src.get_gml_tokens(gml).declared_names == {
+        src.DEFINE_DIRECTIVE: {"a", "b"},
+        src.MACRO_DIRECTIVE: {"C"},
+    }
+
+
+@pytest.mark.parametrize(
+    "gml, expected",
+    [
+        pytest.param("a = 1;\nb", ["a = 1;", "b"], id="code"),
+        pytest.param("a; // b\nc", ["a;     ", "c"], id="line_comment"),
+        pytest.param("a /* b\nc */ d", ["a     ", "     d"], id="block_comment"),
+        pytest.param('a = "b//c";', ['a = "    ";'], id="string"),
+        pytest.param("a = 'b\nc'", ["a = ' ", " '"], id="multiline_string"),
+        pytest.param('a = "b', ['a = " '], id="unclosed_string"),
+    ],
+)
+def test_code_lines(gml, expected):
+    assert src.get_gml_tokens(gml).code_lines == expected
+
+
+@pytest.mark.parametrize(
+    "gml, expected",
+    [
+        pytest.param("// sprite_get('a')", set(), id="comment"),
+        pytest.param("x = \"sprite_get('a')\"", set(), id="string"),
+        pytest.param("my_sprite_get('a')", set(), id="other_function"),
+        pytest.param("sprite_get('a' + b)", set(), id="not_only_argument"),
+        pytest.param("sprite_get(\n'a'\n)", {Sprite("a")}, id="newlines"),
+    ],
+)
+def test_sprite_get_from_text(gml, expected):
+    assert Sprite.get_from_text(gml) == expected
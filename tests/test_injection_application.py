@@ -329,3 +329,39 @@ def test_get_anim_data_gmls_needed_in_gml():
 {application.INJECTION_END_HEADER}""",
         )
     ]
+
+
+@pytest.mark.parametrize(
+    "previous_window, expect_injection",
+    [
+        pytest.param(Window("window", 2, 3), False, id="windows_unchanged"),
+        pytest.param(Window("window", 1, 3), True, id="window_moved"),
+    ],
+)
+def test_apply_injection__anim_windows_changed(previous_window, expect_injection):
+    path = Path("scripts/attacks/dattack.gml")
+    window_hashes = {}
+    make_anim(
+        name="dattack", windows=[previous_window], window_hashes=window_hashes
+    ).save_window_hash()
+    # The pixels changed, which doesn't matter to injection.
+    anim = make_anim(
+        name="dattack",
+        windows=[Window("window", 2, 3)],
+        window_hashes=window_hashes,
+        frame_hash="new pixels",
+    )
+    script = make_script(
+        path=path,
+        original_content="content",
+        processed_time=make_time(TEST_LATER_DATETIME_STRING),
+    )
+
+    application.apply_injection(scripts=[script], injection_library=[], anims=[anim])
+
+    assert (application.INJECTION_START_HEADER in script.working_content) == (
+        expect_injection
+    )
+    assert not make_anim(
+        name="dattack", windows=[Window("window", 2, 3)], window_hashes=window_hashes
+    ).windows_are_fresh
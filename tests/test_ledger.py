@@ -0,0 +1,241 @@
+import datetime
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant import dotfile_mod, ledger_mod
+from rivals_workshop_assistant.aseprite_handling.aseprite_updating import update_anims
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprites
+from rivals_workshop_assistant.file_index import build_file_index
+from rivals_workshop_assistant.ledger_mod import FileState, Stage
+from rivals_workshop_assistant.modes import Mode
+from rivals_workshop_assistant.script_handling.script_mod import read_scripts
+from rivals_workshop_assistant.script_handling.script_updating import update_scripts
+from tests.testing_helpers import make_run_context, make_time
+from loguru import logger
+
+logger.remove()
+
+SCRIPT_PATH = Path("scripts/a.gml")
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def write_script(root_dir: Path, content: str = "a"):
+    path = root_dir / SCRIPT_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+
+def read_script(root_dir: Path, ledger: dict, dotfile: dict = None):
+    (script,) = read_scripts(
+        make_run_context(root_dir=root_dir, ledger=ledger, dotfile=dotfile)
+    )
+    return script
+
+
+def test_read_scripts__new_file_fresh(tmp_path):
+    write_script(tmp_path)
+
+    assert read_script(tmp_path, ledger={}).is_fresh
+
+
+def test_read_scripts__processed_file_not_fresh(tmp_path):
+    write_script(tmp_path)
+    ledger = {}
+    ledger_mod.record_processed(
+        ledger, [read_script(tmp_path, ledger)], stage=Stage.SCRIPTS
+    )
+
+    assert not read_script(tmp_path, ledger).is_fresh
+
+
+def test_read_scripts__touched_but_unchanged_not_fresh(tmp_path):
+    path = write_script(tmp_path)
+    ledger = {}
+    ledger_mod.record_processed(
+        ledger, [read_script(tmp_path, ledger)], stage=Stage.SCRIPTS
+    )
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert not read_script(tmp_path, ledger).is_fresh
+    assert ledger[SCRIPT_PATH.as_posix()][ledger_mod.MTIME_FIELD] == (
+        path.stat().st_mtime_ns
+    )
+
+
+def test_read_scripts__changed_file_fresh(tmp_path):
+    write_script(tmp_path)
+    ledger = {}
+    ledger_mod.record_processed(
+        ledger, [read_script(tmp_path, ledger)], stage=Stage.SCRIPTS
+    )
+    write_script(tmp_path, "changed")
+
+    assert read_script(tmp_path, ledger).is_fresh
+
+
+def test_read_scripts__unrecorded_file_goes_by_processed_time(tmp_path):
+    write_script(tmp_path)
+    dotfile = {dotfile_mod.SCRIPT_PROCESSED_TIME_FIELD: make_time("2999-01-01")}
+
+    assert not read_script(tmp_path, ledger={}, dotfile=dotfile).is_fresh
+
+
+def test_save__processed_content_recorded(tmp_path):
+    write_script(tmp_path)
+    ledger = {}
+    script = read_script(tmp_path, ledger)
+    script.working_content = "injected"
+    script.save(tmp_path)
+    ledger_mod.record_processed(ledger, [script], stage=Stage.SCRIPTS)
+
+    assert not read_script(tmp_path, ledger).is_fresh
+
+
+STATE = FileState(key="a", size=1, mtime_ns=1, digest="new")
+
+
+@pytest.mark.parametrize(
+    "stage_digests, processed_times, expected",
+    [
+        pytest.param(
+            {"scripts": "new", "anims": "old"},
+            {Stage.SCRIPTS: None},
+            False,
+            id="other_stage_behind",
+        ),
+        pytest.param(
+            {"scripts": "new", "anims": "old"},
+            {Stage.SCRIPTS: None, Stage.ANIMS: None},
+            True,
+            id="any_stage_behind",
+        ),
+        pytest.param(
+            {"scripts": "new"},
+            {Stage.ANIMS: make_time("2000-01-01")},
+            True,
+            id="unrecorded_stage_ran_before_change",
+        ),
+        pytest.param(
+            {"scripts": "new"},
+            {Stage.ANIMS: make_time("2999-01-01")},
+            False,
+            id="unrecorded_stage_ran_after_change",
+        ),
+    ],
+)
+def test_get_is_fresh(stage_digests, processed_times, expected):
+    ledger = {"a": {ledger_mod.STAGES_FIELD: stage_digests}}
+
+    assert (
+        ledger_mod.get_is_fresh(
+            ledger,
+            STATE,
+            modified_time=make_time("2500-01-01"),
+            processed_times=processed_times,
+        )
+        == expected
+    )
+
+
+@pytest.mark.parametrize(
+    "mode, expected",
+    [
+        pytest.param(Mode.ALL, [Stage.SCRIPTS, Stage.ANIMS], id="all"),
+        pytest.param(Mode.SCRIPTS, [Stage.SCRIPTS], id="scripts"),
+        pytest.param(Mode.ANIMS, [Stage.ANIMS], id="anims"),
+    ],
+)
+def test_get_stages(mode, expected):
+    assert ledger_mod.get_stages(mode) == expected
+
+
+def test_ledger__save_and_read(tmp_path):
+    ledger = {"scripts/a.gml": {ledger_mod.DIGEST_FIELD: "a"}}
+
+    ledger_mod.save(make_run_context(root_dir=tmp_path, ledger=ledger))
+
+    assert ledger_mod.read(tmp_path) == ledger
+
+
+async def run_stages(
+    root_dir: Path,
+    mode: Mode,
+    dotfile: dict,
+    ledger: dict,
+    assistant_config: dict = None,
+):
+    """Run the stages of the mode the way main does."""
+    if assistant_config is None:
+        assistant_config = {"anim_export_backend": "native"}
+    run_context = make_run_context(
+        root_dir=root_dir,
+        dotfile=dotfile,
+        ledger=ledger,
+        assistant_config=assistant_config,
+        file_index=build_file_index(root_dir),
+    )
+    scripts = read_scripts(run_context)
+    aseprites = read_aseprites(run_context, stages=ledger_mod.get_stages(mode))
+    if mode in (Mode.ALL, Mode.SCRIPTS):
+        update_scripts(run_context, scripts=scripts, aseprites=aseprites)
+        ledger_mod.record_processed(ledger, scripts + aseprites, Stage.SCRIPTS)
+    if mode in (Mode.ALL, Mode.ANIMS):
+        exported = await update_anims(run_context, scripts=scripts, aseprites=aseprites)
+        if exported is not None:
+            ledger_mod.record_processed(ledger, exported, Stage.ANIMS)
+            failed = [aseprite for aseprite in aseprites if aseprite not in exported]
+            ledger_mod.record_unprocessed(ledger, failed, Stage.ANIMS)
+    dotfile_mod.update_dotfile_after_saving(
+        dotfile=dotfile, now=datetime.datetime.now(), mode=mode
+    )
+
+
+@pytest.mark.asyncio
+async def test_anims_edited_during_scripts_run_are_exported_by_anims_run(tmp_path):
+    write_script(tmp_path, "a")
+    aseprite_path = tmp_path / "anims" / "fair.aseprite"
+    aseprite_path.parent.mkdir(parents=True)
+    shutil.copy(TEST_SPRITES_PATH / "1frame.aseprite", aseprite_path)
+    dotfile = {}
+    ledger = {}
+    await run_stages(tmp_path, Mode.ALL, dotfile, ledger)
+    assert (tmp_path / "sprites" / "fair_strip1.png").exists()
+
+    # Edited to have two frames, so it exports to another spritesheet.
+    shutil.copy(TEST_SPRITES_PATH / "2frame.aseprite", aseprite_path)
+    await run_stages(tmp_path, Mode.SCRIPTS, dotfile, ledger)
+    assert not (tmp_path / "sprites" / "fair_strip2.png").exists()
+    await run_stages(tmp_path, Mode.ANIMS, dotfile, ledger)
+
+    assert (tmp_path / "sprites" / "fair_strip2.png").exists()
+
+
+@pytest.mark.asyncio
+async def test_anims_with_failed_exports_are_exported_by_next_run(tmp_path):
+    aseprite_path = tmp_path / "anims" / "fair.aseprite"
+    aseprite_path.parent.mkdir(parents=True)
+    shutil.copy(TEST_SPRITES_PATH / "1frame.aseprite", aseprite_path)
+    dotfile = {}
+    ledger = {}
+    # Python rejects Aseprite's arguments, so every export fails.
+    await run_stages(
+        tmp_path,
+        Mode.ANIMS,
+        dotfile,
+        ledger,
+        assistant_config={"aseprite_path": sys.executable},
+    )
+    assert (
+        ledger["anims/fair.aseprite"][ledger_mod.STAGES_FIELD][Stage.ANIMS.value]
+        == ledger_mod.UNPROCESSED_DIGEST
+    )
+
+    await run_stages(tmp_path, Mode.ANIMS, dotfile, ledger)
+
+    assert (tmp_path / "sprites" / "fair_strip1.png").exists()
@@ -0,0 +1,146 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+    EXPORT_ASEPRITE_LUA_PATH,
+    CREATE_HURTBOX_LUA_PATH,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.lua_exports import (
+    LuaExportJob,
+    make_manifest,
+    read_results,
+)
+from tests.testing_helpers import make_run_context
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def make_path_params(tmp_path: Path) -> AsepritePathParams:
+    return AsepritePathParams(
+        exe_dir=tmp_path,
+        root_dir=tmp_path,
+        aseprite_program_path=None,
+    )
+
+
+def get_lua_export_jobs(tmp_path: Path, aseprite_file_name: str):
+    aseprite = read_aseprite(
+        run_context=make_run_context(),
+        path=TEST_SPRITES_PATH / f"{aseprite_file_name}.aseprite",
+    )
+    return [
+        job
+        for anim in aseprite.anims
+        for job in anim.get_lua_export_jobs(
+            make_path_params(tmp_path),
+            AsepriteConfigParams(hurtboxes_enabled=True),
+            aseprite.path,
+        )
+    ]
+
+
+@pytest.mark.parametrize(
+    "aseprite_file_name, expected_jobs",
+    [
+        pytest.param(
+            "opt_hat",
+            [
+                (EXPORT_ASEPRITE_LUA_PATH, "opt_hat_strip1", "1", "1", "1"),
+                (EXPORT_ASEPRITE_LUA_PATH, "opt_hat_hat_strip1", "1", "1", "1,2"),
+            ],
+        ),
+        pytest.param(
+            "1blah_1ftilt_with_mask",
+            [
+                (EXPORT_ASEPRITE_LUA_PATH, "blah_strip2", "1", "2", "1"),
+                (EXPORT_ASEPRITE_LUA_PATH, "ftilt_strip1", "2", "2", "1"),
+                (CREATE_HURTBOX_LUA_PATH, "ftilt_hurt_strip1", "2", "2", "1"),
+            ],
+        ),
+    ],
+)
+def test_get_lua_export_jobs(tmp_path, aseprite_file_name, expected_jobs):
+    jobs = get_lua_export_jobs(tmp_path, aseprite_file_name)
+
+    assert [
+        (
+            job.script_name,
+            Path(job.dest).stem,
+            job.params["startFrame"],
+            job.params["endFrame"],
+            job.params["targetLayers"],
+        )
+        for job in jobs
+    ] == expected_jobs
+    for job in jobs:
+        assert Path(job.dest).parent == tmp_path / paths.SPRITES_FOLDER
+        assert all(isinstance(value, str) for value in job.params.values())
+
+
+def test_get_lua_export_jobs__deletes_old_strips(tmp_path):
+    old_strip = tmp_path / paths.SPRITES_FOLDER / "opt_hat_strip5.png"
+    old_strip.parent.mkdir(parents=True)
+    old_strip.touch()
+
+    get_lua_export_jobs(tmp_path, "opt_hat")
+
+    assert not old_strip.exists()
+
+
+def test_make_manifest(tmp_path):
+    path_params = make_path_params(tmp_path)
+    jobs = [
+        LuaExportJob(script_name=EXPORT_ASEPRITE_LUA_PATH, params={"dest": "a.png"}),
+        LuaExportJob(script_name=CREATE_HURTBOX_LUA_PATH, params={"dest": "b.png"}),
+        LuaExportJob(script_name=EXPORT_ASEPRITE_LUA_PATH, params={"dest": "c.png"}),
+    ]
+
+    manifest = make_manifest(
+        path_params=path_params,
+        aseprite_file_path=TEST_SPRITES_PATH / "opt_hat.aseprite",
+        jobs=jobs,
+        results_path=tmp_path / "results.json",
+    )
+
+    assert Path(manifest["filename"]).is_absolute()
+    assert manifest["results"] == str(tmp_path / "results.json")
+    assert manifest["jobs"] == [
+        {"script": job.script_name, "params": job.params} for job in jobs
+    ]
+    assert set(manifest["scripts"]) == {
+        EXPORT_ASEPRITE_LUA_PATH,
+        CREATE_HURTBOX_LUA_PATH,
+    }
+    for script_path in manifest["scripts"].values():
+        assert Path(script_path).exists()
+    json.dumps(manifest)
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        pytest.param(None, None, id="missing"),
+        pytest.param("not json", None, id="unreadable"),
+        pytest.param("{}", [], id="no_jobs"),
+        pytest.param(
+            '[{"dest": "a.png", "ok": true}]',
+            [{"dest": "a.png", "ok": True}],
+            id="results",
+        ),
+    ],
+)
+def test_read_results(tmp_path, content, expected):
+    results_path = tmp_path / "results.json"
+    if content is not None:
+        results_path.write_text(content)
+
+    assert read_results(results_path) == expected
@@ -0,0 +1,260 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.export_scheduler import (
+    ExportScheduler,
+)
+from rivals_workshop_assistant.assistant_config_mod import ExportBackend
+from tests.testing_helpers import make_run_context
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def load_rgba(path: Path) -> np.ndarray:
+    """Load the image as RGBA, with the color of clear pixels cleared too."""
+    with Image.open(path) as image:
+        rgba = np.array(image.convert("RGBA"))
+    rgba[rgba[..., 3] == 0] = 0
+    return rgba
+
+
+async def assert_native_export_saves_right_anims(
+    tmp_path: Path,
+    aseprite_file_name: str,
+    save_file_names: list[str],
+    expected_file_names: list[str],
+    expected_missing_file_names: list[str] = (),
+    has_small_sprites: bool = False,
+    hurtboxes_enabled: bool = False,
+):
+    aseprite = read_aseprite(
+        run_context=make_run_context(),
+        path=TEST_SPRITES_PATH / f"{aseprite_file_name}.aseprite",
+    )
+
+    await aseprite.save(
+        path_params=AsepritePathParams(
+            exe_dir=tmp_path / "exe_dir",
+            root_dir=tmp_path,
+            aseprite_program_path=None,
+        ),
+        config_params=AsepriteConfigParams(
+            has_small_sprites=has_small_sprites,
+            hurtboxes_enabled=hurtboxes_enabled,
+            export_backend=ExportBackend.NATIVE,
+        ),
+    )
+
+    for save_file_name, expected_file_name in zip(save_file_names, expected_file_names):
+        actual = load_rgba(tmp_path / paths.SPRITES_FOLDER / f"{save_file_name}.png")
+        expected = load_rgba(TEST_SPRITES_PATH / f"{expected_file_name}.png")
+        assert np.array_equal(actual, expected)
+
+    for expected_missing_file_name in expected_missing_file_names:
+        expected_missing_path = (
+            tmp_path / paths.SPRITES_FOLDER / f"{expected_missing_file_name}.png"
+        )
+        assert not expected_missing_path.exists()
+
+
+@pytest.mark.parametrize(
+    "aseprite_file_name, save_file_names, expected_file_names",
+    [
+        pytest.param("1frame", ["1frame_strip1"], ["1frame"]),
+        pytest.param("2frame", ["2frame_strip2"], ["2frame"]),
+        pytest.param("2frame_with_groups", ["2frame_with_groups_strip2"], ["2frame"]),
+        pytest.param(
+            "1frame_2frame", ["1frame_strip1", "2frame_strip2"], ["1frame", "2frame"]
+        ),
+        pytest.param(
+            "1frame_1bair",
+            ["1frame_strip1", "bair_strip1"],
+            ["1frame", "bair_big"],
+        ),
+        pytest.param("1frame_hurtmask", ["1frame_hurtmask_strip1"], ["1frame"]),
+        pytest.param(
+            "1frame_hurtbox_layer", ["1frame_hurtbox_layer_strip1"], ["1frame"]
+        ),
+        pytest.param("1has_flattened", ["1has_flattened_strip1"], ["1has_flattened"]),
+        pytest.param(
+            "1frame_with_hidden_above", ["1frame_with_hidden_above_strip1"], ["1frame"]
+        ),
+        pytest.param(
+            "1frame_with_hidden_below", ["1frame_with_hidden_below_strip1"], ["1frame"]
+        ),
+        pytest.param(
+            "split_blah1",
+            ["split_blah1_strip1", "split_blah1_blah_strip1"],
+            ["split_blah1_normal", "split_blah1_blah"],
+        ),
+        pytest.param(
+            "split_blah1_2layers",
+            ["split_blah1_2layers_strip1", "split_blah1_2layers_blah_strip1"],
+            ["split_blah1_normal", "split_blah1_blahleftright"],
+        ),
+        pytest.param(
+            "split_foobar1_groups",
+            [
+                "split_foobar1_groups_strip1",
+                "split_foobar1_groups_foo_strip1",
+                "split_foobar1_groups_bar_strip1",
+            ],
+            ["split_blah1_normal", "split_blah1_blah", "split_foobar_bar"],
+        ),
+        pytest.param(
+            "opt_hat",
+            ["opt_hat_strip1", "opt_hat_hat_strip1"],
+            ["opt_hat", "opt_hat_hat"],
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_native_export(
+    tmp_path, aseprite_file_name, save_file_names, expected_file_names
+):
+    await assert_native_export_saves_right_anims(
+        tmp_path=tmp_path,
+        aseprite_file_name=aseprite_file_name,
+        save_file_names=save_file_names,
+        expected_file_names=expected_file_names,
+    )
+
+
+@pytest.mark.asyncio
+async def test_native_export__small_sprites(tmp_path):
+    await assert_native_export_saves_right_anims(
+        tmp_path=tmp_path,
+        aseprite_file_name="1frame_1smallother",
+        save_file_names=["1frame_strip1", "othersprite_strip1"],
+        expected_file_names=["1frame", "bair"],
+        has_small_sprites=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_native_export_replaces_old_strips(tmp_path):
+    old_strip = tmp_path / paths.SPRITES_FOLDER / "2frame_strip5.png"
+    old_strip.parent.mkdir(parents=True)
+    old_strip.write_bytes(b"")
+
+    await assert_native_export_saves_right_anims(
+        tmp_path=tmp_path,
+        aseprite_file_name="2frame",
+        save_file_names=["2frame_strip2"],
+        expected_file_names=["2frame"],
+    )
+
+    assert not old_strip.exists()
+
+
+@pytest.mark.parametrize(
+    "aseprite_file_name, "
+    "save_file_names, "
+    "expected_file_names, "
+    "expected_missing_file_names",
+    [
+        pytest.param("1frame", [], [], ["1frame_hurt_strip1"]),
+        pytest.param(
+            "1frame_1bair", ["bair_hurt_strip1"], ["bair_hurt"], ["1frame_hurt_strip1"]
+        ),
+        pytest.param(
+            "wrong_color_type", ["fair_hurt_strip1"], ["wrong_color_type"], []
+        ),
+        pytest.param("with_hidden_layer", ["bair_hurt_strip1"], ["bair_hurt"], []),
+        pytest.param("fair", ["fair_hurt_strip1"], ["fair_hurt"], []),
+        pytest.param("dair", ["dair_hurt_strip1"], ["fair_hurt"], []),
+        pytest.param(
+            "1blah_1fair", ["fair_hurt_strip1"], ["fair_hurt"], ["blah_hurt_strip1"]
+        ),
+        pytest.param(
+            "1blah_2uair_1blah",
+            ["uair_hurt_strip2"],
+            ["uair_hurt"],
+            ["blah_hurt_strip1", "blah2_hurt_strip1"],
+        ),
+        pytest.param(
+            "2uair_2dair_hurtmask",
+            ["uair_hurt_strip2", "dair_hurt_strip2"],
+            ["uair_hurt", "dair_hurt"],
+            [],
+        ),
+        pytest.param(
+            "1blah_1ftilt", ["ftilt_hurt_strip1"], ["ftilt_hurt"], ["blah_hurt_strip1"]
+        ),
+        pytest.param(
+            "1blah_2uair_1blah_with_hurtbox_layer",
+            ["uair_hurt_strip2"],
+            ["uair_hurt_with_hurtbox_layer"],
+            ["blah_hurt_strip1", "blah2_hurt_strip1"],
+        ),
+        pytest.param(
+            "1blah_1ftilt_with_mask",
+            ["ftilt_hurt_strip1"],
+            ["ftilt_hurt_with_mask"],
+            ["blah_hurt_strip1"],
+        ),
+        pytest.param(
+            "hurt_layers_fair", ["fair_hurt_strip1"], ["hurt_layers_fair"], []
+        ),
+        pytest.param(
+            "nohurt_meta_fair", ["fair_hurt_strip1"], ["nohurt_meta_fair"], []
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_native_export_hurtbox(
+    tmp_path,
+    aseprite_file_name,
+    save_file_names,
+    expected_file_names,
+    expected_missing_file_names,
+):
+    await assert_native_export_saves_right_anims(
+        tmp_path=tmp_path,
+        aseprite_file_name=aseprite_file_name,
+        save_file_names=save_file_names,
+        expected_file_names=expected_file_names,
+        expected_missing_file_names=expected_missing_file_names,
+        hurtboxes_enabled=True,
+    )
+
+
+@pytest.mark.asyncio
+async def test_native_export__scheduled_per_file(tmp_path):
+    aseprite = read_aseprite(
+        run_context=make_run_context(),
+        path=TEST_SPRITES_PATH / "1frame_2frame.aseprite",
+    )
+    scheduler = ExportScheduler()
+
+    await aseprite.save(
+        path_params=AsepritePathParams(
+            exe_dir=tmp_path / "exe_dir",
+            root_dir=tmp_path,
+            aseprite_program_path=None,
+        ),
+        config_params=AsepriteConfigParams(export_backend=ExportBackend.NATIVE),
+        scheduler=scheduler,
+    )
+    # Exported on a worker thread once the scheduler runs,
+    # so the next file can be read meanwhile.
+    assert [export.key for export in scheduler.get_order()] == [aseprite.cache_key]
+    assert not (tmp_path / paths.SPRITES_FOLDER).exists()
+
+    await scheduler.run()
+
+    assert aseprite.finish_exports(scheduler.failed)
+    assert (tmp_path / paths.SPRITES_FOLDER / "1frame_strip1.png").exists()
+    assert (tmp_path / paths.SPRITES_FOLDER / "2frame_strip2.png").exists()
@@ -0,0 +1,100 @@
+import pytest
+
+from rivals_workshop_assistant.script_handling.script_document import (
+    ScriptDocument,
+    INJECTION_START_HEADER,
+    INJECTION_END_HEADER,
+    OLD_INJECTION_START_HEADERS,
+)
+from loguru import logger
+
+logger.remove()
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        pytest.param("a\nb\n\n", "a\nb", id="no_injection"),
+        pytest.param(
+            f"a\n\n\n{INJECTION_START_HEADER}\nx\n{INJECTION_END_HEADER}",
+            "a",
+            id="injection",
+        ),
+        pytest.param(
+            f"a\n\n\n{OLD_INJECTION_START_HEADERS[0]}\nx\n{INJECTION_END_HEADER}",
+            "a",
+            id="old_injection",
+        ),
+        pytest.param(
+            f"a {INJECTION_START_HEADER}\nx",
+            "a",
+            id="marker_after_code",
+        ),
+        pytest.param(
+            f"a\n{INJECTION_START_HEADER.splitlines()[0]}",
+            f"a\n{INJECTION_START_HEADER.splitlines()[0]}",
+            id="marker_without_newline_not_header",
+        ),
+    ],
+)
+def test_user_content(text, expected):
+    assert ScriptDocument(text).user_content == expected
+
+
+@pytest.mark.parametrize(
+    "text, gmls, expected",
+    [
+        pytest.param("a\n", [], "a", id="no_gmls"),
+        pytest.param(
+            "a",
+            ["x", "y"],
+            f"a\n\n{INJECTION_START_HEADER}\nx\n\ny\n{INJECTION_END_HEADER}",
+            id="gmls",
+        ),
+        pytest.param(
+            f"a\n\n\n{INJECTION_START_HEADER}\nold\n{INJECTION_END_HEADER}",
+            ["x"],
+            f"a\n\n{INJECTION_START_HEADER}\nx\n{INJECTION_END_HEADER}",
+            id="replaces_injection",
+        ),
+    ],
+)
+def test_set_injected_gmls(text, gmls, expected):
+    document = ScriptDocument(text)
+
+    document.set_injected_gmls(gmls)
+
+    assert document.text == expected
+    assert document.lines == expected.split("\n")
+    assert document.user_content == "a"
+
+
+def test_set_line__updates_text_and_user_content():
+    document = ScriptDocument(f"a\n\n\n{INJECTION_START_HEADER}\nx")
+    assert document.user_content == "a"
+
+    document.set_line(0, "b")
+
+    assert document.text.startswith("b\n")
+    assert document.user_content == "b"
+
+
+def test_tokens__kept_until_text_changes():
+    document = ScriptDocument("a = 1;\nb = 2;")
+    tokens = document.tokens
+    assert document.tokens is tokens
+
+    document.set_line(1, "c = 2;")
+
+    assert document.tokens is not tokens
+    assert document.tokens.used_names == {"a", "c"}
+
+
+def test_user_tokens__kept_when_injected_gmls_change():
+    document = ScriptDocument("f()")
+    user_tokens = document.user_tokens
+
+    document.set_injected_gmls(["#define f {\n    return g();\n}"])
+
+    assert document.user_tokens is user_tokens
+    assert "g" in document.tokens.used_names
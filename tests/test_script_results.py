@@ -0,0 +1,140 @@
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant import dotfile_mod, script_results_mod
+from rivals_workshop_assistant.script_handling.script_mod import Script
+from rivals_workshop_assistant.script_handling.script_updating import handle_scripts
+from tests.testing_helpers import make_run_context, make_time
+from loguru import logger
+
+logger.remove()
+
+SCRIPT_PATH = Path("scripts/a.gml")
+INJECT_PATH = Path("assistant/user_inject/lib.gml")
+LIBRARY = "#define f {\n    return 1;\n}"
+
+
+def make_script(path: Path, content: str, is_fresh: bool = True) -> Script:
+    script = Script(path=path, modified_time=make_time(), original_content=content)
+    script.is_fresh = is_fresh
+    return script
+
+
+def process(
+    tmp_path,
+    script_results: dict,
+    dotfile: dict = None,
+    content: str = "f()",
+    library: str = LIBRARY,
+    is_fresh: bool = True,
+) -> Script:
+    script = make_script(tmp_path / SCRIPT_PATH, content, is_fresh=is_fresh)
+    handle_scripts(
+        make_run_context(
+            root_dir=tmp_path,
+            dotfile={} if dotfile is None else dotfile,
+            script_results=script_results,
+        ),
+        scripts=[script],
+        anims=[],
+        inject_scripts=[make_script(tmp_path / INJECT_PATH, library)],
+    )
+    return script
+
+
+def mark_results(script_results: dict):
+    """Change the recorded results, so using them can be told from processing."""
+    script_results[SCRIPT_PATH.as_posix()][script_results_mod.CONTENT_FIELD] = "recorded"
+
+
+def test_handle_scripts__records_result(tmp_path):
+    script_results = {}
+
+    script = process(tmp_path, script_results)
+
+    result = script_results[SCRIPT_PATH.as_posix()]
+    assert result[script_results_mod.CONTENT_FIELD] == script.working_content
+    assert result[script_results_mod.CLIENTS_FIELD] == [INJECT_PATH.as_posix()]
+
+
+def test_handle_scripts__uses_recorded_result(tmp_path):
+    script_results = {}
+    process(tmp_path, script_results)
+    mark_results(script_results)
+    dotfile = {}
+
+    script = process(tmp_path, script_results, dotfile=dotfile)
+
+    assert script.working_content == "recorded"
+    assert dotfile_mod.get_injection_dependencies(dotfile, tmp_path / SCRIPT_PATH) == [
+        tmp_path / INJECT_PATH
+    ]
+
+
+def test_handle_scripts__uses_recorded_result_after_project_moves(tmp_path):
+    script_results = {}
+    process(tmp_path / "before", script_results)
+    mark_results(script_results)
+    dotfile = {}
+
+    script = process(tmp_path / "after", script_results, dotfile=dotfile)
+
+    assert script.working_content == "recorded"
+    assert dotfile_mod.get_injection_dependencies(
+        dotfile, tmp_path / "after" / SCRIPT_PATH
+    ) == [tmp_path / "after" / INJECT_PATH]
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        pytest.param({"content": "f() + 1"}, id="content"),
+        pytest.param({"library": LIBRARY.replace("1", "2")}, id="library"),
+        pytest.param(
+            {"dotfile": {dotfile_mod.ASSISTANT_VERSION_FIELD: "9.9.9"}}, id="version"
+        ),
+    ],
+)
+def test_handle_scripts__processes_when_inputs_change(tmp_path, changes):
+    script_results = {}
+    process(tmp_path, script_results)
+    mark_results(script_results)
+
+    script = process(tmp_path, script_results, **changes)
+
+    assert script.working_content != "recorded"
+
+
+def test_handle_scripts__unchanged_script_not_recorded(tmp_path):
+    script_results = {}
+
+    process(tmp_path, script_results, is_fresh=False)
+
+    assert script_results == {}
+
+
+def test_set_result__replaces_previous(tmp_path):
+    script_results = {}
+
+    for key in ["old", "new"]:
+        script_results_mod.set_result(
+            script_results, path="a", key=key, content=key, clients=[]
+        )
+
+    assert script_results_mod.get_result(script_results, path="a", key="old") is None
+    assert script_results["a"] == {
+        script_results_mod.KEY_FIELD: "new",
+        script_results_mod.CONTENT_FIELD: "new",
+        script_results_mod.CLIENTS_FIELD: [],
+    }
+
+
+def test_script_results__save_and_read(tmp_path):
+    script_results = {"a": {script_results_mod.KEY_FIELD: "key"}}
+
+    script_results_mod.save(
+        make_run_context(root_dir=tmp_path, script_results=script_results)
+    )
+
+    assert script_results_mod.read(tmp_path) == script_results
@@ -0,0 +1,169 @@
+from pathlib import Path
+
+import pytest
+
+from rivals_workshop_assistant import paths
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+)
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.sprite_cache import (
+    SpriteCache,
+    make_sprite_cache,
+    get_exporter_version,
+    PROJECT_SPRITE_CACHE_FOLDER,
+    SHARED_SPRITE_CACHE_FOLDER,
+)
+from rivals_workshop_assistant.assistant_config_mod import (
+    ExportBackend,
+    SpriteCacheLocation,
+    get_sprite_cache_location,
+)
+from tests.testing_helpers import make_run_context
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+async def save_native(root_dir: Path, aseprite_file_name: str, sprite_cache, **config):
+    aseprite = read_aseprite(
+        run_context=make_run_context(),
+        path=TEST_SPRITES_PATH / f"{aseprite_file_name}.aseprite",
+    )
+    await aseprite.save(
+        path_params=AsepritePathParams(
+            exe_dir=root_dir / "exe_dir",
+            root_dir=root_dir,
+            aseprite_program_path=None,
+        ),
+        config_params=AsepriteConfigParams(
+            export_backend=ExportBackend.NATIVE, **config
+        ),
+        sprite_cache=sprite_cache,
+    )
+
+
+def get_cached_paths(sprite_cache: SpriteCache):
+    return sorted(sprite_cache.directory.glob("*/*.png"))
+
+
+def test_sprite_cache__store_and_fetch(tmp_path):
+    sprite_cache = SpriteCache(tmp_path / "cache", exporter_version="test")
+    exported = tmp_path / "exported.png"
+    exported.write_bytes(b"strip")
+    key = sprite_cache.make_key(anim_digest="b2:abc", scale=2)
+
+    assert not sprite_cache.fetch(key, tmp_path / "dest.png")
+    sprite_cache.store(key, exported)
+
+    assert sprite_cache.fetch(key, tmp_path / "dest.png")
+    assert (tmp_path / "dest.png").read_bytes() == b"strip"
+    assert list(sprite_cache.get_path(key).parent.glob("*.tmp")) == []
+
+
+@pytest.mark.parametrize(
+    "other_version, other_parts",
+    [
+        pytest.param("test", {"anim_digest": "b2:abd", "scale": 2}, id="digest"),
+        pytest.param("test", {"anim_digest": "b2:abc", "scale": 1}, id="scale"),
+        pytest.param("other", {"anim_digest": "b2:abc", "scale": 2}, id="exporter"),
+    ],
+)
+def test_sprite_cache__key_changes(tmp_path, other_version, other_parts):
+    key = SpriteCache(tmp_path, "test").make_key(anim_digest="b2:abc", scale=2)
+    other_key = SpriteCache(tmp_path, other_version).make_key(**other_parts)
+
+    assert key != other_key
+
+
+def test_get_exporter_version__aseprite_version():
+    assert get_exporter_version(
+        ExportBackend.ASEPRITE, "Aseprite 1.2.40"
+    ) != get_exporter_version(ExportBackend.ASEPRITE, "Aseprite 1.3")
+
+
+@pytest.mark.parametrize(
+    "config, expected",
+    [
+        pytest.param({}, SpriteCacheLocation.NONE, id="default"),
+        pytest.param(
+            {"sprite_cache": "project"}, SpriteCacheLocation.PROJECT, id="set"
+        ),
+        pytest.param(
+            {"sprite_cache": "nowhere"}, SpriteCacheLocation.NONE, id="invalid"
+        ),
+    ],
+)
+def test_get_sprite_cache_location(config, expected):
+    assert get_sprite_cache_location(config) == expected
+
+
+@pytest.mark.parametrize(
+    "location, expected_directory",
+    [
+        pytest.param(
+            SpriteCacheLocation.PROJECT,
+            Path("root") / PROJECT_SPRITE_CACHE_FOLDER,
+            id="project",
+        ),
+        pytest.param(
+            SpriteCacheLocation.SHARED,
+            Path("exe") / SHARED_SPRITE_CACHE_FOLDER,
+            id="shared",
+        ),
+        pytest.param(SpriteCacheLocation.NONE, None, id="none"),
+    ],
+)
+def test_make_sprite_cache(location, expected_directory):
+    sprite_cache = make_sprite_cache(
+        location=location,
+        root_dir=Path("root"),
+        exe_dir=Path("exe"),
+        export_backend=ExportBackend.NATIVE,
+    )
+
+    if expected_directory is None:
+        assert sprite_cache is None
+    else:
+        assert sprite_cache.directory == expected_directory
+
+
+@pytest.mark.asyncio
+async def test_native_export__stores_in_sprite_cache(tmp_path):
+    sprite_cache = SpriteCache(tmp_path / "cache", exporter_version="test")
+
+    await save_native(tmp_path / "a", "1frame_2frame", sprite_cache)
+
+    cached = [path.read_bytes() for path in get_cached_paths(sprite_cache)]
+    exported = [
+        (tmp_path / "a" / paths.SPRITES_FOLDER / name).read_bytes()
+        for name in ["1frame_strip1.png", "2frame_strip2.png"]
+    ]
+    assert sorted(cached) == sorted(exported)
+
+
+@pytest.mark.asyncio
+async def test_native_export__copies_from_sprite_cache(tmp_path):
+    sprite_cache = SpriteCache(tmp_path / "cache", exporter_version="test")
+    await save_native(tmp_path / "a", "1frame", sprite_cache)
+    # Mark the cached copy, to see it's used instead of a new export.
+    (cached_path,) = get_cached_paths(sprite_cache)
+    cached_path.write_bytes(b"cached")
+
+    await save_native(tmp_path / "b", "1frame", sprite_cache)
+
+    dest = tmp_path / "b" / paths.SPRITES_FOLDER / "1frame_strip1.png"
+    assert dest.read_bytes() == b"cached"
+
+
+@pytest.mark.asyncio
+async def test_native_export__sprite_cache_misses_on_other_settings(tmp_path):
+    sprite_cache = SpriteCache(tmp_path / "cache", exporter_version="test")
+    await save_native(tmp_path / "a", "1frame", sprite_cache)
+
+    await save_native(tmp_path / "b", "1frame", sprite_cache, is_ssl=True)
+
+    assert len(get_cached_paths(sprite_cache)) == 2
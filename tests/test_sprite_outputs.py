@@ -0,0 +1,284 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from rivals_workshop_assistant import paths, sprite_outputs_mod
+from rivals_workshop_assistant.aseprite_handling import (
+    AsepritePathParams,
+    AsepriteConfigParams,
+)
+from rivals_workshop_assistant.aseprite_handling.anims import save_anims
+from rivals_workshop_assistant.aseprite_handling.aseprites import read_aseprite
+from rivals_workshop_assistant.aseprite_handling.native_export import (
+    load_strip,
+    save_strip,
+)
+from rivals_workshop_assistant.assistant_config_mod import ExportBackend
+from tests.testing_helpers import make_run_context
+from loguru import logger
+
+logger.remove()
+
+TEST_SPRITES_PATH = Path("tests/assets/sprites")
+
+
+def entry(file_name: str) -> dict:
+    return {sprite_outputs_mod.FILE_FIELD: file_name}
+
+
+def make_sprites(root_dir: Path, file_names):
+    sprites_dir = root_dir / paths.SPRITES_FOLDER
+    sprites_dir.mkdir(parents=True, exist_ok=True)
+    for file_name in file_names:
+        (sprites_dir / file_name).touch()
+
+
+def get_sprites(root_dir: Path):
+    return sorted(path.name for path in (root_dir / paths.SPRITES_FOLDER).iterdir())
+
+
+@pytest.mark.parametrize(
+    "sprite_outputs, expected, expected_outputs, expected_sprites",
+    [
+        pytest.param(
+            {"a.aseprite": {"a": entry("a_strip1.png")}},
+            {},
+            {},
+            ["b_strip2.png"],
+            id="file_deleted",
+        ),
+        pytest.param(
+            {"a.aseprite": {"a": entry("a_strip1.png")}},
+            {"a.aseprite": None},
+            {"a.aseprite": {"a": entry("a_strip1.png")}},
+            ["a_strip1.png", "b_strip2.png"],
+            id="file_unchanged",
+        ),
+        pytest.param(
+            {"a.aseprite": {"a": entry("a_strip1.png"), "b": entry("b_strip2.png")}},
+            {"a.aseprite": {"a"}},
+            {"a.aseprite": {"a": entry("a_strip1.png")}},
+            ["a_strip1.png"],
+            id="anim_deleted",
+        ),
+        pytest.param(
+            {
+                "a.aseprite": {"a": entry("a_strip1.png")},
+                "b.aseprite": {"a": entry("a_strip1.png")},
+            },
+            {"b.aseprite": {"a"}},
+            {"b.aseprite": {"a": entry("a_strip1.png")}},
+            ["a_strip1.png", "b_strip2.png"],
+            id="anim_moved_to_other_file",
+        ),
+    ],
+)
+def test_sweep_orphans(
+    tmp_path, sprite_outputs, expected, expected_outputs, expected_sprites
+):
+    make_sprites(tmp_path, ["a_strip1.png", "b_strip2.png"])
+
+    sprite_outputs_mod.sweep_orphans(sprite_outputs, tmp_path, expected)
+
+    assert sprite_outputs == expected_outputs
+    assert get_sprites(tmp_path) == expected_sprites
+
+
+def test_sweep_orphans__leaves_unrecorded_sprites(tmp_path):
+    make_sprites(tmp_path, ["handmade.png"])
+
+    sprite_outputs_mod.sweep_orphans({}, tmp_path, {})
+
+    assert get_sprites(tmp_path) == ["handmade.png"]
+
+
+def test_sprite_outputs__save_and_read(tmp_path):
+    sprite_outputs = {"anims/a.aseprite": {"a": entry("a_strip1.png")}}
+
+    sprite_outputs_mod.save(
+        make_run_context(root_dir=tmp_path, sprite_outputs=sprite_outputs)
+    )
+
+    assert sprite_outputs_mod.read(tmp_path) == sprite_outputs
+
+
+def test_sprite_outputs__unreadable(tmp_path):
+    path = tmp_path / sprite_outputs_mod.PATH
+    path.parent.mkdir(parents=True)
+    path.write_text("not json")
+
+    assert sprite_outputs_mod.read(tmp_path) == {}
+
+
+async def save_native(root_dir: Path, aseprite_file_name: str, sprite_outputs: dict):
+    run_context = make_run_context(root_dir=root_dir, sprite_outputs=sprite_outputs)
+    aseprite = read_aseprite(
+        run_context=run_context,
+        path=TEST_SPRITES_PATH / f"{aseprite_file_name}.aseprite",
+    )
+    await save_anims(
+        path_params=AsepritePathParams(
+            exe_dir=root_dir / "exe_dir",
+            root_dir=root_dir,
+            aseprite_program_path=None,
+        ),
+        config_params=AsepriteConfigParams(export_backend=ExportBackend.NATIVE),
+        aseprites=[aseprite],
+        sprite_outputs=sprite_outputs,
+    )
+    return aseprite
+
+
+@pytest.mark.asyncio
+async def test_save_anims__records_outputs(tmp_path):
+    sprite_outputs = {}
+
+    aseprite = await save_native(tmp_path, "1frame_2frame", sprite_outputs)
+
+    assert {
+        export_name: output[sprite_outputs_mod.FILE_FIELD]
+        for export_name, output in sprite_outputs[aseprite.cache_key].items()
+    } == {"1frame": "1frame_strip1.png", "2frame": "2frame_strip2.png"}
+    assert get_sprites(tmp_path) == ["1frame_strip1.png", "2frame_strip2.png"]
+
+
+@pytest.mark.asyncio
+async def test_save_anims__failed_export_not_recorded(tmp_path):
+    key = (TEST_SPRITES_PATH / "1frame.aseprite").as_posix()
+    make_sprites(tmp_path, ["1frame_strip3.png"])
+    sprite_outputs = {key: {"1frame": entry("1frame_strip3.png")}}
+    run_context = make_run_context(root_dir=tmp_path, sprite_outputs=sprite_outputs)
+    aseprite = read_aseprite(
+        run_context=run_context, path=TEST_SPRITES_PATH / "1frame.aseprite"
+    )
+
+    # Python rejects Aseprite's arguments, so the export fails.
+    exported = await save_anims(
+        path_params=AsepritePathParams(
+            exe_dir=tmp_path / "exe_dir",
+            root_dir=tmp_path,
+            aseprite_program_path=Path(sys.executable),
+        ),
+        config_params=AsepriteConfigParams(export_backend=ExportBackend.ASEPRITE),
+        aseprites=[aseprite],
+        sprite_outputs=sprite_outputs,
+    )
+
+    assert exported == []
+    assert sprite_outputs == {key: {}}
+    assert get_sprites(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_save_anims__deletes_recorded_old_strip(tmp_path):
+    key = (TEST_SPRITES_PATH / "1frame.aseprite").as_posix()
+    # The recorded strip is deleted directly, without searching for others.
+    make_sprites(tmp_path, ["1frame_strip3.png", "1frame_strip9.png"])
+    sprite_outputs = {key: {"1frame": entry("1frame_strip3.png")}}
+
+    await save_native(tmp_path, "1frame", sprite_outputs)
+
+    assert get_sprites(tmp_path) == ["1frame_strip1.png", "1frame_strip9.png"]
+    assert sprite_outputs[key]["1frame"][sprite_outputs_mod.FILE_FIELD] == (
+        "1frame_strip1.png"
+    )
+
+
+@pytest.mark.asyncio
+async def test_save_anims__sweeps_orphans(tmp_path):
+    make_sprites(tmp_path, ["gone_strip4.png", "handmade.png"])
+    sprite_outputs = {"anims/gone.aseprite": {"gone": entry("gone_strip4.png")}}
+
+    await save_native(tmp_path, "1frame", sprite_outputs)
+
+    assert get_sprites(tmp_path) == ["1frame_strip1.png", "handmade.png"]
+    assert "anims/gone.aseprite" not in sprite_outputs
+
+
+MARKER = [1, 2, 3, 255]
+
+
+async def export_and_mark(root_dir: Path):
+    """Export 2frame, then paint over its strip so redrawn frames can be seen.
+    Returns the strip as exported, and its recorded output."""
+    sprite_outputs = {}
+    aseprite = await save_native(root_dir, "2frame", sprite_outputs)
+    path = root_dir / paths.SPRITES_FOLDER / "2frame_strip2.png"
+    exported = load_strip(path)
+    save_strip(np.full_like(exported, MARKER), path)
+    return exported, sprite_outputs, sprite_outputs[aseprite.cache_key]["2frame"]
+
+
+@pytest.mark.asyncio
+async def test_save_anims__patches_changed_frames(tmp_path):
+    exported, sprite_outputs, output = await export_and_mark(tmp_path)
+    output[sprite_outputs_mod.DIGEST_FIELD] = "changed"
+    output[sprite_outputs_mod.FRAME_DIGESTS_FIELD][1] = "changed"
+
+    await save_native(tmp_path, "2frame", sprite_outputs)
+
+    strip = load_strip(tmp_path / paths.SPRITES_FOLDER / "2frame_strip2.png")
+    width = strip.shape[1] // 2
+    assert (strip[:, :width] == MARKER).all()
+    assert (strip[:, width:] == exported[:, width:]).all()
+    (outputs,) = sprite_outputs.values()
+    assert "changed" not in outputs["2frame"][sprite_outputs_mod.FRAME_DIGESTS_FIELD]
+
+
+@pytest.mark.asyncio
+async def test_save_anims__unchanged_frames_not_redrawn(tmp_path):
+    _, sprite_outputs, _ = await export_and_mark(tmp_path)
+
+    await save_native(tmp_path, "2frame", sprite_outputs)
+
+    strip = load_strip(tmp_path / paths.SPRITES_FOLDER / "2frame_strip2.png")
+    assert (strip == MARKER).all()
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        pytest.param(sprite_outputs_mod.EXPORT_KEY_FIELD, "other", id="export_key"),
+        pytest.param(sprite_outputs_mod.FRAME_DIGESTS_FIELD, ["a"], id="frame_count"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_save_anims__exports_fully_when_not_patchable(tmp_path, field, value):
+    exported, sprite_outputs, output = await export_and_mark(tmp_path)
+    output[sprite_outputs_mod.DIGEST_FIELD] = "changed"
+    output[field] = value
+
+    await save_native(tmp_path, "2frame", sprite_outputs)
+
+    strip = load_strip(tmp_path / paths.SPRITES_FOLDER / "2frame_strip2.png")
+    assert (strip == exported).all()
+
+
+@pytest.mark.asyncio
+async def test_save_anims__only_exports_changed_variants(tmp_path):
+    sprite_outputs = {}
+    aseprite = await save_native(tmp_path, "opt_hat", sprite_outputs)
+    sprites_dir = tmp_path / paths.SPRITES_FOLDER
+    for file_name in ["opt_hat_strip1.png", "opt_hat_hat_strip1.png"]:
+        (sprites_dir / file_name).write_bytes(b"old")
+    sprite_outputs[aseprite.cache_key]["opt_hat_hat"][
+        sprite_outputs_mod.DIGEST_FIELD
+    ] = "changed"
+
+    await save_native(tmp_path, "opt_hat", sprite_outputs)
+
+    assert (sprites_dir / "opt_hat_strip1.png").read_bytes() == b"old"
+    assert (sprites_dir / "opt_hat_hat_strip1.png").read_bytes() != b"old"
+
+
+@pytest.mark.asyncio
+async def test_save_anims__exports_missing_variants(tmp_path):
+    sprite_outputs = {}
+    await save_native(tmp_path, "opt_hat", sprite_outputs)
+    (tmp_path / paths.SPRITES_FOLDER / "opt_hat_hat_strip1.png").unlink()
+
+    await save_native(tmp_path, "opt_hat", sprite_outputs)
+
+    assert get_sprites(tmp_path) == ["opt_hat_hat_strip1.png", "opt_hat_strip1.png"]
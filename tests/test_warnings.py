@@ -13,6 +13,7 @@ from rivals_workshop_assistant.script_handling.warning_handling import (
     remove_warnings,
     handle_warning,
 )
+from rivals_workshop_assistant.script_handling.script_document import ScriptDocument
 from tests.testing_helpers import make_script
 from loguru import logger
 
@@ -215,6 +216,45 @@ switch (lock)
     )
 
 
+class CountingDocument(ScriptDocument):
+    """Counts how many times its tokens are made."""
+
+    tokenized = 0
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self.tokenized += 1
+        return super().tokens
+
+
+def test__warnings_share_one_token_pass():
+    original_content = f"""\
+x = view_get_xview();
+y = view_get_yview();{desync.UnsafeCameraReadY.get_warning_text()}
+if window_timer == 3 {{}}"""
+    script = make_script(path=Path("update.gml"), original_content=original_content)
+    script._document = CountingDocument(original_content)
+
+    handle_warning(
+        assistant_config={
+            "warnings": [
+                "desync_unsafe_camera_read",
+                "check_window_timer_without_check_hitpause",
+            ]
+        },
+        scripts=[script],
+    )
+
+    assert script.document.tokenized == 1
+    assert script.document.lines == [
+        f"x = view_get_xview();{desync.UnsafeCameraReadX.get_warning_text()}",
+        f"y = view_get_yview();{desync.UnsafeCameraReadY.get_warning_text()}",
+        "if window_timer == 3 {}"
+        + hitpause.CheckWindowTimerEqualsWithoutCheckHitpause.get_warning_text(),
+    ]
+
+
 @pytest.mark.parametrize(
     "original, expected",
     [
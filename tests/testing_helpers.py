@@ -9,6 +9,7 @@ from testfixtures import TempDirectory
 
 import rivals_workshop_assistant.updating
 from rivals_workshop_assistant import assistant_config_mod
+from rivals_workshop_assistant.file_index import FileIndex
 from rivals_workshop_assistant.run_context import RunContext
 from rivals_workshop_assistant.aseprite_handling.aseprites import Aseprite
 from loguru import logger
@@ -33,6 +34,11 @@ def make_run_context(
     dotfile: dict = None,
     assistant_config: dict = None,
     character_config: dict = None,
+    aseprite_cache: dict = None,
+    sprite_outputs: dict = None,
+    file_index: FileIndex = None,
+    ledger: dict = None,
+    script_results: dict = None,
 ):
     if dotfile is None:
         dotfile = {}
@@ -46,6 +52,11 @@ def make_run_context(
         dotfile=dotfile,
         assistant_config=assistant_config,
         character_config=character_config,
+        aseprite_cache=aseprite_cache,
+        sprite_outputs=sprite_outputs,
+        file_index=file_index,
+        ledger=ledger,
+        script_results=script_results,
     )
 
 